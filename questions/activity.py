@@ -0,0 +1,61 @@
+"""
+Per user activity feeds: questions asked and answered, answers accepted and
+posts edited.
+
+Entries are written to the acting user's feed as things happen, so a profile
+page reads its feed with one range scan of the (user, -id) index rather than
+merging questions, answers and revisions. Feeds are append only and capped:
+every new entry deletes whatever falls past the newest ACTIVITY_FEED_SIZE.
+"""
+from django.conf import settings
+from django.db.models import Subquery
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Question, Answer, QuestionRevision, AnswerRevision, Activity
+
+
+def _size():
+    return getattr(settings, 'ACTIVITY_FEED_SIZE', 200)
+
+
+def trim(user_id):
+    cutoff = Activity.objects.filter(user=user_id).order_by('-id').values('id')[_size():_size() + 1]
+    return Activity.objects.filter(user=user_id, id__lte=Subquery(cutoff)).delete()[0]
+
+
+def record(user_id, kind, question_id, answer_id=None, created=None):
+    entry = Activity.objects.create(user_id=user_id, kind=kind, question_id=question_id, answer_id=answer_id,
+                                    **({'created': created} if created is not None else {}))
+    trim(user_id)
+    return entry
+
+
+def feed(user_id):
+    return Activity.objects.filter(user=user_id).select_related('question') \
+        .only('id', 'kind', 'created', 'answer_id', 'question__id', 'question__title').order_by('-id')
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        record(instance.owner_id, Activity.ASKED, instance.id, created=instance.creation_time)
+    elif instance.is_deleted and update_fields is not None and 'is_deleted' in update_fields:
+        Activity.objects.filter(question=instance).delete()
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, created, **kwargs):
+    if created:
+        record(instance.owner_id, Activity.ANSWERED, instance.question_id, instance.id, created=instance.creation_time)
+
+
+@receiver(post_save, sender=QuestionRevision)
+@receiver(post_save, sender=AnswerRevision)
+def revision_saved(sender, instance, created, **kwargs):
+    # The first revision is the post itself
+    if created and instance.number > 1 and instance.author_id is not None:
+        if sender is QuestionRevision:
+            record(instance.author_id, Activity.EDITED, instance.question_id, created=instance.created)
+        else:
+            record(instance.author_id, Activity.EDITED, instance.answer.question_id, instance.answer_id, created=instance.created)
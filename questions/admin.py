@@ -1,3 +1,35 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+
+from . import tagtools
+from .models import Tag
 
 # Register your models here.
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'question_count')
+    search_fields = ('name',)
+    actions = ['merge_into_most_used', 'delete_unused']
+
+    def get_queryset(self, request):
+        return super(TagAdmin, self).get_queryset(request).select_related('stats')
+
+    def question_count(self, tag):
+        return tag.stats.question_count if hasattr(tag, 'stats') else 0
+    question_count.admin_order_field = 'stats__question_count'
+
+    def merge_into_most_used(self, request, queryset):
+        tags = list(queryset.order_by('-stats__question_count', 'name'))
+        if len(tags) < 2:
+            self.message_user(request, 'Select at least two tags to merge.', messages.WARNING)
+            return
+        target = tags[0]
+        for source in tags[1:]:
+            tagtools.merge(source, target)
+        self.message_user(request, 'Merged %i tags into "%s".' % (len(tags) - 1, target.name))
+    merge_into_most_used.short_description = 'Merge selected tags into the most used one'
+
+    def delete_unused(self, request, queryset):
+        _, per_model = queryset.filter(question=None).delete()
+        self.message_user(request, 'Deleted %i unused tags.' % per_model.get(Tag._meta.label, 0))
+    delete_unused.short_description = 'Delete selected tags without questions'
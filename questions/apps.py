@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class QuestionsConfig(AppConfig):
     name = 'questions'
+
+    def ready(self):
+        # Connects signal receivers
+        from . import activity, duplicates, events, hot, notifications, postings, rendering, revisions, search, tagindex, tagstats, userstats
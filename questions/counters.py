@@ -0,0 +1,111 @@
+"""
+Question view counting.
+
+Views are deduplicated per visitor with cache.add over VIEW_COUNT_WINDOW
+seconds and accumulated in a per-process buffer. The buffer is flushed every
+VIEW_COUNT_FLUSH_INTERVAL seconds, by a timer thread and by page views finding
+it due, with one UPDATE ... FROM (VALUES ...) statement, so a hot question
+doesn't serialize page views on its row lock. A failed flush keeps the counts
+for the next one, counts of the last interval are lost if the process is killed.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+from .models import Question
+from .sql import update_from_values
+
+logger = logging.getLogger(__name__)
+
+
+def visitor_id(request):
+    if request.user.is_authenticated:
+        return 'u%i' % request.user.id
+    if request.session.session_key:
+        return 's' + request.session.session_key
+    return 'a' + request.META.get('REMOTE_ADDR', '')
+
+
+class ViewCounter(object):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._last_flush = time.time()
+        self._timer = None
+
+    def _interval(self):
+        return getattr(settings, 'VIEW_COUNT_FLUSH_INTERVAL', 10)
+
+    def record(self, question_id, visitor):
+        """
+            Counts a view unless the visitor has seen the question recently.
+        """
+        window = getattr(settings, 'VIEW_COUNT_WINDOW', 15 * 60)
+        if not cache.add('question-view:%i:%s' % (question_id, visitor), True, window):
+            return False
+        with self._lock:
+            self._pending[question_id] += 1
+            due = time.time() - self._last_flush >= self._interval()
+            if self._timer is None:
+                self._timer = threading.Thread(target=self._run, daemon=True)
+                self._timer.start()
+        if due:
+            self._flush_logged()
+        return True
+
+    def pending(self, question_id):
+        with self._lock:
+            return self._pending[question_id]
+
+    def _run(self):
+        # Flushes counts of questions nobody visits anymore
+        while True:
+            time.sleep(self._interval())
+            with self._lock:
+                due = time.time() - self._last_flush >= self._interval()
+            if due:
+                self._flush_logged()
+                close_old_connections()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            # The page view shouldn't fail for it, the counts are kept
+            logger.exception('Flushing question view counts failed')
+
+    def write(self, pending):
+        return update_from_values(Question, ['id', 'views'], sorted(pending.items()),
+                                  {'views': 't.views + v.views'})
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+            self._last_flush = time.time()
+        if not pending:
+            return 0
+        try:
+            return self.write(pending)
+        except Exception:
+            # Keeps the counts for the next flush
+            with self._lock:
+                self._pending.update(pending)
+            raise
+
+
+view_counter = ViewCounter()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        view_counter.flush()
+    except Exception:
+        pass
@@ -0,0 +1,59 @@
+"""
+Question deletion in two steps.
+
+soft_delete() only flags the question, which hides it from Question.objects
+and so from every page, and drops its tags so the tag caches and counters
+stay right. Removing the rows, with the answers and everything cascading from
+them, is left to purge_question(), queued as a background task, and purge(),
+run by the purge_questions command to catch up. Answers are deleted
+batch_size at a time, each batch in its own transaction, so no single
+statement or lock covers a question's whole thread.
+"""
+from django.conf import settings
+from django.db import transaction
+
+from .models import Question, Answer
+from .tasks import task
+from .userstats import removed_already
+
+
+def _batch_size():
+    return getattr(settings, 'QUESTION_PURGE_BATCH_SIZE', 500)
+
+
+def soft_delete(question):
+    with transaction.atomic():
+        question.tags.clear()
+        question.is_deleted = True
+        question.save(update_fields=['is_deleted'])
+
+
+@task
+def purge_question(question_id, batch_size=None):
+    """
+        Deletes a soft deleted question's answers in batches, then the
+        question. Returns the number of answers deleted.
+    """
+    batch_size = batch_size or _batch_size()
+    deleted = 0
+    while True:
+        ids = list(Answer.objects.filter(question_id=question_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        # Soft deleting took them off the user totals
+        with transaction.atomic(), removed_already():
+            _, per_model = Answer.objects.filter(pk__in=ids).delete()
+        deleted += per_model.get(Answer._meta.label, 0)
+    Question.all_objects.filter(pk=question_id, is_deleted=True).delete()
+    return deleted
+
+
+def purge(batch_size=None):
+    """
+        Purges every soft deleted question. Returns the number of questions.
+    """
+    purged = 0
+    for question_id in Question.all_objects.filter(is_deleted=True).order_by('id').values_list('id', flat=True):
+        purge_question(question_id, batch_size)
+        purged += 1
+    return purged
@@ -0,0 +1,133 @@
+"""
+Duplicate question suggestions with MinHash and locality sensitive hashing.
+
+A question's text is reduced to its set of words and word pairs. SIGNATURE
+hash functions each keep their minimum over the set, and two signatures agree
+at a position with probability equal to the Jaccard similarity of the sets.
+The signature is cut into bands of BAND_ROWS values, each band hashed into a
+bucket. Questions sharing a bucket are candidates, found through a GIN index
+on the bucket array, and only those are compared signature to signature.
+
+With b bands of r rows two questions of similarity s share a bucket with
+probability 1 - (1 - s^r)^b. 16 bands of 4 rows put the middle of that curve
+at DUPLICATE_THRESHOLD's 0.5: pairs at 0.5 are candidates 64% of the time, at
+0.7 99% and at 0.2 3%. Candidates sharing the most bands are compared first,
+at most DUPLICATE_CANDIDATES of them.
+"""
+import hashlib
+import random
+import re
+import struct
+import zlib
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+
+from .models import Question
+from .related import STOP_WORDS
+from .sql import update_from_values
+
+SIGNATURE = 64
+BAND_ROWS = 4
+PRIME = (1 << 31) - 1
+
+_random = random.Random(20170901)
+_hashes = [(_random.randrange(1, PRIME), _random.randrange(0, PRIME)) for _ in range(SIGNATURE)]
+
+_word_re = re.compile(r'\w[\w+#]*')
+
+
+def shingles(title, text):
+    words = [w for w in _word_re.findall('%s %s' % (title.lower(), text.lower())) if w not in STOP_WORDS]
+    return set(words).union(' '.join(pair) for pair in zip(words, words[1:]))
+
+
+def signature(title, text):
+    values = [zlib.crc32(s.encode('utf8')) for s in shingles(title, text)]
+    if not values:
+        return []
+    return [min((a * v + b) % PRIME for v in values) for a, b in _hashes]
+
+
+def buckets(minhash):
+    result = []
+    for band, start in enumerate(range(0, len(minhash), BAND_ROWS)):
+        data = struct.pack('>%iI' % (BAND_ROWS + 1), band, *minhash[start:start + BAND_ROWS])
+        result.append(struct.unpack('>q', hashlib.blake2b(data, digest_size=8).digest())[0])
+    return result
+
+
+def similarity(a, b):
+    """
+        Estimated Jaccard similarity of two signatures.
+    """
+    if not a or not b:
+        return 0.0
+    return sum(1 for x, y in zip(a, b) if x == y) / float(SIGNATURE)
+
+
+def find_similar(title, text='', limit=None, exclude=None):
+    """
+        Returns up to limit (question, estimated similarity) pairs, most
+        similar first.
+    """
+    limit = limit or getattr(settings, 'DUPLICATE_SUGGESTIONS', 5)
+    minhash = signature(title, text)
+    if not minhash:
+        return []
+    keys = buckets(minhash)
+    shared_bands = RawSQL('SELECT count(*) FROM unnest(%s.lsh_buckets) bucket WHERE bucket = ANY(%%s)'
+                          % connection.ops.quote_name(Question._meta.db_table), (keys,))
+    candidates = Question.objects.filter(lsh_buckets__overlap=keys).only('id', 'title', 'minhash') \
+        .annotate(shared_bands=shared_bands).order_by('-shared_bands', '-id')
+    if exclude is not None:
+        candidates = candidates.exclude(pk=exclude)
+    scored = [(q, similarity(minhash, q.minhash))
+              for q in candidates[:getattr(settings, 'DUPLICATE_CANDIDATES', 100)]]
+    scored.sort(key=lambda e: (-e[1], -e[0].id))
+    return [(q, score) for q, score in scored[:limit] if score > 0]
+
+
+def index(question):
+    question.minhash = signature(question.title, question.text)
+    question.lsh_buckets = buckets(question.minhash)
+
+
+def reindex(batch_size=1000):
+    """
+        Recomputes every stored signature, batch_size questions per UPDATE.
+        Returns the number of questions.
+    """
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(Question.objects.filter(pk__gt=last_id).order_by('pk')
+                     .values_list('id', 'title', 'text')[:batch_size])
+        if not batch:
+            return indexed
+        rows = []
+        for question_id, title, text in batch:
+            minhash = signature(title, text)
+            rows.append((question_id, minhash, buckets(minhash)))
+        indexed += update_from_values(Question, ['id', 'minhash', 'lsh_buckets'], rows, {
+            'minhash': 'v.minhash::integer[]',
+            'lsh_buckets': 'v.lsh_buckets::bigint[]'
+        }, batch_size=batch_size)
+        last_id = batch[-1][0]
+
+
+@receiver(pre_save, sender=Question)
+def index_question(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None:
+        index(instance)
+
+
+@receiver(post_save, sender=Question)
+def index_updated_fields(sender, instance, update_fields=None, **kwargs):
+    # Partial saves can't write the signature along
+    if update_fields is not None and ('title' in update_fields or 'text' in update_fields):
+        index(instance)
+        Question.objects.filter(pk=instance.pk).update(minhash=instance.minhash, lsh_buckets=instance.lsh_buckets)
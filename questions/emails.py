@@ -0,0 +1,8 @@
+"""
+Emails sent to users, queued in the outbox so SMTP never holds up a request.
+"""
+from . import outbox
+
+
+def email_changed(user):
+    outbox.queue(user.email, 'Email changed', 'Hi %s, this is now the email address of your account.' % user.username)
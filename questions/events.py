@@ -0,0 +1,289 @@
+"""
+Live answer events for question pages.
+
+Answer changes are published per question and fanned out by an in-process
+broker to every subscriber of that process. Only the ASGI entry point keeps
+streams open, on the event loop; question pages only subscribe when served
+through it. The WSGI stream and the polling endpoint return the events the
+broker already has right away, so no worker thread waits for new ones.
+With ANSWER_EVENTS_BACKEND = 'postgres'
+events travel between processes through LISTEN/NOTIFY, each process runs a
+single listener thread and renders every event's fragment once before fanning
+it out. The 'local' backend skips the database and only reaches subscribers
+of the publishing process.
+
+Event ids are given by the broker as it publishes, from a counter prefixed
+with a token of the broker, so subscribers receive them in id order. An id
+from another process or from before a restart doesn't tell what was missed,
+resuming from it replays the whole short history, which pages apply again
+harmlessly.
+"""
+import asyncio
+import json
+import logging
+import select
+import threading
+import time
+import uuid
+from collections import deque, OrderedDict
+from urllib.parse import parse_qs
+
+from django.conf import settings
+from django.db import connection, connections, close_old_connections, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.template.loader import render_to_string
+
+from .models import Answer
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = 'answer_events'
+
+
+def _setting(name, default):
+    return getattr(settings, 'ANSWER_EVENTS_' + name, default)
+
+
+class Broker(object):
+    """
+    Keeps a short history of events per question and wakes up subscribers.
+    """
+    def __init__(self, history=50, max_channels=1000):
+        self.history = history
+        self.max_channels = max_channels
+        self.token = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._events = OrderedDict()
+        self._subscribers = {}
+
+    def current_id(self):
+        with self._lock:
+            return '%s-%i' % (self.token, self._sequence)
+
+    def _position(self, last_id):
+        token, _, sequence = (last_id or '').partition('-')
+        return int(sequence) if token == self.token and sequence.isdigit() else 0
+
+    def publish(self, channel, event):
+        """
+            Adds the event under the next id and returns it.
+        """
+        with self._lock:
+            self._sequence += 1
+            event = dict(event, id='%s-%i' % (self.token, self._sequence))
+            events = self._events.pop(channel, None) or deque(maxlen=self.history)
+            events.append((self._sequence, event))
+            self._events[channel] = events
+            while len(self._events) > self.max_channels:
+                self._events.popitem(last=False)
+            # Queued under the lock, so in id order
+            for loop, queue in self._subscribers.get(channel, ()):
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+        return event
+
+    def events_after(self, channel, last_id):
+        """
+            Events of channel since last_id, or all of them when last_id
+            isn't one of this broker's.
+        """
+        position = self._position(last_id)
+        with self._lock:
+            return [event for sequence, event in self._events.get(channel, ()) if sequence > position]
+
+    def subscribe(self, channel, loop, queue):
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add((loop, queue))
+
+    def unsubscribe(self, channel, loop, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, set())
+            subscribers.discard((loop, queue))
+            if not subscribers:
+                self._subscribers.pop(channel, None)
+
+
+broker = Broker()
+
+
+def current_id():
+    return broker.current_id()
+
+
+def render_event(event):
+    """
+        Adds the rendered answer fragment. Called once per event per process.
+    """
+    if event['type'] != 'delete':
+        try:
+            answer = Answer.objects.select_related('owner__userprofile', 'question').get(pk=event['answer'])
+        except Answer.DoesNotExist:
+            return event
+        event['html'] = render_to_string('questions/answer.html', {
+            'answer': answer,
+            'question': answer.question,
+            'MEDIA_URL': settings.MEDIA_URL
+        })
+    return event
+
+
+def dispatch(event):
+    broker.publish(event['question'], render_event(event))
+
+
+def publish(question_id, event_type, answer_id):
+    event = {'type': event_type, 'question': question_id, 'answer': answer_id}
+    if _setting('BACKEND', 'local') == 'postgres':
+        # NOTIFY is transactional, listeners only see committed events
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [NOTIFY_CHANNEL, json.dumps(event)])
+    else:
+        transaction.on_commit(lambda: dispatch(event))
+
+
+class Listener(threading.Thread):
+    """
+    Single LISTEN connection per process feeding the broker.
+    """
+    daemon = True
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception:
+                logger.exception('Answer events listener failed, reconnecting')
+                time.sleep(1)
+
+    def listen(self):
+        import psycopg2
+        from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+        conn = psycopg2.connect(**connections['default'].get_connection_params())
+        conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute('LISTEN %s' % NOTIFY_CHANNEL)
+            while True:
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    dispatch(json.loads(conn.notifies.pop(0).payload))
+                close_old_connections()
+        finally:
+            conn.close()
+
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def ensure_listener():
+    global _listener
+    if _setting('BACKEND', 'local') != 'postgres' or _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is None:
+            _listener = Listener()
+            _listener.start()
+
+
+def format_event(event):
+    data = json.dumps({'answer': event['answer'], 'html': event.get('html', '')})
+    return ('id: %s\nevent: %s\ndata: %s\n\n' % (event['id'], event['type'], data)).encode('utf8')
+
+
+def stream(question_id, last_id):
+    """
+        Server-sent events body for WSGI: the events the broker has and
+        nothing more, waiting for new ones would hold a worker thread.
+    """
+    ensure_listener()
+    yield ('retry: %i\n\n' % _setting('RETRY', 3000)).encode('utf8')
+    for event in broker.events_after(question_id, last_id):
+        yield format_event(event)
+
+
+async def _disconnected(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def asgi_stream(scope, receive, send, pk):
+    """
+        Server-sent events served directly on the event loop, open streams
+        don't hold a thread. Streams end after ANSWER_EVENTS_ASGI_STREAM_TIMEOUT
+        and the browser reconnects from the last event id it got.
+    """
+    # Streams have no request body, but it has to be received before
+    # http.disconnect can arrive
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        if not message.get('more_body', False):
+            break
+
+    ensure_listener()
+    question_id = int(pk)
+    last_id = parse_qs(scope.get('query_string', b'').decode('latin1')).get('after', [''])[0]
+    for name, value in scope.get('headers', []):
+        if name == b'last-event-id':
+            last_id = value.decode('latin1')
+    loop = asyncio.get_event_loop()
+    queue = asyncio.Queue()
+    broker.subscribe(question_id, loop, queue)
+    disconnect = asyncio.ensure_future(_disconnected(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache')]
+        })
+        await send({
+            'type': 'http.response.body',
+            'body': ('retry: %i\n\n' % _setting('RETRY', 3000)).encode('utf8'),
+            'more_body': True
+        })
+        # Events published since subscribing are queued as well
+        sent = set()
+        for event in broker.events_after(question_id, last_id):
+            sent.add(event['id'])
+            await send({'type': 'http.response.body', 'body': format_event(event), 'more_body': True})
+
+        deadline = loop.time() + _setting('ASGI_STREAM_TIMEOUT', 10 * 60)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            get = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait([get, disconnect], timeout=min(remaining, _setting('KEEPALIVE', 15)),
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnect in done:
+                get.cancel()
+                return
+            if get in done:
+                event = get.result()
+                if event['id'] in sent:
+                    continue
+                body = format_event(event)
+            else:
+                get.cancel()
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        disconnect.cancel()
+        broker.unsubscribe(question_id, loop, queue)
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, created, **kwargs):
+    publish(instance.question_id, 'new' if created else 'edit', instance.id)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    publish(instance.question_id, 'delete', instance.id)
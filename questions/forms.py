@@ -2,6 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.forms import ClearableFileInput
 from django.contrib.auth.models import User
+from django.urls import reverse_lazy
 
 from .models import Answer, UserProfile, Question, Tag
 
@@ -25,7 +26,11 @@ class RegisterForm(UserCreationForm):
         fields = ('username', 'email')
 
 class QuestionAskForm(forms.ModelForm):
-    tags = forms.CharField()
+    tags = forms.CharField(widget=forms.TextInput(attrs={
+        'class': 'tags-input',
+        'autocomplete': 'off',
+        'data-autocomplete': reverse_lazy('questions:tag_autocomplete')
+    }))
     class Meta:
         model = Question
         fields = ('title', 'text')
@@ -62,8 +67,7 @@ class QuestionAskForm(forms.ModelForm):
     def save(self, commit=True):
         question = super(QuestionAskForm, self).save(commit=commit)
         if self.tags is not None:
-            for t in self.tags:
-                question.tags.add(t)
+            question.tags.add(*self.tags)
         return question
 
 class QuestionEditForm(QuestionAskForm):
@@ -74,17 +78,16 @@ class QuestionEditForm(QuestionAskForm):
         self.fields['tags'].initial = ', '.join(tags_array)
 
     def save(self, commit=True):
-        question = super(QuestionEditForm, self).save(commit=commit)
-        question.tags.clear()
-        if self.tags is not None:
-            for t in self.tags:
-                question.tags.add(t)
+        # Skipping QuestionAskForm.save, tags are replaced rather than added
+        question = super(QuestionAskForm, self).save(commit=commit)
+        # Only the difference is written, so tag counters see real changes
+        question.tags.set(self.tags or [])
         return question
 
 class ProfileUpdateForm(forms.ModelForm):
     class Meta:
         model = UserProfile
-        fields = ('avatar', 'description', 'location', 'links')
+        fields = ('avatar', 'description', 'location', 'links', 'email_digest')
         widgets = {
             'avatar': CustomClearableFileInput
         }
@@ -0,0 +1,54 @@
+"""
+Typo tolerant lookups of question titles and usernames with pg_trgm.
+
+The trigram_similar lookup compiles to the % operator, which GIN trigram
+indexes on questions_question.title and auth_user.username can answer, with
+the threshold set per query through set_limit(). When the pg_trgm extension
+isn't installed on the database server (see migration 0008_trigram_indexes)
+questions aren't matched and users are matched by username prefix.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+
+from .models import Question
+
+_available = None
+
+
+def available():
+    global _available
+    if _available is None and connection.vendor != 'postgresql':
+        _available = False
+    if _available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _available = cursor.fetchone() is not None
+    return _available
+
+
+def _similar(queryset, field, query, limit, threshold):
+    if not available() or not query.strip():
+        return queryset.none()
+    with connection.cursor() as cursor:
+        # Threshold of the % operator for this connection
+        cursor.execute('SELECT set_limit(%s)', [threshold])
+    return queryset.filter(**{field + '__trigram_similar': query}) \
+        .annotate(similarity=TrigramSimilarity(field, query)).order_by('-similarity')[:limit]
+
+
+def search_questions(query, limit=None, threshold=None):
+    return _similar(Question.objects.all(), 'title', query,
+                    limit or getattr(settings, 'FUZZY_SEARCH_LIMIT', 20),
+                    threshold or getattr(settings, 'FUZZY_SEARCH_THRESHOLD', 0.3))
+
+
+def search_users(query, limit=None, threshold=None):
+    limit = limit or getattr(settings, 'FUZZY_SEARCH_LIMIT', 20)
+    users = User.objects.filter(is_active=True).select_related('userprofile')
+    if not query.strip():
+        return users.none()
+    if not available():
+        return users.filter(username__istartswith=query.strip()).order_by('username')[:limit]
+    return _similar(users, 'username', query, limit, threshold or getattr(settings, 'FUZZY_SEARCH_THRESHOLD', 0.3))
@@ -0,0 +1,124 @@
+"""
+Precomputed ranking of hot questions.
+
+A question's heat adds up its events, each weighted and decayed by half every
+HOT_QUESTIONS_HALF_LIFE seconds: being asked (plus the log of its views), new
+answers and an accepted answer. Scores are kept forward decayed, relative to
+the time of the last full computation, so a new event only adds its weight
+scaled up by the time passed and never requires touching the other scores.
+
+compute() runs the single ranking query for questions active in the last
+HOT_QUESTIONS_WINDOW seconds and stores the top HOT_QUESTIONS_SIZE in the
+HotQuestion table, shared by every process. It's meant to be run periodically
+with the compute_hot_questions command. Reading a missing ranking or one older
+than HOT_QUESTIONS_MAX_AGE seconds queues a recomputation as a background task
+and serves what's stored meanwhile. bump() adds new activity to the stored
+ranking in between with a single upsert.
+"""
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Question, Answer, HotQuestion, Task
+from .tasks import task, enqueue
+
+QUESTION = 1.0
+VIEWS = 0.5
+ANSWER = 2.0
+ACCEPTED = 3.0
+
+
+def _setting(name, default):
+    return getattr(settings, 'HOT_QUESTIONS_' + name, default)
+
+
+@task
+def compute():
+    """
+        Recomputes and stores the ranking, returns it as a list of
+        [question id, score] pairs.
+    """
+    reference = time.time()
+    half_life = _setting('HALF_LIFE', 12 * 60 * 60)
+    decay = "power(2, (extract(epoch from {column}) - %(reference)s)::float8 / %(half_life)s)"
+    hot = connection.ops.quote_name(HotQuestion._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Concurrent computations and bumps wait, readers see the previous ranking
+        cursor.execute('LOCK TABLE %s IN EXCLUSIVE MODE' % hot)
+        cursor.execute('DELETE FROM %s' % hot)
+        cursor.execute("""
+            WITH answered AS (
+                SELECT a.question_id,
+                       SUM((%(answer)s + CASE WHEN a.is_accepted THEN %(accepted)s ELSE 0 END) * {answer_decay}) AS heat
+                FROM {answer} a
+                WHERE a.creation_time >= to_timestamp(%(since)s)
+                GROUP BY a.question_id
+            )
+            INSERT INTO {hot} (question_id, heat, reference)
+            SELECT q.id, COALESCE(answered.heat, 0) + (%(question)s + %(views)s * ln(1 + q.views)) * {question_decay},
+                   %(reference)s
+            FROM {question} q
+            LEFT JOIN answered ON answered.question_id = q.id
+            WHERE NOT q.is_deleted AND (q.creation_time >= to_timestamp(%(since)s) OR answered.question_id IS NOT NULL)
+            ORDER BY 2 DESC, q.id DESC
+            LIMIT %(size)s
+            RETURNING question_id, heat
+        """.format(
+            hot=hot,
+            answer=connection.ops.quote_name(Answer._meta.db_table),
+            question=connection.ops.quote_name(Question._meta.db_table),
+            answer_decay=decay.format(column='a.creation_time'),
+            question_decay=decay.format(column='q.creation_time')
+        ), {
+            'reference': reference,
+            'half_life': half_life,
+            'since': reference - _setting('WINDOW', 14 * 24 * 60 * 60),
+            'size': _setting('SIZE', 2000),
+            'question': QUESTION,
+            'views': VIEWS,
+            'answer': ANSWER,
+            'accepted': ACCEPTED
+        })
+        ranking = [[question_id, heat] for question_id, heat in cursor.fetchall()]
+    ranking.sort(key=lambda e: (-e[1], -e[0]))
+    return ranking
+
+
+def ranked_ids():
+    """
+        Ids of hot questions, hottest first. A missing ranking or one older than
+        HOT_QUESTIONS_MAX_AGE gets recomputed by a worker, not in the request.
+    """
+    rows = list(HotQuestion.objects.order_by('-heat', '-question_id')
+                .values_list('question_id', 'reference')[:_setting('SIZE', 2000)])
+    if not rows or rows[0][1] < time.time() - _setting('MAX_AGE', 60 * 60):
+        if not Task.objects.filter(name=compute.task_name, status=Task.QUEUED).exists():
+            enqueue(compute)
+    return [question_id for question_id, _ in rows]
+
+
+def bump(question_id, weight):
+    """
+        Adds an event of weight happening now to the question's heat. Questions
+        outside the ranking enter it with just this event, the next compute()
+        drops the ones that don't make it.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO {hot} (question_id, heat, reference)
+            SELECT %s, %s * power(2, (%s - reference) / %s), reference
+            FROM (SELECT max(reference) AS reference FROM {hot}) latest
+            WHERE reference IS NOT NULL
+            ON CONFLICT (question_id) DO UPDATE SET heat = {hot}.heat + EXCLUDED.heat
+        """.format(hot=connection.ops.quote_name(HotQuestion._meta.db_table)), [
+            question_id, weight, time.time(), _setting('HALF_LIFE', 12 * 60 * 60)
+        ])
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.question_id, ANSWER)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from questions import rendering
+from questions.models import Question
+from questions.sql import update_from_values
+
+
+class Command(BaseCommand):
+    help = 'Fills in missing question excerpts, from the stored HTML where there is one.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--all', action='store_true', help='Recompute every excerpt, e.g. after changing their length')
+
+    def handle(self, *args, **options):
+        queryset = Question.objects.order_by('pk')
+        if not options['all']:
+            queryset = queryset.filter(excerpt='')
+        filled = 0
+        last_pk = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last_pk).values_list('pk', 'text', 'text_html')[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+            rows = [(pk, rendering.excerpt(text_html or rendering.render(text))) for pk, text, text_html in batch]
+            filled += update_from_values(Question, ['id', 'excerpt'], rows, {'excerpt': 'v.excerpt'})
+        self.stdout.write('Filled %i excerpt%s.' % (filled, 's' if filled != 1 else ''))
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from questions import search
+
+BACKENDS = ['questions.search.PostgresSearchBackend', 'questions.search.InvertedIndexBackend']
+
+
+class Command(BaseCommand):
+    help = 'Times the same queries against every search backend and compares their top results.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*', help='Queries to run, read one per line from --file otherwise')
+        parser.add_argument('--file', help='File with one query per line')
+        parser.add_argument('--repeat', type=int, default=10)
+        parser.add_argument('--top', type=int, default=10, help='Results compared between backends')
+
+    def handle(self, *args, **options):
+        queries = list(options['queries'])
+        if options['file']:
+            with open(options['file']) as f:
+                queries.extend(line.strip() for line in f if line.strip())
+        results = {}
+        for path in BACKENDS:
+            backend = search.get_backend(path)
+            started = time.time()
+            # Builds in-process indexes so that only queries are timed
+            backend.search('warmup')
+            self.stdout.write('%s: ready in %.1f ms' % (path, (time.time() - started) * 1000))
+            for query in queries:
+                started = time.time()
+                for _ in range(options['repeat']):
+                    ids = backend.search(query)
+                elapsed = (time.time() - started) * 1000 / options['repeat']
+                results.setdefault(query, []).append(ids[:options['top']])
+                self.stdout.write('  %-40s %8.2f ms  %i results' % (query[:40], elapsed, len(ids)))
+        for query, top in results.items():
+            shared = set(top[0]).intersection(*top[1:])
+            self.stdout.write('"%s": %i of the top %i results shared' % (query, len(shared), options['top']))
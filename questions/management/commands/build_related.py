@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import related
+
+
+class Command(BaseCommand):
+    help = 'Computes the related questions shown next to each question. Requires NumPy and SciPy.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--new', action='store_true',
+                            help='Only add questions without related questions yet, instead of rebuilding everything')
+        parser.add_argument('--count', type=int, help='Related questions stored per question')
+
+    def handle(self, *args, **options):
+        try:
+            import numpy, scipy
+        except ImportError:
+            raise CommandError('build_related requires NumPy and SciPy.')
+        if options['new']:
+            processed = related.update(k=options['count'])
+            self.stdout.write('Added %i new question%s.' % (processed, 's' if processed != 1 else ''))
+        else:
+            stored = related.build(k=options['count'])
+            self.stdout.write('Stored %i related question pair%s.' % (stored, 's' if stored != 1 else ''))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from stackoverflow.sessions import SessionStore
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired sessions from the database in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000))
+
+    def handle(self, *args, **options):
+        deleted = SessionStore.clear_expired(batch_size=options['batch_size'])
+        self.stdout.write('Deleted %i expired session%s.' % (deleted, 's' if deleted != 1 else ''))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from questions import hot
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the stored ranking of hot questions. Meant to be run every few minutes.'
+
+    def handle(self, *args, **options):
+        ranking = hot.compute()
+        self.stdout.write('Ranked %i hot question%s.' % (len(ranking), 's' if len(ranking) != 1 else ''))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions import tagtools
+
+
+class Command(BaseCommand):
+    help = 'Deletes tags that are not used by any question, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'TAG_GC_BATCH_SIZE', 1000))
+
+    def handle(self, *args, **options):
+        deleted = tagtools.collect_orphans(batch_size=options['batch_size'])
+        self.stdout.write('Deleted %i unused tag%s.' % (deleted, 's' if deleted != 1 else ''))
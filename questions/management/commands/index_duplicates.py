@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from questions import duplicates
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the MinHash signatures used to suggest duplicate questions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        indexed = duplicates.reindex(batch_size=options['batch_size'])
+        self.stdout.write('Indexed %i question%s.' % (indexed, 's' if indexed != 1 else ''))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from questions import tagtools
+from questions.models import Tag
+
+
+class Command(BaseCommand):
+    help = 'Merges a tag into another one, or renames it if no tag has the new name yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Name of the tag to merge away')
+        parser.add_argument('target', help='Name of the tag to keep')
+
+    def handle(self, *args, **options):
+        try:
+            source = Tag.objects.get(name=options['source'])
+        except Tag.DoesNotExist:
+            raise CommandError('Tag "%s" does not exist.' % options['source'])
+        target = tagtools.rename(source, options['target'])
+        if target.pk == source.pk:
+            self.stdout.write('Renamed "%s" to "%s".' % (options['source'], target.name))
+        else:
+            self.stdout.write('Merged "%s" into "%s".' % (options['source'], target.name))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions import deletion
+
+
+class Command(BaseCommand):
+    help = 'Removes soft deleted questions along with their answers, deleting answers in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'QUESTION_PURGE_BATCH_SIZE', 500))
+
+    def handle(self, *args, **options):
+        purged = deletion.purge(batch_size=options['batch_size'])
+        self.stdout.write('Purged %i question%s.' % (purged, 's' if purged != 1 else ''))
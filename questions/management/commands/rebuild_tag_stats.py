@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from questions import tagstats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the tags directory counters from the question-tag table.'
+
+    def handle(self, *args, **options):
+        rebuilt = tagstats.rebuild()
+        self.stdout.write('Rebuilt statistics of %i tag%s.' % (rebuilt, 's' if rebuilt != 1 else ''))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from questions import userstats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every user\'s question, answer and reputation totals. Meant to be run nightly.'
+
+    def handle(self, *args, **options):
+        fixed = userstats.reconcile()
+        self.stdout.write('Updated %i user stat%s.' % (fixed, 's' if fixed != 1 else ''))
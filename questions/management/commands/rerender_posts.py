@@ -0,0 +1,58 @@
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+
+from questions import rendering
+from questions.models import Question, Answer
+from questions.sql import update_from_values
+
+
+def render_batch(args):
+    """
+        Runs in worker processes, which only render and never use the database.
+    """
+    with_excerpt, rows = args
+    rendered = []
+    for pk, text in rows:
+        fields = rendering.render_fields(text, with_excerpt)
+        rendered.append((pk, fields['text_html'], rendering.RENDER_VERSION) +
+                        ((fields['excerpt'],) if with_excerpt else ()))
+    return rendered
+
+
+class Command(BaseCommand):
+    help = 'Renders question and answer bodies stored with an older renderer version, in parallel batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--all', action='store_true', help='Render every post again, not only outdated ones')
+
+    def read_batches(self, queryset, last_pk, count, batch_size):
+        batches = []
+        for _ in range(count):
+            rows = list(queryset.filter(pk__gt=last_pk).values_list('pk', 'text')[:batch_size])
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            batches.append(rows)
+        return batches, last_pk
+
+    def handle(self, *args, **options):
+        # Forked workers inherit the database connection but never use it
+        with Pool(options['workers']) as pool:
+            for model in (Question, Answer):
+                with_excerpt = model is Question
+                columns = ['id', 'text_html', 'render_version'] + (['excerpt'] if with_excerpt else [])
+                queryset = model.objects.order_by('pk')
+                if not options['all']:
+                    queryset = queryset.filter(render_version__lt=rendering.RENDER_VERSION)
+                updated = 0
+                last_pk = 0
+                while True:
+                    batches, last_pk = self.read_batches(queryset, last_pk, options['workers'], options['batch_size'])
+                    if not batches:
+                        break
+                    for rows in pool.map(render_batch, [(with_excerpt, rows) for rows in batches]):
+                        updated += update_from_values(model, columns, rows, dict((c, 'v.' + c) for c in columns[1:]))
+                self.stdout.write('Rendered %i %s%s.' % (updated, model._meta.verbose_name, 's' if updated != 1 else ''))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions import tasks
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background tasks on a pool of threads or processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'TASK_WORKERS', 4))
+        parser.add_argument('--processes', action='store_true', help='Run tasks in processes instead of threads')
+        parser.add_argument('--once', action='store_true', help='Exit when no task is due instead of polling')
+
+    def handle(self, *args, **options):
+        count = tasks.work(workers=options['workers'], processes=options['processes'], once=options['once'])
+        self.stdout.write('Ran %i task%s.' % (count, 's' if count != 1 else ''))
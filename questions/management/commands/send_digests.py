@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions import notifications
+
+
+class Command(BaseCommand):
+    help = 'Queues daily digest emails of unread notifications, for users who opted in. Meant to be run once a day.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'NOTIFICATION_DIGEST_BATCH_SIZE', 500))
+
+    def handle(self, *args, **options):
+        queued = notifications.send_digests(batch_size=options['batch_size'])
+        self.stdout.write('Queued %i digest%s.' % (queued, 's' if queued != 1 else ''))
@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from questions import outbox
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails, each batch over one mail server connection. Meant to be run every minute.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=getattr(settings, 'OUTBOX_BATCH_SIZE', 100))
+
+    def handle(self, *args, **options):
+        sent = outbox.send_pending(batch_size=options['batch_size'])
+        self.stdout.write('Sent %i email%s.' % (sent, 's' if sent != 1 else ''))
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 17:49
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0004_tag_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='questions.Tag')),
+                ('question_count', models.IntegerField(db_index=True, default=0)),
+                ('week_start', models.DateField(null=True)),
+                ('week_count', models.IntegerField(default=0)),
+                ('last_activity', models.DateTimeField(null=True)),
+            ],
+        ),
+        # Weekly counts start at zero, rebuild_tag_stats fills them in
+        migrations.RunSQL(
+            """
+            INSERT INTO questions_tagstats (tag_id, question_count, week_count, last_activity)
+            SELECT t.id, COUNT(q.id), 0, MAX(q.creation_time)
+            FROM questions_tag t
+            LEFT JOIN questions_question_tags qt ON qt.tag_id = t.id
+            LEFT JOIN questions_question q ON q.id = qt.question_id
+            GROUP BY t.id
+            """,
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 17:55
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0005_tag_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedQuestion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='questions.Question')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.Question')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='relatedquestion',
+            index=models.Index(fields=['question', '-score'], name='related_question_score_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='relatedquestion',
+            unique_together=set([('question', 'related')]),
+        ),
+    ]
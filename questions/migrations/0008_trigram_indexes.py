@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+INDEXES = [
+    ('question_title_trgm_idx', 'questions_question', 'title'),
+    ('auth_user_username_trgm_idx', 'auth_user', 'username'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm ships with contrib, fuzzy search stays disabled where it's missing
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in INDEXES:
+        schema_editor.execute('CREATE INDEX IF NOT EXISTS %s ON %s USING gin (%s gin_trgm_ops)' % (name, table, column))
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for name, table, column in INDEXES:
+        schema_editor.execute('DROP INDEX IF EXISTS %s' % name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('questions', '0007_question_minhash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
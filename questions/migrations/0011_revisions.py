@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 18:10
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import json
+import zlib
+
+BATCH_SIZE = 1000
+
+
+def _snapshot(content):
+    return zlib.compress(json.dumps(content, separators=(',', ':')).encode('utf8'))
+
+
+def create_first_revisions(apps, schema_editor):
+    # Existing posts start their history with a snapshot of their current content
+    for model_name, revision_name, fields in [('Question', 'QuestionRevision', ('title', 'text')),
+                                              ('Answer', 'AnswerRevision', ('text',))]:
+        model = apps.get_model('questions', model_name)
+        revision = apps.get_model('questions', revision_name)
+        foreign_key = model_name.lower() + '_id'
+        last_id = 0
+        while True:
+            batch = list(model.objects.filter(pk__gt=last_id).order_by('pk')
+                         .values_list('id', 'owner_id', 'creation_time', *fields)[:BATCH_SIZE])
+            if not batch:
+                break
+            revision.objects.bulk_create([
+                revision(number=1, author_id=row[1], created=row[2], is_snapshot=True,
+                         data=_snapshot(dict(zip(fields, row[3:]))), **{foreign_key: row[0]})
+                for row in batch
+            ])
+            last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0010_rendered_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnswerRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('created', models.DateTimeField()),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('data', models.BinaryField()),
+                ('answer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='questions.Answer')),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionRevision',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('number', models.PositiveIntegerField()),
+                ('created', models.DateTimeField()),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('data', models.BinaryField()),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='questions.Question')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='questionrevision',
+            unique_together=set([('question', 'number')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='answerrevision',
+            unique_together=set([('answer', 'number')]),
+        ),
+        migrations.RunPython(create_first_revisions, migrations.RunPython.noop),
+    ]
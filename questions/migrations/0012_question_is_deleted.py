@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 18:15
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0011_revisions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
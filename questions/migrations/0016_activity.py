@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 18:22
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def fill_feeds(apps, schema_editor):
+    # Feeds start with the questions and answers posted so far, capped like new entries
+    schema_editor.execute("""
+        INSERT INTO questions_activity (user_id, kind, question_id, answer_id, created)
+        SELECT user_id, kind, question_id, answer_id, created FROM (
+            SELECT q.owner_id AS user_id, 'asked' AS kind, q.id AS question_id, NULL::integer AS answer_id,
+                   q.creation_time AS created
+            FROM questions_question q
+            WHERE NOT q.is_deleted
+            UNION ALL
+            SELECT a.owner_id, 'answered', a.question_id, a.id, a.creation_time
+            FROM questions_answer a JOIN questions_question q ON q.id = a.question_id
+            WHERE NOT q.is_deleted
+        ) entries
+        ORDER BY created
+    """)
+    schema_editor.execute("""
+        DELETE FROM questions_activity WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY user_id ORDER BY id DESC) AS position
+                FROM questions_activity
+            ) ranked
+            WHERE position > %s
+        )
+    """, [getattr(settings, 'ACTIVITY_FEED_SIZE', 200)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('questions', '0015_notifications'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('asked', 'Asked'), ('answered', 'Answered'), ('accepted', 'Accepted an answer to'), ('edited', 'Edited')], max_length=10)),
+                ('created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('answer', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.Answer')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='questions.Question')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activities', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['user', '-id'], name='activity_user_id_idx'),
+        ),
+        migrations.RunPython(fill_feeds, migrations.RunPython.noop),
+    ]
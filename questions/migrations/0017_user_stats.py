@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 18:25
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_user_stats(apps, schema_editor):
+    # Same totals as questions.userstats.reconcile()
+    schema_editor.execute("""
+        INSERT INTO questions_userstats (user_id, question_count, answer_count, accepted_count, reputation)
+        SELECT u.id, COALESCE(q.count, 0), COALESCE(a.count, 0), COALESCE(a.accepted, 0),
+               COALESCE(q.score, 0) * 5 + COALESCE(a.score, 0) * 10 + COALESCE(a.accepted, 0) * 15
+        FROM auth_user u
+        LEFT JOIN (
+            SELECT owner_id, COUNT(*) AS count, SUM(score) AS score
+            FROM questions_question WHERE NOT is_deleted GROUP BY owner_id
+        ) q ON q.owner_id = u.id
+        LEFT JOIN (
+            SELECT a.owner_id, COUNT(*) AS count, COUNT(*) FILTER (WHERE a.is_accepted) AS accepted, SUM(a.score) AS score
+            FROM questions_answer a JOIN questions_question q ON q.id = a.question_id
+            WHERE NOT q.is_deleted GROUP BY a.owner_id
+        ) a ON a.owner_id = u.id
+    """)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0008_alter_user_username_max_length'),
+        ('questions', '0016_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('question_count', models.PositiveIntegerField(default=0)),
+                ('answer_count', models.PositiveIntegerField(default=0)),
+                ('accepted_count', models.PositiveIntegerField(default=0)),
+                ('reputation', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_user_stats, migrations.RunPython.noop),
+    ]
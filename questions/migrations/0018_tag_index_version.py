@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0017_user_stats'),
+    ]
+
+    operations = [
+        # Version of the tag autocompletion index, see questions/tagindex.py
+        migrations.RunSQL('CREATE SEQUENCE questions_tag_index_version',
+                          'DROP SEQUENCE questions_tag_index_version'),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 18:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0018_tag_index_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HotQuestion',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='questions.Question')),
+                ('heat', models.FloatField()),
+                ('reference', models.FloatField()),
+            ],
+        ),
+    ]
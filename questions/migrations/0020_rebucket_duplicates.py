@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import hashlib
+import struct
+
+from django.db import migrations
+
+# Frozen copy of questions.duplicates.buckets() as of this migration
+BAND_ROWS = 4
+
+
+def buckets(minhash):
+    result = []
+    for band, start in enumerate(range(0, len(minhash), BAND_ROWS)):
+        data = struct.pack('>%iI' % (BAND_ROWS + 1), band, *minhash[start:start + BAND_ROWS])
+        result.append(struct.unpack('>q', hashlib.blake2b(data, digest_size=8).digest())[0])
+    return result
+
+
+def rebucket(apps, schema_editor):
+    # Bands went from 2 to 4 rows, the stored signatures stay valid
+    Question = apps.get_model('questions', 'Question')
+    table = schema_editor.quote_name(Question._meta.db_table)
+    last_id = 0
+    while True:
+        batch = list(Question.objects.filter(pk__gt=last_id).order_by('pk').values_list('id', 'minhash')[:1000])
+        if not batch:
+            return
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute("""
+                UPDATE {table} SET lsh_buckets = v.lsh_buckets::bigint[]
+                FROM (VALUES {values}) AS v (id, lsh_buckets)
+                WHERE {table}.id = v.id
+            """.format(table=table, values=', '.join(['(%s, %s)'] * len(batch))),
+                [value for question_id, minhash in batch for value in (question_id, buckets(minhash))])
+        last_id = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0019_hot_questions'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebucket, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-19 21:12
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('questions', '0020_rebucket_duplicates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='unread_notifications',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunSQL(
+            """
+            UPDATE questions_userprofile p SET unread_notifications = c.count
+            FROM (
+                SELECT n.user_id, COUNT(*) AS count
+                FROM questions_notification n
+                JOIN questions_answer a ON a.id = n.answer_id
+                JOIN questions_question q ON q.id = a.question_id
+                WHERE NOT n.is_read AND NOT q.is_deleted
+                GROUP BY n.user_id
+            ) c
+            WHERE c.user_id = p.user_id
+            """,
+            migrations.RunSQL.noop
+        ),
+    ]
@@ -1,11 +1,16 @@
+from datetime import timedelta
+
 from django.db import models
 from django.dispatch import receiver
 from django.forms import TextInput
 from django_resized import ResizedImageField
+from django.utils import timezone
 from django.utils.deconstruct import deconstructible
 from django.contrib.auth.models import User as AuthUser
-from django.db.models.signals import post_save, post_delete
-from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.fields import ArrayField, JSONField
+from django.contrib.postgres.indexes import GinIndex
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import Signal
 from django.core.files.storage import default_storage
 
 # Create your models here.
@@ -26,6 +31,10 @@ class UserProfile(models.Model):
     description = models.TextField(null=True)
     location = models.CharField(max_length=100, null=True)
     links = ArrayField(models.CharField(max_length=100), size=10, null=True)
+    # Unread notifications are also emailed once a day, see questions.notifications
+    email_digest = models.BooleanField(default=False, verbose_name='Daily email digest')
+    # Unread notifications of live questions, kept up to date by questions.notifications
+    unread_notifications = models.IntegerField(default=0)
 
     def __str__(self):
         return self.user.username
@@ -55,18 +64,92 @@ def delete_avatar_file(sender, instance, **kwargs):
     if instance.avatar.name != 'avatars/default.png':
         default_storage.delete(instance.avatar.name)
 
+class UserStats(models.Model):
+    """
+    Totals shown with a user, kept up to date by questions.userstats and
+    recomputed nightly by the reconcile_user_stats command.
+    """
+    user = models.OneToOneField(AuthUser, primary_key=True, related_name='stats')
+    question_count = models.PositiveIntegerField(default=0)
+    answer_count = models.PositiveIntegerField(default=0)
+    accepted_count = models.PositiveIntegerField(default=0)
+    reputation = models.IntegerField(default=0)
+
 class Tag(models.Model):
-    name = models.CharField(max_length=100)
+    name = models.CharField(max_length=100, db_index=True)
 
     def __str__(self):
         return self.name
 
+def current_week_start():
+    today = timezone.localdate()
+    return today - timedelta(days=today.weekday())
+
+class TagStats(models.Model):
+    """
+    Denormalized tag counters for the tags directory, maintained by
+    questions.tagstats and rebuilt with the rebuild_tag_stats command.
+    """
+    tag = models.OneToOneField(Tag, primary_key=True, related_name='stats')
+    question_count = models.IntegerField(default=0, db_index=True)
+    # Questions asked in the week starting on week_start
+    week_start = models.DateField(null=True)
+    week_count = models.IntegerField(default=0)
+    last_activity = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return self.tag.name
+
+    @property
+    def questions_this_week(self):
+        return self.week_count if self.week_start == current_week_start() else 0
+
+class QuestionManager(models.Manager):
+    """
+    Questions that aren't deleted. Deleted questions stay in the table until
+    questions.deletion purges them and are only reachable through all_objects.
+    """
+    def get_queryset(self):
+        return super(QuestionManager, self).get_queryset().filter(is_deleted=False)
+
 class Question(models.Model):
     title = models.CharField(max_length=200, null=False)
     text = models.TextField(null=False, editable=True)
     creation_time = models.DateTimeField()
     owner = models.ForeignKey(AuthUser)
     tags = models.ManyToManyField(Tag, blank=True)
+    # Flushed in batches by questions.counters, may lag behind by a few seconds
+    views = models.PositiveIntegerField(default=0)
+    # Sum of votes, kept up to date by questions.votes
+    score = models.IntegerField(default=0)
+    # MinHash signature of title and text and its LSH band hashes, see questions.duplicates
+    minhash = ArrayField(models.IntegerField(), default=list, editable=False)
+    lsh_buckets = ArrayField(models.BigIntegerField(), default=list, editable=False)
+    # Incremented on every save, keys caches derived from title and text
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Rendered from text on save, see questions.rendering
+    text_html = models.TextField(default='', editable=False)
+    excerpt = models.CharField(max_length=200, default='', editable=False)
+    render_version = models.PositiveSmallIntegerField(default=0, editable=False)
+    # Hidden right away by QuestionDeleteView, the rows are removed later, see questions.deletion
+    is_deleted = models.BooleanField(default=False, editable=False)
+
+    objects = QuestionManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=['lsh_buckets'], name='question_lsh_buckets_idx')
+        ]
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self.version += 1
+        elif 'title' in update_fields or 'text' in update_fields:
+            self.version += 1
+            kwargs['update_fields'] = list(update_fields) + ['version']
+        super(Question, self).save(*args, **kwargs)
 
     def get_absolute_url(self):
         return '/questions/%i/' % self.id
@@ -74,15 +157,215 @@ class Question(models.Model):
     def __str__(self):
         return self.title
 
+# Sent with the affected (question id, tag id) pairs whenever questions gain or
+# lose tags, including tags dropped together with a deleted question.
+question_tags_changed = Signal(providing_args=['pairs', 'added'])
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def send_question_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('pre_clear', 'pre_remove'):
+        # post_clear doesn't say what was removed and post_remove also lists
+        # pairs that didn't exist, so the removed pairs are read beforehand
+        if reverse:
+            existing = sender.objects.filter(tag_id=instance.pk)
+            if pk_set is not None:
+                existing = existing.filter(question_id__in=pk_set)
+        else:
+            existing = sender.objects.filter(question_id=instance.pk)
+            if pk_set is not None:
+                existing = existing.filter(tag_id__in=pk_set)
+        instance._removed_tag_pairs = list(existing.values_list('question_id', 'tag_id'))
+        return
+    if action in ('post_clear', 'post_remove'):
+        pairs = getattr(instance, '_removed_tag_pairs', [])
+    elif action == 'post_add':
+        pairs = [(pk, instance.pk) if reverse else (instance.pk, pk) for pk in pk_set]
+    else:
+        return
+    if pairs:
+        question_tags_changed.send(sender=Question, pairs=pairs, added=action == 'post_add')
+
+@receiver(pre_delete, sender=Question)
+def send_deleted_question_tags(sender, instance, **kwargs):
+    pairs = [(instance.pk, t) for t in instance.tags.values_list('id', flat=True)]
+    if pairs:
+        question_tags_changed.send(sender=Question, pairs=pairs, added=False)
+
 class Answer(models.Model):
     text = models.TextField(null=False)
     creation_time = models.DateTimeField()
     owner = models.ForeignKey(AuthUser)
     question = models.ForeignKey(Question)
     is_accepted = models.BooleanField(null=False, default=False)
+    score = models.IntegerField(default=0)
+    # Rendered from text on save, see questions.rendering
+    text_html = models.TextField(default='', editable=False)
+    render_version = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['question', '-score'], name='answer_question_score_idx')
+        ]
 
     def get_absolute_url(self):
         return '/questions/%i/' % self.question.id
 
     def __str__(self):
         return self.question.title + ', ' + self.owner.username
+
+class QuestionVote(models.Model):
+    user = models.ForeignKey(AuthUser)
+    question = models.ForeignKey(Question)
+    value = models.SmallIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'question')
+
+class AnswerVote(models.Model):
+    user = models.ForeignKey(AuthUser)
+    answer = models.ForeignKey(Answer)
+    value = models.SmallIntegerField()
+
+    class Meta:
+        unique_together = ('user', 'answer')
+
+class RelatedQuestion(models.Model):
+    """
+    Precomputed nearest neighbours of a question, see questions.related.
+    """
+    question = models.ForeignKey(Question, related_name='related_links')
+    related = models.ForeignKey(Question, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('question', 'related')
+        indexes = [
+            models.Index(fields=['question', '-score'], name='related_question_score_idx')
+        ]
+
+class HotQuestion(models.Model):
+    """
+    Entry of the hot questions ranking, maintained by questions.hot. Heat is
+    forward decayed relative to reference, the epoch time of the computation.
+    """
+    question = models.OneToOneField(Question, primary_key=True, related_name='+')
+    heat = models.FloatField()
+    reference = models.FloatField()
+
+class Revision(models.Model):
+    """
+    Revision of a question's or an answer's content. Stored zlib compressed,
+    as a full snapshot or as a line delta against the previous revision, see
+    questions.revisions.
+    """
+    number = models.PositiveIntegerField()
+    author = models.ForeignKey(AuthUser, null=True, on_delete=models.SET_NULL, related_name='+')
+    created = models.DateTimeField()
+    is_snapshot = models.BooleanField(default=False)
+    data = models.BinaryField()
+
+    class Meta:
+        abstract = True
+
+class QuestionRevision(Revision):
+    question = models.ForeignKey(Question, related_name='revisions')
+
+    class Meta:
+        unique_together = ('question', 'number')
+
+class AnswerRevision(Revision):
+    answer = models.ForeignKey(Answer, related_name='revisions')
+
+    class Meta:
+        unique_together = ('answer', 'number')
+
+class Task(models.Model):
+    """
+    Call of a function decorated with questions.tasks.task, waiting for a
+    worker. Finished tasks are deleted, failed ones are kept.
+    """
+    QUEUED = 'queued'
+    FAILED = 'failed'
+
+    name = models.CharField(max_length=200)
+    args = JSONField(default=list)
+    kwargs = JSONField(default=dict)
+    status = models.CharField(max_length=10, default=QUEUED, choices=[(QUEUED, 'Queued'), (FAILED, 'Failed')])
+    # Not claimed before, pushed forward while a worker runs the task and after failures
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField()
+    created = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx')
+        ]
+
+    def __str__(self):
+        return self.name
+
+class OutboxEmail(models.Model):
+    """
+    Email written in the transaction of the change it's about, delivered by
+    the send_outbox command, see questions.outbox.
+    """
+    PENDING = 'pending'
+    DEAD = 'dead'
+
+    to = models.EmailField()
+    subject = models.CharField(max_length=200)
+    body = models.TextField()
+    status = models.CharField(max_length=10, default=PENDING, choices=[(PENDING, 'Pending'), (DEAD, 'Dead')])
+    # Not sent before, pushed forward while a sender has it and after failures
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='outbox_status_run_at_idx')
+        ]
+
+    def __str__(self):
+        return '%s: %s' % (self.to, self.subject)
+
+class Notification(models.Model):
+    """
+    New answer to a question the user asked or answered, see
+    questions.notifications.
+    """
+    user = models.ForeignKey(AuthUser, related_name='notifications')
+    answer = models.ForeignKey(Answer, related_name='+')
+    created = models.DateTimeField(default=timezone.now)
+    is_read = models.BooleanField(default=False)
+    # Included in a digest email already
+    is_emailed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='notification_user_read_idx')
+        ]
+
+class Activity(models.Model):
+    """
+    Entry of a user's activity feed, see questions.activity.
+    """
+    ASKED = 'asked'
+    ANSWERED = 'answered'
+    ACCEPTED = 'accepted'
+    EDITED = 'edited'
+
+    user = models.ForeignKey(AuthUser, related_name='activities')
+    kind = models.CharField(max_length=10, choices=[(ASKED, 'Asked'), (ANSWERED, 'Answered'),
+                                                    (ACCEPTED, 'Accepted an answer to'), (EDITED, 'Edited')])
+    question = models.ForeignKey(Question, related_name='+')
+    answer = models.ForeignKey(Answer, null=True, related_name='+')
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-id'], name='activity_user_id_idx')
+        ]
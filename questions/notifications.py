@@ -0,0 +1,123 @@
+"""
+Notifications of new answers.
+
+A new answer notifies the question's owner and everyone else who answered
+it, with a single bulk INSERT however many they are. Unread counts, shown in
+the page header, are kept in a counter column of the user profiles, shared by
+every process, so pages don't count rows. Like the user totals they only
+cover live questions: the counters are changed with one UPDATE as
+notifications are added and read, and as questions are soft deleted or
+answers deleted.
+
+Users who opt in get unread notifications emailed once a day by the
+send_digests command, one email per user listing new answers per question,
+written to the outbox for batches of users at a time.
+"""
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from . import outbox
+from .models import Question, Answer, Notification, UserProfile
+from .sql import update_from_values
+
+
+def _unread_removed(notifications):
+    """
+        Takes the unread ones among notifications off their users' counts.
+    """
+    rows = sorted(notifications.filter(is_read=False).order_by().values_list('user__userprofile')
+                  .annotate(count=Count('id')))
+    update_from_values(UserProfile, ['id', 'unread_notifications'], rows,
+                       {'unread_notifications': 'GREATEST(t.unread_notifications - v.unread_notifications, 0)'})
+
+
+def unread_count(user_id):
+    count = UserProfile.objects.filter(user=user_id).values_list('unread_notifications', flat=True).first()
+    return max(count or 0, 0)
+
+
+def recipients(answer):
+    user_ids = set(Answer.objects.filter(question=answer.question_id).values_list('owner_id', flat=True).distinct())
+    user_ids.update(Question.all_objects.filter(pk=answer.question_id).values_list('owner_id', flat=True))
+    user_ids.discard(answer.owner_id)
+    return sorted(user_ids)
+
+
+def fan_out(answer):
+    user_ids = recipients(answer)
+    Notification.objects.bulk_create([Notification(user_id=user_id, answer=answer, created=answer.creation_time)
+                                      for user_id in user_ids])
+    if user_ids:
+        UserProfile.objects.filter(user__in=user_ids).update(unread_notifications=F('unread_notifications') + 1)
+    return len(user_ids)
+
+
+def mark_read(user_id, notification_ids):
+    read = Notification.objects.filter(user=user_id, pk__in=notification_ids, is_read=False,
+                                       answer__question__is_deleted=False).update(is_read=True)
+    if read:
+        UserProfile.objects.filter(user=user_id).update(unread_notifications=F('unread_notifications') - read)
+    return read
+
+
+def _digest(username, questions):
+    lines = ['Hi %s, there are new answers to questions you follow:' % username, '']
+    for (question_id, title), count in questions.items():
+        lines.append('%i new answer%s to "%s"' % (count, 's' if count != 1 else '', title))
+        lines.append('%s/questions/%i/' % (getattr(settings, 'SITE_URL', ''), question_id))
+    return '\n'.join(lines)
+
+
+def send_digests(batch_size=None):
+    """
+        Queues a digest email of unread notifications for every user who opted
+        in, reading and writing batch_size users at a time. Returns the number
+        of emails queued.
+    """
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_DIGEST_BATCH_SIZE', 500)
+    queued = 0
+    last_id = 0
+    while True:
+        users = list(UserProfile.objects.filter(email_digest=True, user_id__gt=last_id).exclude(user__email='')
+                     .order_by('user_id').values_list('user_id', 'user__username', 'user__email')[:batch_size])
+        if not users:
+            return queued
+        last_id = users[-1][0]
+        with transaction.atomic():
+            rows = Notification.objects.filter(user__in=[u[0] for u in users], is_read=False, is_emailed=False,
+                                               answer__question__is_deleted=False) \
+                .order_by('answer__question_id') \
+                .values_list('id', 'user_id', 'answer__question_id', 'answer__question__title')
+            ids = []
+            per_user = {}
+            for notification_id, user_id, question_id, title in rows:
+                ids.append(notification_id)
+                questions = per_user.setdefault(user_id, OrderedDict())
+                questions[(question_id, title)] = questions.get((question_id, title), 0) + 1
+            outbox.queue_many([(email, 'New answers', _digest(username, per_user[user_id]))
+                               for user_id, username, email in users if user_id in per_user])
+            Notification.objects.filter(pk__in=ids).update(is_emailed=True)
+        queued += len(per_user)
+
+
+@receiver(post_save, sender=Answer)
+def notify_answer(sender, instance, created, **kwargs):
+    if created:
+        fan_out(instance)
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not created and instance.is_deleted and update_fields is not None and 'is_deleted' in update_fields:
+        _unread_removed(Notification.objects.filter(answer__question=instance))
+
+
+@receiver(pre_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    # Answers of soft deleted questions were taken off already
+    _unread_removed(Notification.objects.filter(answer=instance, answer__question__is_deleted=False))
@@ -0,0 +1,95 @@
+"""
+Transactional email outbox.
+
+queue() writes an OutboxEmail row instead of talking to the mail server, in
+the same transaction as the change the email is about, so an email goes out
+if and only if the change was committed. The send_outbox command delivers
+them: it claims up to OUTBOX_BATCH_SIZE due emails at a time, the same way
+task workers claim tasks, and sends the whole batch over one SMTP connection.
+Sent emails are deleted. An email that fails is retried with the task
+backoff, and after OUTBOX_MAX_ATTEMPTS it's kept as dead for inspection.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+
+from .models import OutboxEmail
+from .sql import claim_due
+from .tasks import retry_delay
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, 'OUTBOX_' + name, default)
+
+
+def queue(to, subject, body):
+    return OutboxEmail.objects.create(to=to, subject=subject, body=body)
+
+
+def queue_many(emails):
+    """
+        Queues (to, subject, body) emails with one INSERT.
+    """
+    return OutboxEmail.objects.bulk_create([OutboxEmail(to=to, subject=subject, body=body) for to, subject, body in emails])
+
+
+def claim(limit):
+    return claim_due(OutboxEmail, OutboxEmail.PENDING, limit, _setting('LEASE', 5 * 60),
+                     ['id', 'to', 'subject', 'body', 'attempts'], _setting('MAX_ATTEMPTS', 5), OutboxEmail.DEAD)
+
+
+def _failed(email_id, attempts, error):
+    emails = OutboxEmail.objects.filter(pk=email_id)
+    if attempts >= _setting('MAX_ATTEMPTS', 5):
+        emails.update(status=OutboxEmail.DEAD, last_error=error)
+    else:
+        emails.update(run_at=timezone.now() + timedelta(seconds=retry_delay(attempts)), last_error=error)
+
+
+def send_batch(claimed):
+    """
+        Sends claimed emails over a single connection. Returns the number
+        sent.
+    """
+    from_email = getattr(settings, 'EMAIL_HOST_USER', None) or settings.DEFAULT_FROM_EMAIL
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        logger.exception('Could not connect to the mail server')
+        for email_id, _, _, _, attempts in claimed:
+            _failed(email_id, attempts, repr(e))
+        return 0
+    sent = []
+    try:
+        for email_id, to, subject, body, attempts in claimed:
+            try:
+                connection.send_messages([EmailMessage(subject, body, from_email, [to])])
+            except Exception as e:
+                logger.exception('Sending email %i failed, attempt %i', email_id, attempts)
+                _failed(email_id, attempts, repr(e))
+            else:
+                sent.append(email_id)
+    finally:
+        connection.close()
+        OutboxEmail.objects.filter(pk__in=sent).delete()
+    return len(sent)
+
+
+def send_pending(batch_size=None):
+    """
+        Sends due emails batch by batch until none is left. Returns the number
+        sent.
+    """
+    batch_size = batch_size or _setting('BATCH_SIZE', 100)
+    sent = 0
+    while True:
+        claimed = claim(batch_size)
+        if not claimed:
+            return sent
+        sent += send_batch(claimed)
@@ -0,0 +1,151 @@
+"""
+Per-tag posting lists of question ids.
+
+Each tag's questions are kept in the cache as a sorted array of ids, so tag
+intersections and exclusions are set operations in memory followed by one
+query that loads only the questions being shown. Lists missing from the cache
+are loaded together with a single query over the question-tag table and then
+updated in place when questions gain or lose tags.
+
+Updates only reach the cache of the process making the change. With the
+default locmem cache every process keeps its own lists, and changes made
+elsewhere show up once the lists expire after TAG_POSTINGS_TIMEOUT seconds.
+A shared cache backend (memcached, redis) makes updates visible everywhere,
+the timeout then bounds the effect of two processes updating a list at once.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .models import Question, Tag, question_tags_changed
+
+
+def _key(tag_id):
+    return 'tag-postings:%i' % tag_id
+
+
+def _timeout():
+    return getattr(settings, 'TAG_POSTINGS_TIMEOUT', 5 * 60)
+
+
+def _load(data):
+    postings = array('i')
+    postings.frombytes(data)
+    return postings
+
+
+def get_postings(tag_ids):
+    """
+        Returns a dict of tag id -> sorted array of question ids.
+    """
+    tag_ids = set(tag_ids)
+    cached = cache.get_many([_key(t) for t in tag_ids])
+    postings = {}
+    missing = []
+    for tag_id in tag_ids:
+        data = cached.get(_key(tag_id))
+        if data is None:
+            missing.append(tag_id)
+        else:
+            postings[tag_id] = _load(data)
+    if missing:
+        loaded = dict((tag_id, array('i')) for tag_id in missing)
+        rows = Question.tags.through.objects.filter(tag_id__in=missing) \
+            .order_by('tag_id', 'question_id').values_list('tag_id', 'question_id')
+        for tag_id, question_id in rows:
+            loaded[tag_id].append(question_id)
+        cache.set_many(dict((_key(t), p.tobytes()) for t, p in loaded.items()), _timeout())
+        postings.update(loaded)
+    return postings
+
+
+def match(include, exclude=()):
+    """
+        Ids of questions tagged with every tag group of include and none of
+        exclude, newest first. A group is a list of tag ids sharing a name,
+        any of which matches.
+    """
+    groups = [set(g) for g in include]
+    exclude = set(exclude)
+    postings = get_postings(set().union(exclude, *groups))
+    matched = []
+    for group in groups:
+        ids = set()
+        for tag_id in group:
+            ids.update(postings[tag_id])
+        matched.append(ids)
+    matched.sort(key=len)
+    result = matched[0].intersection(*matched[1:]) if matched else set()
+    for tag_id in exclude:
+        result.difference_update(postings[tag_id])
+    return sorted(result, reverse=True)
+
+
+def invalidate(tag_ids):
+    """
+        Drops cached lists changed without question_tags_changed.
+    """
+    cache.delete_many([_key(t) for t in tag_ids])
+
+
+def _update(tag_id, question_ids, added):
+    key = _key(tag_id)
+    data = cache.get(key)
+    if data is None:
+        # Loaded from the database on next use
+        return
+    postings = _load(data)
+    for question_id in question_ids:
+        position = bisect_left(postings, question_id)
+        present = position < len(postings) and postings[position] == question_id
+        if added and not present:
+            postings.insert(position, question_id)
+        elif not added and present:
+            del postings[position]
+    cache.set(key, postings.tobytes(), _timeout())
+
+
+class QuestionIdList(object):
+    """
+    Sequence of questions backed by a list of ids. Only the sliced part is
+    loaded, in the order of the ids, so it can be handed to a paginator.
+    """
+    def __init__(self, ids, queryset=None):
+        self.ids = ids
+        self.queryset = queryset if queryset is not None else Question.objects.all()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def count(self):
+        return len(self.ids)
+
+    def _hydrate(self, ids):
+        questions = self.queryset.in_bulk(ids)
+        return [questions[i] for i in ids if i in questions]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._hydrate(self.ids[index])
+        return self._hydrate([self.ids[index]])[0]
+
+    def __iter__(self):
+        return iter(self._hydrate(self.ids))
+
+
+@receiver(question_tags_changed)
+def update_postings(sender, pairs, added, **kwargs):
+    by_tag = {}
+    for question_id, tag_id in pairs:
+        by_tag.setdefault(tag_id, []).append(question_id)
+    for tag_id, question_ids in by_tag.items():
+        _update(tag_id, question_ids, added)
+
+
+@receiver(post_delete, sender=Tag)
+def drop_postings(sender, instance, **kwargs):
+    cache.delete(_key(instance.id))
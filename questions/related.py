@@ -0,0 +1,247 @@
+"""
+Related questions, computed offline.
+
+Every question becomes a TF-IDF vector over the words of its title and text
+and its tags (titles and tags weigh more), stored as one SciPy sparse matrix.
+Cosine similarities are then a sparse matrix product taken a block of rows at
+a time, and the RELATED_QUESTIONS most similar questions of each are written
+to the RelatedQuestion table. Pages only read that table.
+
+build() recomputes the whole table and saves the fitted vocabulary, IDF
+weights and matrix to RELATED_MODEL_FILE. update() handles questions added
+since: it vectorizes only them with the saved vocabulary and weights, multiplies
+their rows, and slots them into the lists of existing questions they are more
+similar to than their current neighbours. Words first seen since the last build
+and edits of older questions wait for the next build.
+
+NumPy and SciPy are only needed by the build_related command.
+"""
+import math
+import os
+import pickle
+import re
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Question, RelatedQuestion
+
+TITLE_WEIGHT = 2
+TAG_WEIGHT = 3
+BLOCK_SIZE = 500
+
+STOP_WORDS = frozenset('''
+    a an and are as at be but by can do does for from how i if in is it my of on or
+    so that the this to using was what when where which why with you
+'''.split())
+
+_word_re = re.compile(r'\w[\w+#]*')
+
+
+def _count():
+    return getattr(settings, 'RELATED_QUESTIONS', 10)
+
+
+def _terms(title, text, tag_ids):
+    terms = Counter()
+    for word in _word_re.findall(title.lower()):
+        if len(word) > 1 and word not in STOP_WORDS:
+            terms[word] += TITLE_WEIGHT
+    for word in _word_re.findall(text.lower()):
+        if len(word) > 1 and word not in STOP_WORDS:
+            terms[word] += 1
+    for tag_id in tag_ids:
+        terms['tag:%i' % tag_id] += TAG_WEIGHT
+    return terms
+
+
+def _model_file():
+    return getattr(settings, 'RELATED_MODEL_FILE', os.path.join(settings.BASE_DIR, 'related_model.pickle'))
+
+
+def _questions(ids=None):
+    """
+        Yields (question id, terms) of every question, or of the given ids.
+    """
+    pairs = Question.tags.through.objects.all()
+    questions = Question.objects.order_by('id')
+    if ids is not None:
+        pairs = pairs.filter(question_id__in=ids)
+        questions = questions.filter(pk__in=ids)
+    tags = {}
+    for question_id, tag_id in pairs.values_list('question_id', 'tag_id'):
+        tags.setdefault(question_id, []).append(tag_id)
+    for question_id, title, text in questions.values_list('id', 'title', 'text').iterator():
+        yield question_id, _terms(title, text, tags.get(question_id, ()))
+
+
+def _vectorize(questions, vocabulary, grow=False):
+    """
+        Returns the question ids and their sublinear term frequency matrix.
+        Terms missing from vocabulary are added with grow, dropped otherwise.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    ids = []
+    indptr, indices, data = [0], [], []
+    for question_id, terms in questions:
+        ids.append(question_id)
+        for term, count in terms.items():
+            if grow:
+                vocabulary.setdefault(term, len(vocabulary))
+            elif term not in vocabulary:
+                continue
+            indices.append(vocabulary[term])
+            data.append(1 + math.log(count))
+        indptr.append(len(indices))
+    return ids, sparse.csr_matrix((data, indices, indptr), shape=(len(ids), len(vocabulary)), dtype=np.float64)
+
+
+def _normalize(matrix, idf):
+    """
+        Applies the IDF weights and L2 normalizes the rows.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    matrix = matrix.multiply(idf).tocsr()
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    return sparse.diags(1 / norms).dot(matrix).tocsr()
+
+
+def _corpus():
+    """
+        Returns the model of every question: ids, vocabulary, IDF weights and
+        the L2 normalized TF-IDF matrix.
+    """
+    import numpy as np
+
+    vocabulary = {}
+    ids, matrix = _vectorize(_questions(), vocabulary, grow=True)
+    documents = np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + len(ids)) / (1 + documents)) + 1
+    return {'ids': ids, 'vocabulary': vocabulary, 'idf': idf, 'matrix': _normalize(matrix, idf)}
+
+
+def _save(model):
+    path = _model_file()
+    with open(path + '.tmp', 'wb') as f:
+        pickle.dump(model, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+
+def _load():
+    try:
+        with open(_model_file(), 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _similarities(matrix, rows):
+    """
+        Yields (row, columns, similarities) of every nonzero similarity of
+        the given rows to other rows.
+    """
+    for start in range(0, len(rows), BLOCK_SIZE):
+        block = rows[start:start + BLOCK_SIZE]
+        similarities = matrix[block].dot(matrix.T).tocsr()
+        for i, row in enumerate(block):
+            columns = similarities.indices[similarities.indptr[i]:similarities.indptr[i + 1]]
+            values = similarities.data[similarities.indptr[i]:similarities.indptr[i + 1]]
+            keep = columns != row
+            yield row, columns[keep], values[keep]
+
+
+def _top(columns, values, k):
+    """
+        Returns the k (column, similarity) pairs with the highest similarity,
+        most similar first.
+    """
+    import numpy as np
+
+    if len(values) > k:
+        top = np.argpartition(-values, k)[:k]
+        columns, values = columns[top], values[top]
+    order = np.argsort(-values, kind='mergesort')
+    return [(int(columns[j]), float(values[j])) for j in order]
+
+
+def build(k=None):
+    """
+        Recomputes the neighbours of every question. Returns the number of
+        stored pairs.
+    """
+    k = k or _count()
+    model = _corpus()
+    ids, matrix = model['ids'], model['matrix']
+    links = [RelatedQuestion(question_id=ids[row], related_id=ids[column], score=score)
+             for row, columns, values in _similarities(matrix, list(range(len(ids))))
+             for column, score in _top(columns, values, k)]
+    with transaction.atomic():
+        RelatedQuestion.objects.all().delete()
+        RelatedQuestion.objects.bulk_create(links, batch_size=1000)
+    _save(model)
+    return len(links)
+
+
+def update(k=None):
+    """
+        Computes neighbours of questions that don't have any yet and adds them
+        to the neighbours of existing questions. Returns the number of
+        questions processed. Questions sharing nothing with others never get
+        neighbours and are processed again each time. Runs build() when no
+        model was saved yet.
+    """
+    from scipy import sparse
+
+    k = k or _count()
+    new_ids = set(Question.objects.filter(related_links=None).values_list('id', flat=True))
+    if not new_ids:
+        return 0
+    model = _load()
+    if model is None:
+        build(k)
+        return len(new_ids)
+    # Drops deleted questions and the new ones, which may have been built without neighbours
+    live = set(Question.objects.values_list('id', flat=True))
+    kept = [row for row, question_id in enumerate(model['ids']) if question_id in live and question_id not in new_ids]
+    added, counts = _vectorize(_questions(new_ids), model['vocabulary'])
+    ids = [model['ids'][row] for row in kept] + added
+    matrix = sparse.vstack([model['matrix'][kept], _normalize(counts, model['idf'])]).tocsr()
+    model.update(ids=ids, matrix=matrix)
+    rows = list(range(len(kept), len(ids)))
+    links = []
+    candidates = {}
+    for row, columns, values in _similarities(matrix, rows):
+        links.extend(RelatedQuestion(question_id=ids[row], related_id=ids[column], score=score)
+                     for column, score in _top(columns, values, k))
+        for column, score in zip(columns.tolist(), values.tolist()):
+            if ids[column] not in new_ids:
+                candidates.setdefault(ids[column], []).append((score, ids[row]))
+
+    current = {}
+    for question_id, related_id, score in RelatedQuestion.objects.filter(question__in=candidates) \
+            .values_list('question_id', 'related_id', 'score'):
+        current.setdefault(question_id, []).append((score, related_id))
+    changed = []
+    for question_id, scores in candidates.items():
+        existing = current.get(question_id, [])
+        merged = sorted(existing + scores, key=lambda e: (-e[0], e[1]))[:k]
+        if merged != sorted(existing, key=lambda e: (-e[0], e[1]))[:k]:
+            changed.append(question_id)
+            links.extend(RelatedQuestion(question_id=question_id, related_id=related_id, score=score)
+                         for score, related_id in merged)
+    with transaction.atomic():
+        RelatedQuestion.objects.filter(question__in=changed).delete()
+        RelatedQuestion.objects.bulk_create(links, batch_size=1000)
+    _save(model)
+    return len(new_ids)
+
+
+def related_questions(question_id, limit=None):
+    return [link.related for link in RelatedQuestion.objects.filter(question=question_id, related__is_deleted=False)
+            .select_related('related').order_by('-score')[:limit or _count()]]
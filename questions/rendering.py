@@ -0,0 +1,76 @@
+"""
+Markdown rendering of question and answer bodies, done once on save.
+
+The sanitized HTML is stored next to the Markdown source along with the
+RENDER_VERSION it was rendered with, questions also store a plain text
+excerpt for list pages. Pages never render Markdown. After changing the
+renderer, bump RENDER_VERSION and run the rerender_posts command.
+"""
+import html
+import re
+
+import bleach
+import markdown
+from django.db.models.signals import pre_save, post_save
+from django.dispatch import receiver
+
+from .models import Question, Answer
+
+RENDER_VERSION = 1
+EXCERPT_LENGTH = 180
+
+ALLOWED_TAGS = [
+    'a', 'abbr', 'b', 'blockquote', 'br', 'code', 'em', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr', 'i',
+    'li', 'ol', 'p', 'pre', 'strong', 'table', 'tbody', 'td', 'th', 'thead', 'tr', 'ul'
+]
+ALLOWED_ATTRIBUTES = {'a': ['href', 'title'], 'abbr': ['title'], 'code': ['class']}
+
+_whitespace_re = re.compile(r'\s+')
+
+
+def render(text):
+    rendered = markdown.markdown(text, extensions=['fenced_code', 'tables', 'sane_lists'])
+    return bleach.clean(rendered, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+
+
+def excerpt(rendered, length=EXCERPT_LENGTH):
+    """
+        Plain text beginning of rendered HTML, cut at a word.
+    """
+    text = _whitespace_re.sub(' ', html.unescape(bleach.clean(rendered, tags=[], strip=True))).strip()
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    if text[length - 1] != ' ':
+        cut = cut.rsplit(' ', 1)[0]
+    return cut.rstrip() + '…'
+
+
+def render_fields(text, with_excerpt=False):
+    """
+        Returns the stored fields for text: text_html, render_version and,
+        with with_excerpt, excerpt.
+    """
+    fields = {'text_html': render(text), 'render_version': RENDER_VERSION}
+    if with_excerpt:
+        fields['excerpt'] = excerpt(fields['text_html'])
+    return fields
+
+
+@receiver(pre_save, sender=Question)
+@receiver(pre_save, sender=Answer)
+def render_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None:
+        for name, value in render_fields(instance.text, sender is Question).items():
+            setattr(instance, name, value)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+def render_updated_fields(sender, instance, update_fields=None, **kwargs):
+    # Partial saves can't write the rendered fields along
+    if update_fields is not None and 'text' in update_fields:
+        fields = render_fields(instance.text, sender is Question)
+        for name, value in fields.items():
+            setattr(instance, name, value)
+        sender.objects.filter(pk=instance.pk).update(**fields)
@@ -0,0 +1,126 @@
+"""
+Revision history of questions and answers.
+
+Every save that changes a post's content adds a revision. Most revisions only
+store a line delta against the previous one, every REVISION_SNAPSHOT_INTERVAL
+revisions a full snapshot is stored instead, so rebuilding any revision
+applies fewer deltas than that to the nearest snapshot. Both are JSON,
+compressed with zlib.
+"""
+import difflib
+import json
+import zlib
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Question, Answer
+
+FIELDS = {
+    Question: ('title', 'text'),
+    Answer: ('text',)
+}
+
+
+def _interval():
+    return getattr(settings, 'REVISION_SNAPSHOT_INTERVAL', 10)
+
+
+def _encode(payload):
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf8'))
+
+
+def _decode(data):
+    return json.loads(zlib.decompress(bytes(data)).decode('utf8'))
+
+
+def delta(old, new):
+    """
+        Operations rebuilding new from old: [start, end] copies lines of old,
+        a string is inserted as is.
+    """
+    a, b = old.splitlines(True), new.splitlines(True)
+    operations = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            operations.append([i1, i2])
+        elif j2 > j1:
+            operations.append(''.join(b[j1:j2]))
+    return operations
+
+
+def patch(old, operations):
+    a = old.splitlines(True)
+    return ''.join(''.join(a[op[0]:op[1]]) if isinstance(op, list) else op for op in operations)
+
+
+def contents(revisions, first, last):
+    """
+        Returns a dict of revision number -> content for first..last of a
+        post's revisions, starting from the closest snapshot.
+    """
+    snapshot = revisions.filter(number__lte=first, is_snapshot=True).order_by('-number') \
+        .values_list('number', flat=True).first()
+    if snapshot is None:
+        return {}
+    result = {}
+    content = None
+    for revision in revisions.filter(number__gte=snapshot, number__lte=last).order_by('number'):
+        payload = _decode(revision.data)
+        if revision.is_snapshot:
+            content = payload
+        else:
+            content = dict((field, patch(content[field], operations)) for field, operations in payload.items())
+        if revision.number >= first:
+            result[revision.number] = content
+    return result
+
+
+def content_at(revisions, number):
+    return contents(revisions, number, number).get(number)
+
+
+def record(instance, author=None):
+    """
+        Adds a revision for the current content of instance, unless it's the
+        same as the latest one.
+    """
+    content = dict((field, getattr(instance, field)) for field in FIELDS[type(instance)])
+    revisions = instance.revisions.all()
+    latest = revisions.order_by('-number').values_list('number', flat=True).first()
+    if latest is None:
+        number, is_snapshot, payload = 1, True, content
+    else:
+        previous = content_at(revisions, latest)
+        if previous == content:
+            return None
+        number = latest + 1
+        is_snapshot = (number - 1) % _interval() == 0
+        payload = content if is_snapshot else \
+            dict((field, delta(previous[field], content[field])) for field in content)
+    try:
+        with transaction.atomic():
+            return instance.revisions.create(number=number, author=author, created=timezone.now(),
+                                             is_snapshot=is_snapshot, data=_encode(payload))
+    except IntegrityError:
+        # A concurrent save recorded this number first
+        return None
+
+
+def diff(old, new):
+    """
+        Unified diff lines of new against old, as (kind, line) pairs.
+    """
+    lines = difflib.unified_diff(old.splitlines(), new.splitlines(), lineterm='', n=2)
+    return [(line[:1], line[1:]) for line in lines if not line.startswith(('---', '+++'))]
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+def record_revision(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or any(field in update_fields for field in FIELDS[sender]):
+        # Only owners edit their posts
+        record(instance, instance.owner)
@@ -0,0 +1,268 @@
+"""
+Question search backends.
+
+SearchView asks the backend configured by SEARCH_BACKEND for the ids of
+questions matching a query, best match first:
+
+- PostgresSearchBackend ranks full text matches in the database.
+- InvertedIndexBackend keeps an inverted index of every question in process
+  memory, for databases without full text search. Each term maps to a sorted
+  array of question ids and a parallel array of term frequencies, queries
+  intersect the postings of their terms and rank the result with BM25. The
+  index is built on first use and updated from question signals, changes
+  made by other processes aren't seen, so it suits development and tests.
+
+Backends also highlight matches for the page of results shown. Snippets are
+cached per question version and normalized query, so repeated searches don't
+run the highlighter over whole question bodies again. tag_facets() counts the
+tags of the matching questions to narrow a search down.
+"""
+import hashlib
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .models import Question
+from .related import STOP_WORDS
+
+_word_re = re.compile(r'\w[\w+#]*')
+
+# Surround highlighted words until the text is escaped
+START = '\x02'
+STOP = '\x03'
+# Stands in for < while ts_headline runs, which drops anything looking like a tag
+LT = '\x04'
+SNIPPET_WORDS = 35
+
+
+def analyze(text):
+    return [w for w in _word_re.findall(text.lower()) if w not in STOP_WORDS]
+
+
+def _mark(text, terms, max_words=None):
+    # parts[i] is the text before words[i], parts[-1] the text after the last
+    parts = _word_re.split(text)
+    words = _word_re.findall(text)
+    first = next((i for i, w in enumerate(words) if w.lower() in terms), 0)
+    start = max(first - 5, 0) if max_words else 0
+    end = min(start + max_words, len(words)) if max_words else len(words)
+    result = ['...'] if start else [parts[0]]
+    for i in range(start, end):
+        result.append(START + words[i] + STOP if words[i].lower() in terms else words[i])
+        if i + 1 < end or end == len(words):
+            result.append(parts[i + 1])
+    if end < len(words):
+        result.append('...')
+    return ''.join(result)
+
+
+class SearchBackend(object):
+
+    def search(self, query, limit=None):
+        """
+            Returns ids of questions matching every term of query, best match
+            first.
+        """
+        raise NotImplementedError
+
+    def highlight(self, questions, query):
+        """
+            Returns a dict of question id -> (title, snippet) with matched
+            words between START and STOP.
+        """
+        terms = set(analyze(query))
+        # Lists load questions without their text
+        rows = Question.objects.filter(pk__in=[q.id for q in questions]).values_list('id', 'title', 'text')
+        return dict((question_id, (_mark(title, terms), _mark(text, terms, SNIPPET_WORDS))) for question_id, title, text in rows)
+
+    def index(self, question):
+        pass
+
+    def remove(self, question_id):
+        pass
+
+
+class PostgresSearchBackend(SearchBackend):
+
+    def search(self, query, limit=None):
+        from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
+
+        search_query = SearchQuery(query)
+        ids = Question.objects.annotate(search=SearchVector('title', 'text')).filter(search=search_query) \
+            .annotate(rank=SearchRank(SearchVector('title', 'text'), search_query)) \
+            .order_by('-rank', '-id').values_list('id', flat=True)
+        return list(ids[:limit] if limit else ids)
+
+    def highlight(self, questions, query):
+        options = 'StartSel=%s, StopSel=%s' % (START, STOP)
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                SELECT q.id, ts_headline(replace(q.title, '<', %s), query, %s),
+                       ts_headline(replace(q.text, '<', %s), query, %s)
+                FROM {table} q, plainto_tsquery(%s) query
+                WHERE q.id = ANY(%s)
+            """.format(table=connection.ops.quote_name(Question._meta.db_table)), [
+                LT, options + ', HighlightAll=true',
+                LT, options + ', MaxWords=%i, MinWords=15' % SNIPPET_WORDS,
+                query,
+                [q.id for q in questions]
+            ])
+            return dict((question_id, (title.replace(LT, '<'), snippet.replace(LT, '<')))
+                        for question_id, title, snippet in cursor.fetchall())
+
+
+class InvertedIndexBackend(SearchBackend):
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._built = False
+        self._postings = {}
+        self._lengths = {}
+        self._terms = {}
+        self._total_length = 0
+
+    def build(self):
+        with self._lock:
+            self._postings = {}
+            self._lengths = {}
+            self._terms = {}
+            self._total_length = 0
+            for question_id, title, text in Question.objects.order_by('id').values_list('id', 'title', 'text').iterator():
+                self._add(question_id, title, text)
+            self._built = True
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def _add(self, question_id, title, text):
+        words = analyze('%s %s' % (title, text))
+        frequencies = {}
+        for word in words:
+            frequencies[word] = frequencies.get(word, 0) + 1
+        for term, frequency in frequencies.items():
+            ids, counts = self._postings.setdefault(term, (array('i'), array('i')))
+            position = bisect_left(ids, question_id)
+            ids.insert(position, question_id)
+            counts.insert(position, frequency)
+        self._terms[question_id] = list(frequencies)
+        self._lengths[question_id] = len(words)
+        self._total_length += len(words)
+
+    def _remove(self, question_id):
+        for term in self._terms.pop(question_id, ()):
+            ids, counts = self._postings[term]
+            position = bisect_left(ids, question_id)
+            del ids[position]
+            del counts[position]
+            if not ids:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(question_id, 0)
+
+    def index(self, question):
+        with self._lock:
+            if self._built:
+                self._remove(question.id)
+                self._add(question.id, question.title, question.text)
+
+    def remove(self, question_id):
+        with self._lock:
+            if self._built:
+                self._remove(question_id)
+
+    def search(self, query, limit=None):
+        terms = set(analyze(query))
+        with self._lock:
+            self._ensure_built()
+            if not terms or any(t not in self._postings for t in terms):
+                return []
+            postings = sorted((self._postings[t] for t in terms), key=lambda p: len(p[0]))
+            matched = set(postings[0][0])
+            for ids, _ in postings[1:]:
+                matched.intersection_update(ids)
+            documents = len(self._lengths)
+            average = self._total_length / float(documents)
+            scores = dict.fromkeys(matched, 0.0)
+            for ids, counts in postings:
+                idf = math.log(1 + (documents - len(ids) + 0.5) / (len(ids) + 0.5))
+                for question_id in matched:
+                    frequency = counts[bisect_left(ids, question_id)]
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[question_id] / average)
+                    scores[question_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        ranked = sorted(scores, key=lambda i: (-scores[i], -i))
+        return ranked[:limit] if limit else ranked
+
+
+_backends = {}
+
+
+def get_backend(path=None):
+    path = path or getattr(settings, 'SEARCH_BACKEND', 'questions.search.PostgresSearchBackend')
+    if path not in _backends:
+        _backends[path] = import_string(path)()
+    return _backends[path]
+
+
+def _html(highlighted):
+    # The sentinels pass through escaping untouched
+    return mark_safe(escape(highlighted).replace(START, '<mark>').replace(STOP, '</mark>'))
+
+
+def snippets(questions, query, backend=None):
+    """
+        Returns a dict of question id -> (title, snippet) of HTML highlighting
+        the matches of query.
+    """
+    digest = hashlib.md5(' '.join(query.lower().split()).encode('utf8')).hexdigest()
+    keys = dict((q.id, 'search-snippet:%i:%i:%s' % (q.id, q.version, digest)) for q in questions)
+    cached = cache.get_many(list(keys.values()))
+    result = dict((question_id, cached[key]) for question_id, key in keys.items() if key in cached)
+    missing = [q for q in questions if q.id not in result]
+    if missing:
+        highlighted = (backend or get_backend()).highlight(missing, query)
+        computed = dict((question_id, (_html(title), _html(snippet))) for question_id, (title, snippet) in highlighted.items())
+        cache.set_many(dict((keys[question_id], value) for question_id, value in computed.items()),
+                       getattr(settings, 'SEARCH_SNIPPET_TIMEOUT', 24 * 60 * 60))
+        result.update(computed)
+    return result
+
+
+def tag_facets(question_ids, limit=None):
+    """
+        Returns (tag name, count) of the most used tags among question_ids,
+        counted with a single aggregate query.
+    """
+    if not question_ids:
+        return []
+    return Question.tags.through.objects.filter(question_id__in=question_ids) \
+        .values_list('tag__name').annotate(count=Count('question_id')) \
+        .order_by('-count', 'tag__name')[:limit or getattr(settings, 'SEARCH_FACETS', 15)]
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, **kwargs):
+    for backend in _backends.values():
+        if instance.is_deleted:
+            backend.remove(instance.id)
+        else:
+            backend.index(instance)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    for backend in _backends.values():
+        backend.remove(instance.id)
@@ -0,0 +1,78 @@
+"""
+Set-based SQL helpers for writes the ORM would otherwise issue row by row.
+"""
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+
+
+def update_from_values(model, columns, rows, assignments, batch_size=1000):
+    """
+        Updates many rows with one statement per batch:
+
+            UPDATE table AS t SET ... FROM (VALUES ...) AS v(columns) WHERE t.pk = v.pk
+
+        columns[0] has to be the primary key. assignments maps updated columns
+        to SQL expressions over t (current row) and v (values row), e.g.
+        {'views': 't.views + v.views'}. Returns the number of updated rows.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    pk = qn(model._meta.pk.column)
+    row_sql = '(%s)' % ', '.join(['%s'] * len(columns))
+    set_sql = ', '.join('%s = %s' % (qn(column), expression) for column, expression in assignments.items())
+    updated = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            sql = 'UPDATE %s AS t SET %s FROM (VALUES %s) AS v(%s) WHERE t.%s = v.%s' % (
+                table, set_sql, ', '.join([row_sql] * len(batch)),
+                ', '.join(qn(c) for c in columns), pk, qn(columns[0])
+            )
+            cursor.execute(sql, [value for row in batch for value in row])
+            updated += cursor.rowcount
+    return updated
+
+
+def claim_due(model, status, limit, lease, columns, max_attempts, failed_status):
+    """
+        Claims up to limit rows of a queue table with the given status whose
+        run_at has come, skipping rows claimed by concurrent transactions:
+
+            UPDATE table SET run_at = now + lease, attempts = attempts + 1
+            WHERE id IN (SELECT id ... FOR UPDATE SKIP LOCKED)
+
+        The claim counts as an attempt. max_attempts is a number or the name
+        of the column holding it, due rows that used them all lost their
+        worker during the last attempt and are set to failed_status instead.
+
+        Returns the claimed rows as tuples of columns, in queue order.
+    """
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    if isinstance(max_attempts, str):
+        max_attempts_sql, max_attempts_params = 'q.%s' % qn(max_attempts), []
+    else:
+        max_attempts_sql, max_attempts_params = '%s', [max_attempts]
+    now = timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE {table} AS q SET status = %s, last_error = %s
+            WHERE q.status = %s AND q.run_at <= %s AND q.attempts >= {max_attempts}
+        """.format(table=table, max_attempts=max_attempts_sql),
+            [failed_status, 'Lease expired during the last attempt', status, now] + max_attempts_params)
+        cursor.execute("""
+            WITH due AS (
+                SELECT q.id, q.run_at FROM {table} AS q
+                WHERE q.status = %s AND q.run_at <= %s AND q.attempts < {max_attempts}
+                ORDER BY q.run_at, q.id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE {table} AS q SET run_at = %s, attempts = q.attempts + 1
+            FROM due WHERE q.id = due.id
+            RETURNING due.run_at, q.id, {columns}
+        """.format(table=table, max_attempts=max_attempts_sql, columns=', '.join('q.%s' % qn(c) for c in columns)),
+            [status, now] + max_attempts_params + [limit, now + timedelta(seconds=lease)])
+        return [row[2:] for row in sorted(cursor.fetchall(), key=lambda row: row[:2])]
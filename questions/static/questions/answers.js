@@ -0,0 +1,82 @@
+// Applies live answer events to the question page. Uses server-sent events
+// and falls back to polling when EventSource isn't available. Pages only have
+// the endpoints when served through ASGI.
+(function () {
+    var answers = document.querySelector('.answers[data-events]');
+    if (!answers) {
+        return;
+    }
+    var lastEvent = answers.getAttribute('data-last-event');
+    var csrf = document.querySelector('input[name=csrfmiddlewaretoken]');
+
+    function fragment(html) {
+        var container = document.createElement('div');
+        container.innerHTML = html;
+        // Fragments are rendered without a request, forms get the page's token
+        var forms = container.querySelectorAll('form');
+        for (var i = 0; csrf && i < forms.length; i++) {
+            if (!forms[i].querySelector('input[name=csrfmiddlewaretoken]')) {
+                forms[i].appendChild(csrf.cloneNode());
+            }
+        }
+        return container.firstElementChild;
+    }
+
+    function apply(type, data) {
+        var current = document.getElementById(String(data.answer));
+        if (type === 'delete') {
+            if (current) {
+                current.parentNode.removeChild(current);
+            }
+            return;
+        }
+        if (!data.html) {
+            return;
+        }
+        if (type === 'accept') {
+            var accepted = answers.querySelectorAll('.accepted-answer');
+            for (var i = 0; i < accepted.length; i++) {
+                accepted[i].parentNode.removeChild(accepted[i]);
+            }
+        }
+        var element = fragment(data.html);
+        if (current) {
+            current.parentNode.replaceChild(element, current);
+        } else {
+            var message = answers.querySelector('.message');
+            if (message) {
+                message.parentNode.removeChild(message);
+            }
+            answers.appendChild(element);
+        }
+    }
+
+    if (window.EventSource) {
+        var source = new EventSource(answers.getAttribute('data-events') + '?after=' + lastEvent);
+        ['new', 'edit', 'delete', 'accept'].forEach(function (type) {
+            source.addEventListener(type, function (e) {
+                apply(type, JSON.parse(e.data));
+            });
+        });
+        return;
+    }
+
+    function poll() {
+        var request = new XMLHttpRequest();
+        request.open('GET', answers.getAttribute('data-poll') + '?after=' + lastEvent);
+        request.onload = function () {
+            if (request.status === 200) {
+                JSON.parse(request.responseText).events.forEach(function (e) {
+                    lastEvent = e.id;
+                    apply(e.type, e);
+                });
+            }
+            setTimeout(poll, 5000);
+        };
+        request.onerror = function () {
+            setTimeout(poll, 5000);
+        };
+        request.send();
+    }
+    poll();
+})();
@@ -0,0 +1,56 @@
+// Lists possible duplicates under the title while a question is being written.
+(function () {
+    var form = document.querySelector('form[data-similar]');
+    if (!form) {
+        return;
+    }
+    var title = form.querySelector('[name=title]');
+    var text = form.querySelector('[name=text]');
+    var list = document.createElement('div');
+    var request = null;
+    var timer = null;
+    list.className = 'similar-questions';
+    title.parentNode.appendChild(list);
+
+    function show(questions) {
+        list.innerHTML = '';
+        if (!questions.length) {
+            return;
+        }
+        var header = document.createElement('p');
+        header.textContent = 'Similar questions:';
+        list.appendChild(header);
+        questions.forEach(function (question) {
+            var link = document.createElement('a');
+            link.href = question.url;
+            link.target = '_blank';
+            link.textContent = question.title;
+            list.appendChild(link);
+        });
+    }
+
+    function lookup() {
+        if (request) {
+            request.abort();
+        }
+        if (title.value.trim().length < 10) {
+            show([]);
+            return;
+        }
+        request = new XMLHttpRequest();
+        request.open('GET', form.getAttribute('data-similar') + '?title=' + encodeURIComponent(title.value) +
+                     '&text=' + encodeURIComponent(text.value.slice(0, 2000)));
+        request.onload = function () {
+            if (request.status === 200) {
+                show(JSON.parse(request.responseText).questions);
+            }
+        };
+        request.send();
+    }
+
+    title.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(lookup, 300);
+    });
+    text.addEventListener('change', lookup);
+})();
@@ -0,0 +1,59 @@
+// Suggests existing tags for the last comma separated entry of tag inputs.
+(function () {
+    var inputs = document.querySelectorAll('input.tags-input[data-autocomplete]');
+    Array.prototype.forEach.call(inputs, function (input) {
+        var list = document.createElement('ul');
+        var request = null;
+        list.className = 'tags-suggestions';
+        input.parentNode.appendChild(list);
+
+        function entries() {
+            return input.value.split(',');
+        }
+
+        function choose(name) {
+            var parts = entries();
+            parts[parts.length - 1] = (parts.length > 1 ? ' ' : '') + name;
+            input.value = parts.join(',') + ', ';
+            list.innerHTML = '';
+            input.focus();
+        }
+
+        function show(tags) {
+            list.innerHTML = '';
+            tags.forEach(function (tag) {
+                var item = document.createElement('li');
+                item.textContent = tag.name + ' × ' + tag.count;
+                item.addEventListener('mousedown', function (e) {
+                    e.preventDefault();
+                    choose(tag.name);
+                });
+                list.appendChild(item);
+            });
+        }
+
+        input.addEventListener('input', function () {
+            var parts = entries();
+            var prefix = parts[parts.length - 1].trim();
+            if (request) {
+                request.abort();
+            }
+            if (!prefix) {
+                show([]);
+                return;
+            }
+            request = new XMLHttpRequest();
+            request.open('GET', input.getAttribute('data-autocomplete') + '?q=' + encodeURIComponent(prefix));
+            request.onload = function () {
+                if (request.status === 200) {
+                    show(JSON.parse(request.responseText).tags);
+                }
+            };
+            request.send();
+        });
+
+        input.addEventListener('blur', function () {
+            list.innerHTML = '';
+        });
+    });
+})();
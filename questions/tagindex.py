@@ -0,0 +1,173 @@
+"""
+Per-process prefix index of tag names for autocompletion.
+
+Tags are kept in an array sorted by lowercased name, so a prefix query is two
+binary searches plus picking the most used matches. The index is built with
+one aggregate query and then updated in place from tag signals. Every
+committed change also advances a database sequence, each process compares its
+value to the one its index was built at every TAG_INDEX_CHECK_INTERVAL
+seconds and rebuilds when another process changed tags.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Case, Count, When
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Question, Tag, question_tags_changed
+
+VERSION_SEQUENCE = 'questions_tag_index_version'
+
+
+def current_version():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM %s' % VERSION_SEQUENCE)
+        return cursor.fetchone()[0]
+
+
+class TagIndex(object):
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._entries = []
+        self._by_id = {}
+        self._memo = {}
+        self._built = False
+        self._version = None
+        self._checked = 0
+
+    def build(self):
+        # Read first, changes made while building trigger another build
+        version = current_version()
+        # Soft deleting drops a question's tags, deleted questions holding
+        # some anyway aren't counted either
+        tags = Tag.objects.annotate(count=Count(Case(When(question__is_deleted=False, then='question')))) \
+            .values_list('id', 'name', 'count')
+        entries = sorted([name.lower(), id, name, count] for id, name, count in tags)
+        with self._lock:
+            self._keys = [(e[0], e[1]) for e in entries]
+            self._entries = entries
+            self._by_id = dict((e[1], e) for e in entries)
+            self._memo = {}
+            self._built = True
+            self._version = version
+            self._checked = time.time()
+
+    def _ensure_fresh(self):
+        now = time.time()
+        if self._built and now - self._checked < getattr(settings, 'TAG_INDEX_CHECK_INTERVAL', 1):
+            return
+        if not self._built or current_version() != self._version:
+            self.build()
+        self._checked = now
+
+    def complete(self, prefix, limit=10):
+        """
+            Returns up to limit (name, count) pairs starting with prefix, most
+            used first.
+        """
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        with self._lock:
+            self._ensure_fresh()
+            key = (prefix, limit)
+            if key in self._memo:
+                return self._memo[key]
+            start = bisect_left(self._keys, (prefix,))
+            end = bisect_left(self._keys, (prefix + '\uffff',))
+            matches = heapq.nsmallest(limit, self._entries[start:end], key=lambda e: (-e[3], e[0]))
+            result = [(e[2], e[3]) for e in matches]
+            # Short prefixes match many tags and are typed by everyone
+            if len(prefix) <= 2:
+                self._memo[key] = result
+            return result
+
+    def _changed(self):
+        """
+            Bumps the version once the change is committed, other processes
+            rebuild their copies.
+        """
+        self._memo = {}
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [VERSION_SEQUENCE])
+            version = cursor.fetchone()[0]
+        with self._lock:
+            # A skipped version is another process's change
+            self._version = version if self._version == version - 1 else None
+
+    def add_tag(self, tag_id, name, count=0):
+        with self._lock:
+            if not self._built:
+                return self._changed()
+            if tag_id in self._by_id:
+                return
+            entry = [name.lower(), tag_id, name, count]
+            position = bisect_left(self._keys, (entry[0], tag_id))
+            self._keys.insert(position, (entry[0], tag_id))
+            self._entries.insert(position, entry)
+            self._by_id[tag_id] = entry
+            self._changed()
+
+    def remove_tag(self, tag_id):
+        with self._lock:
+            if not self._built:
+                return self._changed()
+            entry = self._by_id.pop(tag_id, None)
+            if entry is None:
+                return
+            position = bisect_left(self._keys, (entry[0], tag_id))
+            del self._keys[position]
+            del self._entries[position]
+            self._changed()
+
+    def count(self, tag_id):
+        entry = self._by_id.get(tag_id)
+        return entry[3] if entry is not None else 0
+
+    def update_counts(self, deltas):
+        with self._lock:
+            if not self._built:
+                return self._changed()
+            for tag_id, delta in deltas.items():
+                entry = self._by_id.get(tag_id)
+                if entry is not None:
+                    entry[3] += delta
+            self._changed()
+
+
+tag_index = TagIndex()
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    # Renamed tags are moved to their new position
+    count = tag_index.count(instance.id) if not created else 0
+    tag_index.remove_tag(instance.id)
+    tag_index.add_tag(instance.id, instance.name, count)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    tag_index.remove_tag(instance.id)
+
+
+@receiver(question_tags_changed)
+def question_tags_updated(sender, pairs, added, **kwargs):
+    # Same as build(), tags of deleted questions don't count
+    live = set(Question.objects.filter(pk__in=set(q for q, _ in pairs)).values_list('id', flat=True))
+    deltas = {}
+    for question_id, tag_id in pairs:
+        if question_id not in live:
+            continue
+        deltas[tag_id] = deltas.get(tag_id, 0) + (1 if added else -1)
+    tag_index.update_counts(deltas)
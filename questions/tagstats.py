@@ -0,0 +1,101 @@
+"""
+Maintenance of the denormalized TagStats counters.
+
+Tag changes are applied as one upsert per batch of affected tags, so showing
+the tags directory never has to group the whole question-tag table.
+"""
+from datetime import datetime, time
+
+from django.db import connection, transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Question, Tag, TagStats, question_tags_changed, current_week_start
+
+
+def _week_start_time(week_start):
+    return timezone.make_aware(datetime.combine(week_start, time.min))
+
+
+def apply_changes(pairs, added):
+    """
+        Adds (or removes) the given (question id, tag id) pairs to the counters.
+    """
+    week_start = current_week_start()
+    since = _week_start_time(week_start)
+    sign = 1 if added else -1
+    # Soft deletion clears a question's tags before flagging it, tags still
+    # held by a deleted question were never counted (see rebuild())
+    created = {question_id: creation_time for question_id, creation_time, is_deleted
+               in Question.all_objects.filter(pk__in=set(q for q, _ in pairs))
+                                      .values_list('id', 'creation_time', 'is_deleted')
+               if not is_deleted}
+    changes = {}
+    for question_id, tag_id in pairs:
+        if question_id not in created:
+            continue
+        count, week_count, last_activity = changes.get(tag_id, (0, 0, None))
+        creation_time = created[question_id]
+        if creation_time >= since:
+            week_count += sign
+        if added and (last_activity is None or creation_time > last_activity):
+            last_activity = creation_time
+        changes[tag_id] = (count + sign, week_count, last_activity)
+
+    if not changes:
+        return
+    rows = sorted((tag_id, count, week_start, week_count, last_activity)
+                  for tag_id, (count, week_count, last_activity) in changes.items())
+    table = connection.ops.quote_name(TagStats._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO {table} AS s (tag_id, question_count, week_start, week_count, last_activity)
+            VALUES {values}
+            ON CONFLICT (tag_id) DO UPDATE SET
+                question_count = GREATEST(s.question_count + EXCLUDED.question_count, 0),
+                week_count = GREATEST(CASE WHEN s.week_start = EXCLUDED.week_start
+                    THEN s.week_count + EXCLUDED.week_count ELSE EXCLUDED.week_count END, 0),
+                week_start = EXCLUDED.week_start,
+                last_activity = GREATEST(s.last_activity, EXCLUDED.last_activity)
+        """.format(table=table, values=', '.join(['(%s, %s, %s, %s, %s::timestamptz)'] * len(rows))),
+            [value for row in rows for value in row])
+
+
+def rebuild(tag_ids=None):
+    """
+        Recomputes the counters of tag_ids, or of every tag, in one set-based
+        statement.
+    """
+    week_start = current_week_start()
+    table = connection.ops.quote_name(TagStats._meta.db_table)
+    where, params = ('', []) if tag_ids is None else ('WHERE {column} = ANY(%s)', [list(tag_ids)])
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM {table} '.format(table=table) + where.format(column='tag_id'), params)
+        cursor.execute("""
+            INSERT INTO {table} (tag_id, question_count, week_start, week_count, last_activity)
+            SELECT t.id, COUNT(q.id), %s, COUNT(q.id) FILTER (WHERE q.creation_time >= %s), MAX(q.creation_time)
+            FROM {tag} t
+            LEFT JOIN {question_tags} qt ON qt.tag_id = t.id
+            LEFT JOIN {question} q ON q.id = qt.question_id AND NOT q.is_deleted
+            {where}
+            GROUP BY t.id
+        """.format(
+            table=table,
+            tag=connection.ops.quote_name(Tag._meta.db_table),
+            question_tags=connection.ops.quote_name(Question.tags.through._meta.db_table),
+            question=connection.ops.quote_name(Question._meta.db_table),
+            where=where.format(column='t.id')
+        ), [week_start, _week_start_time(week_start)] + params)
+        return cursor.rowcount
+
+
+@receiver(post_save, sender=Tag)
+def create_tag_stats(sender, instance, created, **kwargs):
+    if created:
+        TagStats.objects.get_or_create(tag=instance)
+
+
+@receiver(question_tags_changed)
+def update_tag_stats(sender, pairs, added, **kwargs):
+    apply_changes(pairs, added)
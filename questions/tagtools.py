@@ -0,0 +1,72 @@
+"""
+Tag maintenance: sweeping tags without questions and merging duplicates.
+
+Merges move question-tag rows with two statements however many questions
+the tag has, so the per-question signals don't fire. The caches derived from
+tags (autocomplete index, posting lists and tag statistics) are updated
+directly afterwards.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from . import postings, tagstats
+from .models import Question, Tag
+from .tagindex import tag_index
+
+
+def collect_orphans(batch_size=None):
+    """
+        Deletes tags that no question uses, batch_size at a time. Returns the
+        number of deleted tags.
+    """
+    batch_size = batch_size or getattr(settings, 'TAG_GC_BATCH_SIZE', 1000)
+    deleted = 0
+    while True:
+        ids = list(Tag.objects.filter(question=None).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        with transaction.atomic():
+            # Checked again in case a question picked one of them up meanwhile
+            _, per_model = Tag.objects.filter(pk__in=ids, question=None).delete()
+        deleted += per_model.get(Tag._meta.label, 0)
+        if len(ids) < batch_size:
+            return deleted
+
+
+def merge(source, target):
+    """
+        Moves every question of source to target and deletes source. Returns
+        the number of questions that gained target.
+    """
+    if source.pk == target.pk:
+        return 0
+    table = connection.ops.quote_name(Question.tags.through._meta.db_table)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("""
+            UPDATE {table} SET tag_id = %s
+            WHERE tag_id = %s AND NOT EXISTS (
+                SELECT 1 FROM {table} other WHERE other.question_id = {table}.question_id AND other.tag_id = %s
+            )
+        """.format(table=table), [target.pk, source.pk, target.pk])
+        moved = cursor.rowcount
+        # Left over rows belong to questions that already had target
+        cursor.execute('DELETE FROM {table} WHERE tag_id = %s'.format(table=table), [source.pk])
+        source.delete()
+        postings.invalidate([target.pk])
+        tagstats.rebuild([target.pk])
+        tag_index.update_counts({target.pk: moved})
+    return moved
+
+
+def rename(tag, name):
+    """
+        Renames tag, merging it into the tag already called name if there is
+        one. Returns the resulting tag.
+    """
+    existing = Tag.objects.filter(name=name).exclude(pk=tag.pk).first()
+    if existing is not None:
+        merge(tag, existing)
+        return existing
+    tag.name = name
+    tag.save(update_fields=['name'])
+    return tag
@@ -0,0 +1,138 @@
+"""
+Background tasks queued in PostgreSQL.
+
+enqueue() stores a call of a function decorated with @task as a Task row, in
+the caller's transaction, so the task only exists if the surrounding change
+is committed. Workers started with the run_worker command claim due tasks
+with SELECT ... FOR UPDATE SKIP LOCKED, which lets any number of them poll
+the table without waiting on each other or claiming a task twice.
+
+Claiming moves a task's run_at TASK_LEASE seconds ahead instead of holding a
+lock while it runs, so tasks can commit their own transactions and a task
+whose worker died is claimed again once the lease runs out, unless that was
+its last attempt. A finished task is deleted. A failing one is retried after a delay doubling with every
+attempt, up to its max_attempts, then kept as failed with its traceback.
+"""
+import logging
+import time
+import traceback
+from datetime import timedelta
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+
+from django.conf import settings
+from django.db import connections, close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+from .sql import claim_due
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, 'TASK_' + name, default)
+
+
+def task(func=None, max_attempts=None):
+    """
+        Makes func runnable by workers, as @task or @task(max_attempts=...).
+    """
+    def register(func):
+        func.task_name = '%s.%s' % (func.__module__, func.__name__)
+        func.max_attempts = max_attempts
+        return func
+    return register(func) if func is not None else register
+
+
+def enqueue(func, *args, **kwargs):
+    """
+        Queues func(*args, **kwargs), arguments have to be JSON serializable.
+    """
+    return Task.objects.create(name=func.task_name, args=list(args), kwargs=kwargs,
+                               max_attempts=func.max_attempts or _setting('MAX_ATTEMPTS', 5))
+
+
+def retry_delay(attempts):
+    return min(_setting('RETRY_DELAY', 10) * 2 ** (attempts - 1), _setting('RETRY_MAX_DELAY', 60 * 60))
+
+
+def claim(limit):
+    """
+        Claims up to limit due tasks, returns them as
+        (id, name, args, kwargs, attempts, max_attempts) tuples.
+    """
+    return claim_due(Task, Task.QUEUED, limit, _setting('LEASE', 5 * 60),
+                     ['id', 'name', 'args', 'kwargs', 'attempts', 'max_attempts'], 'max_attempts', Task.FAILED)
+
+
+def execute(task_id, name, args, kwargs, attempts, max_attempts):
+    """
+        Runs a claimed task and records the outcome. Returns whether it
+        succeeded.
+    """
+    try:
+        func = import_string(name)
+        if getattr(func, 'task_name', None) != name:
+            raise ValueError('%s is not a task' % name)
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Task %s (%i) failed, attempt %i of %i', name, task_id, attempts, max_attempts)
+        tasks = Task.objects.filter(pk=task_id)
+        if attempts >= max_attempts:
+            tasks.update(status=Task.FAILED, last_error=traceback.format_exc())
+        else:
+            tasks.update(run_at=timezone.now() + timedelta(seconds=retry_delay(attempts)),
+                         last_error=traceback.format_exc())
+        return False
+    Task.objects.filter(pk=task_id).delete()
+    return True
+
+
+def _execute_in_worker(claimed):
+    # Pool threads and processes keep a connection each, dropped when it broke or expired
+    close_old_connections()
+    try:
+        return execute(*claimed)
+    finally:
+        close_old_connections()
+
+
+def run_pending():
+    """
+        Runs due tasks one by one in this thread until there are none left.
+        Returns the number of tasks run.
+    """
+    count = 0
+    while True:
+        claimed = claim(1)
+        if not claimed:
+            return count
+        execute(*claimed[0])
+        count += 1
+
+
+def work(workers=None, processes=False, once=False, poll_interval=None):
+    """
+        Runs tasks on a pool of workers threads or processes, claiming more as
+        workers free up. With once, returns the number of tasks run when no
+        due task is left, otherwise polls for new tasks forever.
+    """
+    workers = workers or _setting('WORKERS', 4)
+    poll_interval = poll_interval or _setting('POLL_INTERVAL', 1.0)
+    if processes:
+        # Forked processes mustn't share the parent's connection
+        connections.close_all()
+    count = 0
+    with (Pool if processes else ThreadPool)(workers) as pool:
+        running = []
+        while True:
+            count += sum(1 for result in running if result.ready())
+            running = [result for result in running if not result.ready()]
+            claimed = claim(workers - len(running)) if len(running) < workers else []
+            running.extend(pool.apply_async(_execute_in_worker, (row,)) for row in claimed)
+            if once and not running:
+                return count
+            if not claimed:
+                time.sleep(poll_interval if not running else min(poll_interval, 0.1))
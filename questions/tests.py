@@ -1,12 +1,37 @@
-from django.test import TestCase
+import asyncio
+import importlib.util
+import os
+import shutil
+import smtplib
+import tempfile
+import threading
+import time
+from io import StringIO
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection, DatabaseError
+from unittest import skipUnless
 from django.shortcuts import reverse, Http404
 from django.utils import timezone
 from django.contrib.auth.models import User
 from django.contrib.auth import login
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.wsgi import get_wsgi_application
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django_resized.forms import ResizedImageFieldFile
 
-from .models import Question, Answer, Tag
+from stackoverflow.handlers import ASGIHandler
+from stackoverflow.sessions import SessionStore, hot_sessions
+from . import activity, deletion, duplicates, events, fuzzy, hot, notifications, outbox, postings, related, rendering, revisions, search, tagindex, tagtools, tasks, userstats, views, votes
+from .counters import ViewCounter
+from .tagindex import tag_index
+from .models import Question, Answer, UserProfile, Tag, TagStats, QuestionVote, AnswerVote, Task, OutboxEmail, Notification, Activity, UserStats, HotQuestion
 
 # Create your tests here.
 class IndexViewTests(TestCase):
@@ -742,9 +767,23 @@ class SearchViewTests(TestCase):
         response = self.client.get(reverse('questions:search'), {'q': 'Lorem ipsum'})
         self.assertEqual(response.status_code, 200)
         self.assertQuerysetEqual(response.context['questions'], ['<Question: How do I do that>', '<Question: Lorem ipsum dolor sit amet>'], ordered=False)
+        self.assertFalse(response.context['fuzzy'])
+
+    def test_search_users(self):
+        response = self.client.get(reverse('questions:search'), {'q': 'test'})
+        self.assertQuerysetEqual(response.context['users'], ['<User: test>', '<User: test2>'], ordered=False)
+
+    def test_fuzzy_fallback(self):
+        if not fuzzy.available():
+            self.skipTest('Requires the pg_trgm extension')
+        response = self.client.get(reverse('questions:search'), {'q': 'Lorem ipsun dolr'})
+        self.assertTrue(response.context['fuzzy'])
+        self.assertQuerysetEqual(response.context['questions'], ['<Question: Lorem ipsum dolor sit amet>'])
+        self.assertEqual(fuzzy.search_users('tesst2')[0], self.user2)
 
 class TaggedViewTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
         self.user2 = User.objects.create_user(username='test2', password='T3Ss$tTx')
         self.question1 = Question.objects.create(title="How do I do that", text="Lorem ipsum dolor sit amet consectetur adipiscing elit.",
@@ -775,3 +814,1352 @@ class TaggedViewTests(TestCase):
         response = self.client.get(reverse('questions:tagged', args=('lorem ipsum',)))
         self.assertEqual(response.status_code, 200)
         self.assertQuerysetEqual(response.context['questions'], ["<Question: How do I do that>", "<Question: Lorem ipsum dolor sit amet>"], ordered=False)
+
+    def test_tag_intersection(self):
+        response = self.client.get(reverse('questions:tagged', args=('lorem ipsum+tagged',)))
+        self.assertQuerysetEqual(response.context['questions'], ["<Question: Lorem ipsum dolor sit amet>"])
+
+    def test_tag_exclusion(self):
+        response = self.client.get(reverse('questions:tagged', args=('lorem ipsum+-tagged',)))
+        self.assertQuerysetEqual(response.context['questions'], ["<Question: How do I do that>"])
+        response = self.client.get(reverse('questions:tagged', args=('-tagged',)))
+        self.assertQuerysetEqual(response.context['questions'], ["<Question: How do I do that>"])
+
+    def test_tag_with_plus(self):
+        self.question1.tags.create(name='c++')
+        Tag.objects.create(name='c')
+        self.assertEqual(views.parse_tag_expression('c++'), (['c++'], []))
+        self.assertEqual(views.parse_tag_expression('c+++-tagged'), (['c++'], ['tagged']))
+        self.assertEqual(views.parse_tag_expression('c+lorem ipsum'), (['c', 'lorem ipsum'], []))
+        response = self.client.get(reverse('questions:tagged', args=('c++',)))
+        self.assertQuerysetEqual(response.context['questions'], ["<Question: How do I do that>"])
+        self.assertEqual(response.context['included'], ['c++'])
+        response = self.client.get(reverse('questions:tagged', args=('lorem ipsum+-c++',)))
+        self.assertQuerysetEqual(response.context['questions'], ["<Question: Lorem ipsum dolor sit amet>"])
+
+    def test_unknown_tag_in_intersection(self):
+        response = self.client.get(reverse('questions:tagged', args=('lorem ipsum+qwerty',)))
+        self.assertQuerysetEqual(response.context['questions'], [])
+
+    def test_postings_updated_incrementally(self):
+        tag = Tag.objects.get(name__exact='test')
+        postings.get_postings([tag.id])
+        self.question2.tags.add(tag)
+        self.assertEqual(list(postings.get_postings([tag.id])[tag.id]), [self.question1.id, self.question2.id])
+        self.question1.tags.remove(tag)
+        self.assertEqual(list(postings.get_postings([tag.id])[tag.id]), [self.question2.id])
+
+class SessionStoreTests(TestCase):
+
+    def setUp(self):
+        hot_sessions.clear()
+        self.session = SessionStore()
+        self.session['test'] = 'lorem ipsum'
+        self.session.create()
+
+    def test_load_from_cache(self):
+        hot_sessions.clear()
+        Session.objects.filter(session_key=self.session.session_key).delete()
+        session = SessionStore(self.session.session_key)
+        self.assertEqual(session['test'], 'lorem ipsum')
+
+    def test_unmodified_save_skipped_below_threshold(self):
+        expire_date = Session.objects.get(session_key=self.session.session_key).expire_date
+        session = SessionStore(self.session.session_key)
+        session.save()
+        self.assertEqual(Session.objects.get(session_key=self.session.session_key).expire_date, expire_date)
+
+    def test_unmodified_save_written_above_threshold(self):
+        Session.objects.filter(session_key=self.session.session_key).update(expire_date=timezone.now() + timedelta(days=1))
+        hot_sessions.clear()
+        cache.clear()
+        session = SessionStore(self.session.session_key)
+        session.save()
+        expire_date = Session.objects.get(session_key=self.session.session_key).expire_date
+        self.assertGreater(expire_date, timezone.now() + timedelta(days=2))
+
+    def test_modified_save_written(self):
+        session = SessionStore(self.session.session_key)
+        session['test'] = 'dolor'
+        session.save()
+        hot_sessions.clear()
+        cache.clear()
+        self.assertEqual(SessionStore(self.session.session_key)['test'], 'dolor')
+
+    def test_clear_expired_in_batches(self):
+        for _ in range(0, 5):
+            session = SessionStore()
+            session.set_expiry(-1)
+            session.create()
+        self.assertEqual(SessionStore.clear_expired(batch_size=2), 5)
+        self.assertQuerysetEqual(Session.objects.all(), ['<Session: %s>' % self.session.session_key])
+
+class ASGIHandlerTests(TestCase):
+
+    def setUp(self):
+        self.handler = ASGIHandler(get_wsgi_application(), max_workers=2)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.handler.executor.shutdown(wait=True)
+        self.loop.close()
+
+    def _request(self, path, query_string=b'', method='GET', body=b''):
+        scope = {
+            'type': 'http',
+            'method': method,
+            'path': path,
+            'query_string': query_string,
+            'headers': [(b'host', b'testserver')],
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        self.loop.run_until_complete(self.handler(scope, receive, send))
+        return sent
+
+    def test_index(self):
+        sent = self._request(reverse('questions:index'))
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'There is nothing here', sent[1]['body'])
+
+    def test_query_string(self):
+        sent = self._request(reverse('questions:search'), b'q=lorem')
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn(b'Search results for query "lorem"', sent[1]['body'])
+
+    def test_not_found(self):
+        sent = self._request('/qwerty/')
+        self.assertEqual(sent[0]['status'], 404)
+
+class AnswerEventsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+
+    def test_broker_returns_newer_events(self):
+        broker = events.Broker()
+        first = broker.publish(1, {'type': 'new'})
+        second = broker.publish(1, {'type': 'edit'})
+        broker.publish(2, {'type': 'new'})
+        self.assertEqual(broker.events_after(1, first['id']), [second])
+        self.assertEqual(broker.events_after(1, broker.current_id()), [])
+
+    def test_foreign_ids_replay_history(self):
+        broker = events.Broker()
+        first = broker.publish(1, {'type': 'new'})
+        second = broker.publish(1, {'type': 'edit'})
+        self.assertEqual(broker.events_after(1, events.Broker().current_id()), [first, second])
+        self.assertEqual(broker.events_after(1, ''), [first, second])
+
+    def test_render_event(self):
+        answer = _create_answer('dolor sit amet', self.question, self.user)
+        event = events.render_event({'id': 1, 'type': 'new', 'question': self.question.id, 'answer': answer.id})
+        self.assertIn('dolor sit amet', event['html'])
+
+    def test_poll(self):
+        last = events.current_id()
+        answer = _create_answer('dolor sit amet', self.question, self.user)
+        events.dispatch({'id': events.current_id(), 'type': 'new', 'question': self.question.id, 'answer': answer.id})
+        url = reverse('questions:answer_events_poll', args=(self.question.id,))
+        response = self.client.get(url, {'after': last})
+        self.assertEqual([e['answer'] for e in response.json()['events']], [answer.id])
+        response = self.client.get(url, {'after': events.current_id()})
+        self.assertEqual(response.json()['events'], [])
+
+    def test_wsgi_stream_returns_right_away(self):
+        last = events.current_id()
+        answer = _create_answer('dolor sit amet', self.question, self.user)
+        events.dispatch({'id': events.current_id(), 'type': 'new', 'question': self.question.id, 'answer': answer.id})
+        response = self.client.get(reverse('questions:answer_events', args=(self.question.id,)), {'after': last})
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'retry: '))
+        self.assertIn(b'dolor sit amet', body)
+
+    def test_pages_subscribe_only_under_asgi(self):
+        url = reverse('questions:question', args=(self.question.id,))
+        self.assertNotContains(self.client.get(url), 'data-events=')
+        environ = ASGIHandler(None).get_environ({'method': 'GET', 'path': url}, b'')
+        self.assertContains(self.client.get(url, **{'stackoverflow.asgi': environ['stackoverflow.asgi']}), 'data-events=')
+
+    def _asgi_stream(self, on_send, after=''):
+        loop = asyncio.new_event_loop()
+        requests = [{'type': 'http.request', 'body': b'', 'more_body': False}]
+        disconnected = loop.create_future()
+        sent = []
+
+        async def receive():
+            if requests:
+                return requests.pop(0)
+            await disconnected
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+            on_send(message, disconnected)
+
+        scope = {'type': 'http', 'path': '/', 'query_string': ('after=' + after).encode('latin1'), 'headers': []}
+        try:
+            loop.run_until_complete(events.asgi_stream(scope, receive, send, str(self.question.id)))
+        finally:
+            loop.close()
+        return sent
+
+    def test_asgi_stream(self):
+        last = events.current_id()
+        events.broker.publish(self.question.id, {'type': 'new', 'answer': 1, 'html': 'backlog'})
+
+        def on_send(message, disconnected):
+            body = message.get('body', b'')
+            if body.startswith(b'retry'):
+                events.broker.publish(self.question.id, {'type': 'new', 'answer': 2, 'html': 'live'})
+            elif b'live' in body:
+                disconnected.set_result(None)
+
+        sent = self._asgi_stream(on_send, last)
+        self.assertEqual(sent[0]['status'], 200)
+        bodies = b''.join(m['body'] for m in sent[1:])
+        self.assertIn(b'backlog', bodies)
+        self.assertEqual(bodies.count(b'live'), 1)
+        self.assertNotIn(self.question.id, events.broker._subscribers)
+
+    @override_settings(ANSWER_EVENTS_ASGI_STREAM_TIMEOUT=0.05)
+    def test_asgi_stream_ends(self):
+        sent = self._asgi_stream(lambda message, disconnected: None)
+        self.assertTrue(sent[1]['more_body'])
+        self.assertEqual(sent[-1], {'type': 'http.response.body', 'body': b'', 'more_body': False})
+        self.assertNotIn(self.question.id, events.broker._subscribers)
+
+class ViewCounterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.question2 = Question.objects.create(title="Dolor sit amet?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.counter = ViewCounter()
+
+    def test_views_deduplicated_per_visitor(self):
+        self.assertIs(self.counter.record(self.question.id, 'a'), True)
+        self.assertIs(self.counter.record(self.question.id, 'a'), False)
+        self.assertIs(self.counter.record(self.question.id, 'b'), True)
+        self.assertEqual(self.counter.pending(self.question.id), 2)
+
+    def test_flush(self):
+        self.counter.record(self.question.id, 'a')
+        self.counter.record(self.question.id, 'b')
+        self.counter.record(self.question2.id, 'a')
+        self.assertEqual(self.counter.flush(), 2)
+        self.assertEqual(Question.objects.get(pk=self.question.id).views, 2)
+        self.assertEqual(Question.objects.get(pk=self.question2.id).views, 1)
+        self.assertEqual(self.counter.pending(self.question.id), 0)
+
+    def test_question_view_counts(self):
+        url = reverse('questions:question', args=(self.question.id,))
+        self.assertEqual(self.client.get(url).context['views'], 1)
+        self.assertEqual(self.client.get(url).context['views'], 1)
+
+    def test_failed_flush_keeps_counts(self):
+        class FailingCounter(ViewCounter):
+            def write(self, pending):
+                raise DatabaseError('unavailable')
+
+        counter = FailingCounter()
+        counter._last_flush = 0
+        self.assertIs(counter.record(self.question.id, 'a'), True)
+        self.assertIs(counter.record(self.question.id, 'b'), True)
+        self.assertEqual(counter.pending(self.question.id), 2)
+        # Nothing left for the timer to retry
+        counter._pending.clear()
+
+    @override_settings(VIEW_COUNT_FLUSH_INTERVAL=0.01)
+    def test_timer_flushes(self):
+        written = threading.Event()
+
+        class RecordingCounter(ViewCounter):
+            def write(self, pending):
+                written.set()
+                return len(pending)
+
+        counter = RecordingCounter()
+        counter._last_flush = time.time() + 60
+        counter.record(self.question.id, 'a')
+        self.assertEqual(counter.pending(self.question.id), 1)
+        counter._last_flush = 0
+        self.assertTrue(written.wait(5))
+        self.assertEqual(counter.pending(self.question.id), 0)
+
+class VoteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.user2 = User.objects.create_user(username='test2', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.url = reverse('questions:question_vote', args=(self.question.id,))
+
+    def test_upvote_question(self):
+        self.client.login(username='test2', password='T3Ss$tTx')
+        self.client.post(self.url, {'value': 'up'})
+        self.assertEqual(Question.objects.get(pk=self.question.id).score, 1)
+
+    def test_repeated_vote_takes_it_back(self):
+        self.client.login(username='test2', password='T3Ss$tTx')
+        self.client.post(self.url, {'value': 'up'})
+        self.client.post(self.url, {'value': 'up'})
+        self.assertEqual(Question.objects.get(pk=self.question.id).score, 0)
+        self.assertQuerysetEqual(QuestionVote.objects.all(), [])
+
+    def test_switch_vote(self):
+        self.client.login(username='test2', password='T3Ss$tTx')
+        self.client.post(self.url, {'value': 'up'})
+        self.client.post(self.url, {'value': 'down'})
+        self.assertEqual(Question.objects.get(pk=self.question.id).score, -1)
+
+    def test_cannot_vote_own_question(self):
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.client.post(self.url, {'value': 'up'})
+        self.assertEqual(Question.objects.get(pk=self.question.id).score, 0)
+
+    def test_cannot_vote_not_logged(self):
+        self.client.post(self.url, {'value': 'up'})
+        self.assertEqual(Question.objects.get(pk=self.question.id).score, 0)
+
+    def test_answers_ordered_by_score(self):
+        answer = _create_answer('first', self.question, self.user)
+        answer2 = _create_answer('second', self.question, self.user)
+        self.client.login(username='test2', password='T3Ss$tTx')
+        self.client.post(reverse('questions:answer_vote', args=(self.question.id, answer.id)), {'value': 'up'})
+        self.assertEqual(Answer.objects.get(pk=answer.id).score, 1)
+        response = self.client.get(reverse('questions:question', args=(self.question.id,)))
+        self.assertEqual(response.context['answers'], [answer, answer2])
+        response = self.client.get(reverse('questions:question', args=(self.question.id,)), {'sort': 'newest'})
+        self.assertEqual(response.context['answers'], [answer2, answer])
+
+class TagAutocompleteTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.question2 = Question.objects.create(title="Dolor sit amet?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.question.tags.create(name='python')
+        self.question.tags.create(name='Pyramid')
+        self.question2.tags.add(Tag.objects.get(name='python'))
+        Tag.objects.create(name='django')
+        tag_index.build()
+
+    def test_prefix_ordered_by_usage(self):
+        self.assertEqual(tag_index.complete('py'), [('python', 2), ('Pyramid', 1)])
+        self.assertEqual(tag_index.complete('PYR'), [('Pyramid', 1)])
+        self.assertEqual(tag_index.complete('qwerty'), [])
+
+    def test_updated_incrementally(self):
+        self.question2.tags.add(Tag.objects.get(name='Pyramid'))
+        self.question2.tags.create(name='pytest')
+        self.question.tags.remove(Tag.objects.get(name='python'))
+        self.assertEqual(tag_index.complete('py'), [('Pyramid', 2), ('pytest', 1), ('python', 1)])
+
+    def test_build_skips_deleted_questions(self):
+        Question.all_objects.filter(pk=self.question2.id).update(is_deleted=True)
+        tag_index.build()
+        self.assertEqual(tag_index.complete('py'), [('Pyramid', 1), ('python', 1)])
+        Question.all_objects.get(pk=self.question2.id).tags.clear()
+        self.assertEqual(tag_index.complete('py'), [('Pyramid', 1), ('python', 1)])
+
+    def test_deleted_question_and_tag(self):
+        self.question.delete()
+        Tag.objects.get(name='Pyramid').delete()
+        self.assertEqual(tag_index.complete('py'), [('python', 1)])
+
+    @override_settings(TAG_INDEX_CHECK_INTERVAL=0)
+    def test_rebuilt_on_version_change(self):
+        # A rename made by another process, which only advances the version
+        Tag.objects.filter(name='Pyramid').update(name='pyglet')
+        self.assertEqual(tag_index.complete('pyr'), [('Pyramid', 1)])
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [tagindex.VERSION_SEQUENCE])
+        self.assertEqual(tag_index.complete('pyr'), [])
+        self.assertEqual(tag_index.complete('pyg'), [('pyglet', 1)])
+
+    def test_autocomplete_view(self):
+        response = self.client.get(reverse('questions:tag_autocomplete'), {'q': 'dj'})
+        self.assertEqual(response.json(), {'tags': [{'name': 'django', 'count': 0}]})
+
+class TagStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.old_question = Question.objects.create(title="Dolor sit amet?", text="Lorem ipsum.",
+                                                    creation_time=timezone.now() - timedelta(days=30), owner=self.user)
+        self.question.tags.create(name='python')
+        self.old_question.tags.add(Tag.objects.get(name='python'))
+        self.old_question.tags.create(name='django')
+        Tag.objects.create(name='flask')
+
+    def stats(self, name):
+        stats = TagStats.objects.get(tag__name=name)
+        return stats.question_count, stats.questions_this_week
+
+    def test_counters_follow_tag_changes(self):
+        self.assertEqual(self.stats('python'), (2, 1))
+        self.assertEqual(self.stats('django'), (1, 0))
+        self.assertEqual(self.stats('flask'), (0, 0))
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.client.post(reverse('questions:question_edit', args=(self.question.id,)),
+                         {'title': 'Lorem ipsum?', 'text': 'Lorem ipsum.', 'tags': 'python, flask'})
+        self.assertEqual(self.stats('python'), (2, 1))
+        self.assertEqual(self.stats('flask'), (1, 1))
+        self.old_question.delete()
+        self.assertEqual(self.stats('python'), (1, 1))
+        self.assertEqual(self.stats('django'), (0, 0))
+
+    def test_rebuild(self):
+        TagStats.objects.update(question_count=100, week_count=100)
+        call_command('rebuild_tag_stats', stdout=StringIO())
+        self.assertEqual(self.stats('python'), (2, 1))
+        self.assertEqual(self.stats('flask'), (0, 0))
+        self.assertEqual(TagStats.objects.get(tag__name='python').last_activity, self.question.creation_time)
+
+    def test_deleted_questions_not_counted(self):
+        Question.all_objects.filter(pk=self.question.id).update(is_deleted=True)
+        call_command('rebuild_tag_stats', stdout=StringIO())
+        self.assertEqual(self.stats('python'), (1, 0))
+        Question.all_objects.get(pk=self.question.id).tags.clear()
+        self.assertEqual(self.stats('python'), (1, 0))
+        deletion.soft_delete(self.old_question)
+        self.assertEqual(self.stats('python'), (0, 0))
+        self.assertEqual(self.stats('django'), (0, 0))
+
+    def test_directory_sorting(self):
+        response = self.client.get(reverse('questions:tags'))
+        self.assertEqual([str(s) for s in response.context['tags']], ['python', 'django', 'flask'])
+        response = self.client.get(reverse('questions:tags'), {'sort': 'name'})
+        self.assertEqual([str(s) for s in response.context['tags']], ['django', 'flask', 'python'])
+        self.assertContains(response, reverse('questions:tagged', args=('django',)))
+
+class TagToolsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.question2 = Question.objects.create(title="Dolor sit amet?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.python = self.question.tags.create(name='python')
+        self.py = self.question.tags.create(name='py')
+        self.question2.tags.add(self.py)
+        Tag.objects.create(name='unused')
+        Tag.objects.create(name='unused2')
+        tag_index.build()
+
+    def test_collect_orphans(self):
+        self.assertEqual(tagtools.collect_orphans(batch_size=1), 2)
+        self.assertQuerysetEqual(Tag.objects.order_by('name'), ['<Tag: py>', '<Tag: python>'])
+
+    def test_merge(self):
+        postings.match([[self.python.id]])
+        self.assertEqual(tagtools.merge(self.py, self.python), 1)
+        self.assertFalse(Tag.objects.filter(name='py').exists())
+        self.assertQuerysetEqual(self.question.tags.all(), ['<Tag: python>'])
+        self.assertQuerysetEqual(self.question2.tags.all(), ['<Tag: python>'])
+        self.assertEqual(postings.match([[self.python.id]]), [self.question2.id, self.question.id])
+        self.assertEqual(TagStats.objects.get(tag=self.python).question_count, 2)
+        self.assertEqual(tag_index.complete('py'), [('python', 2)])
+
+    def test_merge_command_renames(self):
+        call_command('merge_tags', 'unused', 'renamed', stdout=StringIO())
+        self.assertTrue(Tag.objects.filter(name='renamed').exists())
+        call_command('merge_tags', 'renamed', 'python', stdout=StringIO())
+        self.assertFalse(Tag.objects.filter(name='renamed').exists())
+        self.assertEqual(Tag.objects.count(), 3)
+
+class HotQuestionsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        now = timezone.now()
+        self.old = Question.objects.create(title="Old", text="Lorem ipsum.", creation_time=now - timedelta(days=30), owner=self.user)
+        self.quiet = Question.objects.create(title="Quiet", text="Lorem ipsum.", creation_time=now - timedelta(days=1), owner=self.user)
+        self.busy = Question.objects.create(title="Busy", text="Lorem ipsum.", creation_time=now - timedelta(days=2), owner=self.user)
+        self.new = Question.objects.create(title="New", text="Lorem ipsum.", creation_time=now, owner=self.user)
+        for i in range(3):
+            Answer.objects.create(text="Lorem ipsum.", creation_time=now, owner=self.user, question=self.busy)
+        Answer.objects.create(text="Lorem ipsum.", creation_time=now, owner=self.user, question=self.old)
+
+    def test_ranking(self):
+        hot.compute()
+        self.assertEqual(hot.ranked_ids(), [self.busy.id, self.old.id, self.new.id, self.quiet.id])
+
+    def test_bump(self):
+        hot.compute()
+        for i in range(3):
+            Answer.objects.create(text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user, question=self.quiet)
+        self.assertEqual(hot.ranked_ids()[:2], [self.quiet.id, self.busy.id])
+
+    def test_bump_enters_ranking(self):
+        hot.compute()
+        Question.objects.filter(pk=self.new.id).update(creation_time=timezone.now() - timedelta(days=30))
+        hot.compute()
+        self.assertNotIn(self.new.id, hot.ranked_ids())
+        hot.bump(self.new.id, hot.ANSWER)
+        hot.bump(self.new.id, hot.ANSWER)
+        self.assertAlmostEqual(HotQuestion.objects.get(question=self.new).heat, 2 * hot.ANSWER, places=3)
+
+    @override_settings(HOT_QUESTIONS_MAX_AGE=60)
+    def test_stale_ranking_recomputed_in_background(self):
+        hot.compute()
+        HotQuestion.objects.update(reference=time.time() - 120)
+        HotQuestion.objects.filter(question=self.new).delete()
+        with self.assertNumQueries(3):
+            self.assertEqual(hot.ranked_ids(), [self.busy.id, self.old.id, self.quiet.id])
+        hot.ranked_ids()
+        self.assertEqual(Task.objects.get().name, 'questions.hot.compute')
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertGreater(HotQuestion.objects.get(question=self.busy).reference, time.time() - 60)
+        with self.assertNumQueries(1):
+            self.assertEqual(hot.ranked_ids(), [self.busy.id, self.old.id, self.new.id, self.quiet.id])
+
+    def test_missing_ranking_not_computed_on_read(self):
+        self.assertEqual(hot.ranked_ids(), [])
+        self.assertFalse(HotQuestion.objects.exists())
+        self.assertEqual(Task.objects.get().name, 'questions.hot.compute')
+
+    def test_hot_view(self):
+        hot.compute()
+        response = self.client.get(reverse('questions:hot'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([q.title for q in response.context['questions']], ['Busy', 'Old', 'New', 'Quiet'])
+        self.assertContains(response, 'class="active">Hot')
+
+@skipUnless(importlib.util.find_spec('scipy'), 'Requires NumPy and SciPy')
+class RelatedQuestionsTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(RELATED_MODEL_FILE=os.path.join(directory, 'related_model.pickle'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.django = Question.objects.create(title="Django migrations fail", text="Running migrations on postgres fails.",
+                                              creation_time=timezone.now(), owner=self.user)
+        self.django.tags.create(name='django')
+        self.django2 = Question.objects.create(title="Squashing Django migrations", text="How to squash migrations?",
+                                               creation_time=timezone.now(), owner=self.user)
+        self.django2.tags.add(Tag.objects.get(name='django'))
+        self.pasta = Question.objects.create(title="Cooking pasta", text="How long should pasta boil?",
+                                             creation_time=timezone.now(), owner=self.user)
+        self.postgres = Question.objects.create(title="Postgres vacuum", text="When does postgres vacuum run?",
+                                                creation_time=timezone.now(), owner=self.user)
+
+    def test_build(self):
+        self.assertEqual(related.build(), 4)
+        self.assertEqual(related.related_questions(self.django.id), [self.django2, self.postgres])
+        self.assertEqual(related.related_questions(self.pasta.id), [])
+
+    def test_update_new_questions(self):
+        related.build(k=1)
+        question = Question.objects.create(title="Django migrations on postgres fail", text="Running migrations on postgres fails.",
+                                           creation_time=timezone.now(), owner=self.user)
+        question.tags.add(Tag.objects.get(name='django'))
+        self.assertEqual(related.update(k=1), 2)
+        self.assertEqual(related.related_questions(question.id), [self.django])
+        self.assertEqual(related.related_questions(self.django.id), [question])
+        self.assertEqual(related.related_questions(self.postgres.id), [question])
+
+    def test_update_vectorizes_only_new_questions(self):
+        related.build(k=1)
+        self.pasta.delete()
+        question = Question.objects.create(title="Boiling pasta al dente", text="How long should pasta boil?",
+                                           creation_time=timezone.now(), owner=self.user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(related.update(k=1), 1)
+        # Only the new question's text is loaded
+        self.assertTrue(all('IN (' in q['sql'] for q in queries.captured_queries if '"questions_question"."title"' in q['sql']))
+        self.assertEqual(related.related_questions(question.id), [])
+        self.assertNotIn(self.pasta.id, related._load()['ids'])
+
+    def test_update_without_model_builds(self):
+        self.assertEqual(related.update(k=1), 4)
+        self.assertEqual(related.related_questions(self.django.id), [self.django2])
+
+    def test_sidebar(self):
+        call_command('build_related', stdout=StringIO())
+        response = self.client.get(reverse('questions:question', args=(self.django.id,)))
+        self.assertEqual(response.context['related'], [self.django2, self.postgres])
+        self.assertContains(response, 'Squashing Django migrations')
+
+class DuplicateQuestionsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="How to reverse a list in Python",
+                                                text="I have a list of numbers and want it reversed without copying.",
+                                                creation_time=timezone.now(), owner=self.user)
+        self.other = Question.objects.create(title="Postgres vacuum settings", text="When does autovacuum run on big tables?",
+                                             creation_time=timezone.now(), owner=self.user)
+
+    def test_signature(self):
+        a = duplicates.signature("Reverse a list in Python", "")
+        self.assertEqual(len(a), duplicates.SIGNATURE)
+        self.assertEqual(duplicates.similarity(a, a), 1.0)
+        self.assertEqual(duplicates.signature("", ""), [])
+        self.assertEqual(len(duplicates.buckets(a)), duplicates.SIGNATURE // duplicates.BAND_ROWS)
+
+    def test_find_similar(self):
+        found = duplicates.find_similar("How to reverse a list in Python",
+                                        "I have a list of numbers and want it reversed without copying.")
+        self.assertEqual([q for q, similarity in found], [self.question])
+        self.assertEqual(found[0][1], 1.0)
+        self.assertEqual(duplicates.find_similar("Baking bread at home"), [])
+
+    def test_edit_and_reindex(self):
+        self.question.title = "Baking bread at home"
+        self.question.text = "Which flour works best?"
+        self.question.save(update_fields=['title', 'text'])
+        self.assertEqual([q for q, _ in duplicates.find_similar("Baking bread at home", "Which flour works best?")], [self.question])
+        Question.objects.update(minhash=[], lsh_buckets=[])
+        call_command('index_duplicates', stdout=StringIO())
+        self.assertEqual([q for q, _ in duplicates.find_similar("Postgres vacuum settings", "When does autovacuum run on tables?")],
+                         [self.other])
+
+    def test_dissimilar_not_candidates(self):
+        self.assertEqual(duplicates.find_similar("Reverse a list in Ruby", "I have an array of strings to sort."), [])
+
+    @override_settings(DUPLICATE_CANDIDATES=1)
+    def test_candidates_capped(self):
+        copy = Question.objects.create(title=self.question.title, text=self.question.text,
+                                       creation_time=timezone.now(), owner=self.user)
+        self.assertEqual([q for q, _ in duplicates.find_similar(self.question.title, self.question.text)], [copy])
+
+    def test_endpoint(self):
+        response = self.client.get(reverse('questions:similar_questions'), {
+            'title': 'Reverse a list in Python', 'text': 'I have a list of numbers and want it reversed.'
+        })
+        self.assertEqual([q['id'] for q in response.json()['questions']], [self.question.id])
+
+    def test_ask_confirms_duplicates(self):
+        self.client.login(username='test', password='T3Ss$tTx')
+        data = {'title': 'How to reverse a list in Python',
+                'text': 'I have a list of numbers and want it reversed without copying.'}
+        response = self.client.post(reverse('questions:ask'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['duplicates'], [self.question])
+        self.assertEqual(Question.objects.count(), 2)
+        data['not_duplicate'] = '1'
+        response = self.client.post(reverse('questions:ask'), data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Question.objects.count(), 3)
+
+class InvertedIndexBackendTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="How do I do that", text="Lorem ipsum dolor sit amet consectetur adipiscing elit.",
+                                                creation_time=timezone.now(), owner=self.user)
+        self.question2 = Question.objects.create(title="Lorem ipsum dolor sit amet", text="test test test test test test test test test test",
+                                                 creation_time=timezone.now(), owner=self.user)
+        self.backend = search.get_backend('questions.search.InvertedIndexBackend')
+
+    def tearDown(self):
+        search._backends.clear()
+
+    def test_search(self):
+        self.assertEqual(self.backend.search('lorem ipsum'), [self.question.id, self.question2.id])
+        self.assertEqual(self.backend.search('test'), [self.question2.id])
+        self.assertEqual(self.backend.search('lorem qwerty'), [])
+        self.assertEqual(self.backend.search('the'), [])
+
+    def test_updated_from_signals(self):
+        self.backend.search('lorem')
+        question = Question.objects.create(title="Qwerty keyboards", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.assertEqual(self.backend.search('qwerty'), [question.id])
+        question.title = "Dvorak keyboards"
+        question.save()
+        self.assertEqual(self.backend.search('qwerty'), [])
+        self.question2.delete()
+        self.assertEqual(self.backend.search('lorem dolor'), [self.question.id])
+
+    @override_settings(SEARCH_BACKEND='questions.search.InvertedIndexBackend')
+    def test_search_view(self):
+        response = self.client.get(reverse('questions:search'), {'q': 'Lorem ipsum'})
+        self.assertEqual(list(response.context['questions']), [self.question, self.question2])
+
+    def test_benchmark(self):
+        out = StringIO()
+        call_command('benchmark_search', 'lorem ipsum', 'test', repeat=1, stdout=out)
+        self.assertIn('"test": 1 of the top 10 results shared', out.getvalue())
+
+class SearchSnippetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Escaping <b> tags", text="Lorem ipsum <script> dolor sit amet.",
+                                                creation_time=timezone.now(), owner=self.user)
+
+    def test_postgres_headline(self):
+        title, snippet = search.snippets([self.question], 'dolor')[self.question.id]
+        self.assertEqual(title, 'Escaping &lt;b&gt; tags')
+        self.assertIn('&lt;script&gt; <mark>dolor</mark> sit', snippet)
+
+    def test_python_highlighter(self):
+        backend = search.InvertedIndexBackend()
+        title, snippet = search.snippets([self.question], 'Escaping dolor', backend=backend)[self.question.id]
+        self.assertEqual(title, '<mark>Escaping</mark> &lt;b&gt; tags')
+        self.assertEqual(snippet, 'Lorem ipsum &lt;script&gt; <mark>dolor</mark> sit amet.')
+
+    def test_cached_per_version(self):
+        backend = search.InvertedIndexBackend()
+        search.snippets([self.question], 'dolor', backend=backend)
+        backend.highlight = None
+        self.assertIn('<mark>', search.snippets([self.question], '  Dolor ', backend=backend)[self.question.id][1])
+        self.question.text = 'Dolor sit amet.'
+        self.question.save()
+        with self.assertRaises(TypeError):
+            search.snippets([self.question], 'dolor', backend=backend)
+
+    def test_search_page(self):
+        for i in range(16):
+            Question.objects.create(title="Lorem %i" % i, text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        response = self.client.get(reverse('questions:search'), {'q': 'lorem', 'page': 2})
+        self.assertEqual(len(response.context['questions']), 2)
+        self.assertContains(response, '<mark>Lorem</mark>')
+        self.assertContains(response, '?q=lorem&amp;page=1')
+
+class SearchFacetsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum", text="Dolor sit amet.", creation_time=timezone.now(), owner=self.user)
+        self.question2 = Question.objects.create(title="Lorem dolor", text="Sit amet.", creation_time=timezone.now(), owner=self.user)
+        self.question3 = Question.objects.create(title="Ipsum", text="Amet.", creation_time=timezone.now(), owner=self.user)
+        self.question.tags.create(name='python')
+        self.question.tags.create(name='django')
+        self.question2.tags.add(Tag.objects.get(name='python'))
+        self.question3.tags.create(name='flask')
+
+    def test_facet_counts(self):
+        response = self.client.get(reverse('questions:search'), {'q': 'lorem'})
+        self.assertEqual([(f['name'], f['count']) for f in response.context['facets']], [('python', 2), ('django', 1)])
+
+    def test_facet_filter(self):
+        response = self.client.get(reverse('questions:search'), {'q': 'amet', 'tag': ['python', 'django']})
+        self.assertEqual(response.context['questions'], [self.question])
+        self.assertEqual([t['name'] for t in response.context['selected_tags']], ['python', 'django'])
+        self.assertEqual(response.context['facets'], [])
+        self.assertEqual(response.context['selected_tags'][0]['query'], 'q=amet&tag=django')
+        response = self.client.get(reverse('questions:search'), {'q': 'amet', 'tag': 'qwerty'})
+        self.assertEqual(response.context['questions'], [])
+
+class RenderingTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Some **bold** text <script>alert(1)</script>\n\n    code",
+                                                creation_time=timezone.now(), owner=self.user)
+
+    def test_rendered_on_save(self):
+        self.assertEqual(self.question.text_html, '<p>Some <strong>bold</strong> text alert(1)</p>\n<pre><code>code\n</code></pre>')
+        self.assertEqual(self.question.excerpt, 'Some bold text alert(1) code')
+        self.assertEqual(self.question.render_version, rendering.RENDER_VERSION)
+        answer = Answer.objects.create(text="*emphasis*", creation_time=timezone.now(), owner=self.user, question=self.question)
+        self.assertEqual(answer.text_html, '<p><em>emphasis</em></p>')
+
+    def test_edit_views_render(self):
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.client.post(reverse('questions:question_edit', args=(self.question.id,)),
+                         {'title': 'Lorem ipsum?', 'text': '[link](javascript:alert(1)) and [ok](http://example.com)', 'tags': ''})
+        question = Question.objects.get(pk=self.question.id)
+        self.assertEqual(question.text_html, '<p><a>link</a> and <a href="http://example.com">ok</a></p>')
+        response = self.client.get(reverse('questions:question', args=(self.question.id,)))
+        self.assertContains(response, '<a href="http://example.com">ok</a>')
+
+    def test_excerpt_cut_at_word(self):
+        self.assertEqual(rendering.excerpt('<p>%s</p>' % ('word ' * 50), length=20), 'word word word word…')
+
+    def test_rerender_command(self):
+        Question.objects.update(text_html='', excerpt='', render_version=0)
+        call_command('rerender_posts', workers=2, batch_size=1, stdout=StringIO())
+        question = Question.objects.get(pk=self.question.id)
+        self.assertEqual(question.render_version, rendering.RENDER_VERSION)
+        self.assertEqual(question.excerpt, 'Some bold text alert(1) code')
+
+class QuestionListTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        for i in range(3):
+            question = Question.objects.create(title="Lorem ipsum %i" % i, text="Lorem ipsum. " * 500,
+                                               creation_time=timezone.now(), owner=self.user)
+            question.tags.create(name='tag%i' % i)
+
+    def assertListQueries(self, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'ipsum 2')
+        question_queries = [q['sql'] for q in queries.captured_queries if 'FROM "questions_question"' in q['sql']]
+        self.assertTrue(question_queries)
+        for sql in question_queries:
+            # Search conditions may read it, the selected columns may not
+            self.assertNotIn('"questions_question"."text"', sql.split(' FROM ')[0])
+        # Owners come along with the questions
+        self.assertFalse([q for q in queries.captured_queries if 'WHERE "auth_user"."id" = ' in q['sql']])
+
+    def test_lists_skip_bodies(self):
+        self.assertListQueries(reverse('questions:index'))
+        hot.compute()
+        self.assertListQueries(reverse('questions:hot'))
+        self.assertListQueries(reverse('questions:tagged', args=('tag2',)))
+        self.assertListQueries(reverse('questions:tagged', args=('-tag1',)))
+        self.assertListQueries(reverse('questions:search'), {'q': 'lorem'})
+
+    def test_queries_independent_of_page_size(self):
+        urls = [
+            (reverse('questions:index'), None),
+            (reverse('questions:hot'), None),
+            (reverse('questions:tagged', args=('tag2',)), None),
+            (reverse('questions:tagged', args=('-tag1',)), None),
+            (reverse('questions:search'), {'q': 'lorem'})
+        ]
+        counts = []
+        for url, data in urls:
+            cache.clear()
+            hot.compute()
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(url, data)
+            counts.append(len(queries))
+        tag = Tag.objects.get(name='tag2')
+        for i in range(12):
+            owner = User.objects.create_user(username='owner%i' % i, password='T3Ss$tTx')
+            question = Question.objects.create(title="Lorem ipsum %i" % (i + 3), text="Lorem ipsum.",
+                                               creation_time=timezone.now(), owner=owner)
+            question.tags.add(tag)
+        for (url, data), count in zip(urls, counts):
+            cache.clear()
+            hot.compute()
+            with self.assertNumQueries(count):
+                self.assertGreaterEqual(len(self.client.get(url, data).context['questions']), 13)
+
+    def test_backfill_excerpts(self):
+        Question.objects.update(excerpt='')
+        out = StringIO()
+        call_command('backfill_excerpts', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Filled 3 excerpts.')
+        self.assertTrue(Question.objects.first().excerpt.startswith('Lorem ipsum. Lorem ipsum.'))
+
+class RevisionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.other = User.objects.create_user(username='other', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="line 1\nline 2\nline 3\n",
+                                                creation_time=timezone.now(), owner=self.user)
+
+    def test_delta_roundtrip(self):
+        old = "a\nb\nc\nd\n"
+        for new in ["a\nb\nc\nd\n", "a\nx\nc\nd\n", "", "b\nd\ne", "\n\na\n"]:
+            self.assertEqual(revisions.patch(old, revisions.delta(old, new)), new)
+
+    def test_edits_add_revisions(self):
+        self.assertEqual(self.question.revisions.count(), 1)
+        self.assertTrue(self.question.revisions.get().is_snapshot)
+        self.question.save()
+        self.assertEqual(self.question.revisions.count(), 1)
+        self.question.text = "line 1\nline two\nline 3\n"
+        self.question.save(update_fields=['text'])
+        revision = self.question.revisions.get(number=2)
+        self.assertFalse(revision.is_snapshot)
+        self.assertEqual(revision.author, self.user)
+        self.assertEqual(revisions.content_at(self.question.revisions.all(), 1)['text'], "line 1\nline 2\nline 3\n")
+        self.assertEqual(revisions.content_at(self.question.revisions.all(), 2),
+                         {'title': "Lorem ipsum?", 'text': "line 1\nline two\nline 3\n"})
+
+    @override_settings(REVISION_SNAPSHOT_INTERVAL=3)
+    def test_snapshots_bound_reconstruction(self):
+        for i in range(7):
+            self.question.text = "line %i\n" % i * (i + 1)
+            self.question.save()
+        self.assertEqual(list(self.question.revisions.filter(is_snapshot=True).values_list('number', flat=True).order_by('number')),
+                         [1, 4, 7])
+        with CaptureQueriesContext(connection) as queries:
+            content = revisions.content_at(self.question.revisions.all(), 6)
+        self.assertEqual(content['text'], "line 4\n" * 5)
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(revisions.contents(self.question.revisions.all(), 2, 8)[8]['text'], "line 6\n" * 7)
+
+    def test_answer_revisions(self):
+        answer = Answer.objects.create(text="first", creation_time=timezone.now(), owner=self.other, question=self.question)
+        self.client.login(username='other', password='T3Ss$tTx')
+        self.client.post(reverse('questions:answer_edit', args=(self.question.id, answer.id)), {'text': 'second'})
+        self.assertEqual(answer.revisions.count(), 2)
+        response = self.client.get(reverse('questions:answer_revisions', args=(self.question.id, answer.id)))
+        self.assertEqual([r.number for r in response.context['revisions']], [2, 1])
+        self.assertEqual(response.context['revisions'][0].changes, [('text', [('@', '@ -1 +1 @@'), ('-', 'first'), ('+', 'second')])])
+
+    def test_history_view_pages(self):
+        for i in range(12):
+            self.question.title = "Lorem ipsum %i?" % i
+            self.question.save()
+        response = self.client.get(reverse('questions:question_revisions', args=(self.question.id,)))
+        self.assertEqual([r.number for r in response.context['revisions']], list(range(13, 3, -1)))
+        self.assertNotContains(response, 'Restore')
+        response = self.client.get(reverse('questions:question_revisions', args=(self.question.id,)), {'page': 2})
+        self.assertEqual([r.number for r in response.context['revisions']], [3, 2, 1])
+        self.assertEqual([field for field, _ in response.context['revisions'][0].changes], ['title'])
+        self.assertEqual([field for field, _ in response.context['revisions'][2].changes], ['title', 'text'])
+
+    def test_restore(self):
+        self.question.text = "changed"
+        self.question.save()
+        url = reverse('questions:question_revisions', args=(self.question.id,))
+        self.client.login(username='other', password='T3Ss$tTx')
+        self.assertEqual(self.client.post(url, {'number': 1}).status_code, 404)
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.assertContains(self.client.get(url), 'Restore', count=1)
+        self.client.post(url, {'number': 1})
+        question = Question.objects.get(pk=self.question.id)
+        self.assertEqual(question.text, "line 1\nline 2\nline 3\n")
+        self.assertEqual(question.revisions.count(), 3)
+
+class QuestionDeletionTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+        self.question.tags.create(name='lorem')
+        for i in range(5):
+            answer = Answer.objects.create(text="Answer %i" % i, creation_time=timezone.now(), owner=self.user, question=self.question)
+            AnswerVote.objects.create(user=self.user, answer=answer, value=1)
+
+    def test_delete_view_hides_question(self):
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.client.post(reverse('questions:question_delete', args=(self.question.id,)))
+        question = Question.all_objects.get(pk=self.question.id)
+        self.assertTrue(question.is_deleted)
+        self.assertEqual(Answer.objects.filter(question=question).count(), 5)
+        self.assertFalse(question.tags.exists())
+        self.assertEqual(TagStats.objects.get(tag__name='lorem').question_count, 0)
+        self.assertEqual(self.client.get(reverse('questions:question', args=(question.id,))).status_code, 404)
+        self.assertQuerysetEqual(self.client.get(reverse('questions:index')).context['questions'], [])
+        self.assertEqual(hot.compute(), [])
+
+    def test_deleted_question_leaves_search_index(self):
+        backend = search.InvertedIndexBackend()
+        backend.build()
+        search._backends['test'] = backend
+        try:
+            deletion.soft_delete(self.question)
+            self.assertEqual(backend.search('lorem'), [])
+        finally:
+            del search._backends['test']
+
+    def test_purge_deletes_answers_in_batches(self):
+        other = Question.objects.create(title="Other", text="Other.", creation_time=timezone.now(), owner=self.user)
+        Answer.objects.create(text="Kept", creation_time=timezone.now(), owner=self.user, question=other)
+        deletion.soft_delete(self.question)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(deletion.purge_question(self.question.id, batch_size=2), 5)
+        answer_deletes = [q for q in queries.captured_queries
+                          if q['sql'].startswith('DELETE FROM "questions_answer" ')]
+        self.assertEqual(len(answer_deletes), 3)
+        self.assertFalse(Question.all_objects.filter(pk=self.question.id).exists())
+        self.assertFalse(AnswerVote.objects.exists())
+        self.assertEqual(Answer.objects.get().text, "Kept")
+
+    def test_purge_command_skips_live_questions(self):
+        call_command('purge_questions', stdout=StringIO())
+        self.assertTrue(Question.objects.filter(pk=self.question.id).exists())
+        deletion.soft_delete(self.question)
+        out = StringIO()
+        call_command('purge_questions', batch_size=3, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Purged 1 question.')
+        self.assertFalse(Answer.objects.exists())
+
+calls = []
+
+@tasks.task(max_attempts=2)
+def record_call(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise ValueError(value)
+
+def not_a_task():
+    pass
+
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        del calls[:]
+
+    def test_run_pending(self):
+        tasks.enqueue(record_call, 1)
+        tasks.enqueue(record_call, value=2)
+        self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(calls, [1, 2])
+        self.assertFalse(Task.objects.exists())
+
+    def test_claimed_tasks_are_leased(self):
+        task = tasks.enqueue(record_call, 1)
+        claimed = tasks.claim(10)
+        self.assertEqual(claimed, [(task.id, 'questions.tests.record_call', [1], {}, 1, 2)])
+        self.assertEqual(tasks.claim(10), [])
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(tasks.claim(10)[0][4], 2)
+
+    def test_lost_last_attempt_fails(self):
+        task = tasks.enqueue(record_call, 1)
+        for attempt in range(2):
+            self.assertEqual(len(tasks.claim(10)), 1)
+            # The worker dies, the lease runs out
+            Task.objects.update(run_at=timezone.now())
+        self.assertEqual(tasks.claim(10), [])
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+        self.assertIn('Lease expired', task.last_error)
+        self.assertEqual(calls, [])
+
+    def test_claimed_in_queue_order(self):
+        now = timezone.now()
+        first = tasks.enqueue(record_call, 1)
+        second = tasks.enqueue(record_call, 2)
+        Task.objects.filter(pk=first.id).update(run_at=now)
+        Task.objects.filter(pk=second.id).update(run_at=now - timedelta(minutes=1))
+        self.assertEqual([row[0] for row in tasks.claim(10)], [second.id, first.id])
+
+    def test_retry_with_backoff_then_fail(self):
+        task = tasks.enqueue(record_call, 1, fail=True)
+        before = timezone.now()
+        self.assertEqual(tasks.run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.QUEUED)
+        self.assertGreaterEqual(task.run_at, before + timedelta(seconds=tasks.retry_delay(1)))
+        self.assertIn('ValueError: 1', task.last_error)
+        self.assertEqual(tasks.run_pending(), 0)
+        Task.objects.update(run_at=timezone.now())
+        self.assertEqual(tasks.run_pending(), 1)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.FAILED)
+        self.assertEqual(calls, [1, 1])
+        self.assertEqual(tasks.run_pending(), 0)
+
+    @override_settings(TASK_RETRY_DELAY=10, TASK_RETRY_MAX_DELAY=60)
+    def test_retry_delay(self):
+        self.assertEqual([tasks.retry_delay(a) for a in range(1, 5)], [10, 20, 40, 60])
+
+    def test_only_tasks_run(self):
+        Task.objects.create(name='questions.tests.not_a_task', max_attempts=1)
+        tasks.run_pending()
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+
+    def test_worker_command(self):
+        out = StringIO()
+        call_command('run_worker', once=True, workers=2, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Ran 0 tasks.')
+
+    def test_question_delete_queues_purge(self):
+        user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=user)
+        Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=user, question=question)
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.client.post(reverse('questions:question_delete', args=(question.id,)))
+        self.assertEqual(Task.objects.get().name, 'questions.deletion.purge_question')
+        tasks.run_pending()
+        self.assertFalse(Question.all_objects.exists())
+        self.assertFalse(Answer.objects.exists())
+
+class CountingEmailBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super(CountingEmailBackend, self).open()
+
+    def send_messages(self, messages):
+        if any('@fail.example.com' in m.to[0] for m in messages):
+            raise smtplib.SMTPRecipientsRefused({})
+        return super(CountingEmailBackend, self).send_messages(messages)
+
+@override_settings(EMAIL_BACKEND='questions.tests.CountingEmailBackend', OUTBOX_MAX_ATTEMPTS=2)
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        CountingEmailBackend.opened = 0
+
+    def test_email_change_queues_email(self):
+        user = User.objects.create_user(username='test', password='T3Ss$tTx', email='old@example.com')
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.client.post(reverse('questions:user_settings', args=(user.id,)), {'action': 'change_email', 'email': 'new@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboxEmail.objects.get().to, 'new@example.com')
+        out = StringIO()
+        call_command('send_outbox', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Sent 1 email.')
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertFalse(OutboxEmail.objects.exists())
+
+    def test_one_connection_per_batch(self):
+        for i in range(5):
+            outbox.queue('user%i@example.com' % i, 'Subject', 'Body')
+        self.assertEqual(outbox.send_pending(batch_size=2), 5)
+        self.assertEqual(CountingEmailBackend.opened, 3)
+        self.assertEqual([m.to[0] for m in mail.outbox], ['user%i@example.com' % i for i in range(5)])
+
+    def test_retry_then_dead_letter(self):
+        outbox.queue('user@fail.example.com', 'Subject', 'Body')
+        outbox.queue('user@example.com', 'Subject', 'Body')
+        self.assertEqual(outbox.send_pending(), 1)
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertIn('SMTPRecipientsRefused', email.last_error)
+        self.assertEqual(outbox.send_pending(), 0)
+        OutboxEmail.objects.update(run_at=timezone.now())
+        outbox.send_pending()
+        self.assertEqual(OutboxEmail.objects.get().status, OutboxEmail.DEAD)
+        OutboxEmail.objects.update(run_at=timezone.now())
+        self.assertEqual(outbox.claim(10), [])
+
+    @skipUnless(importlib.util.find_spec('smtpd'), 'smtpd is not available')
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1')
+    def test_smtp_server(self):
+        import asyncore
+        import smtpd
+
+        received = []
+        connections = []
+
+        class Server(smtpd.SMTPServer):
+            def handle_accepted(self, conn, addr):
+                connections.append(addr)
+                super(Server, self).handle_accepted(conn, addr)
+
+            def process_message(self, peer, mailfrom, rcpttos, data, **kwargs):
+                received.append(rcpttos)
+
+        server = Server(('127.0.0.1', 0), None)
+        thread = threading.Thread(target=asyncore.loop, kwargs={'timeout': 0.1})
+        thread.start()
+        try:
+            with self.settings(EMAIL_PORT=server.socket.getsockname()[1]):
+                for i in range(3):
+                    outbox.queue('user%i@example.com' % i, 'Subject', 'Body')
+                self.assertEqual(outbox.send_pending(), 3)
+        finally:
+            server.close()
+            thread.join()
+        self.assertEqual(received, [['user%i@example.com' % i] for i in range(3)])
+        self.assertEqual(len(connections), 1)
+
+class NotificationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='T3Ss$tTx', email='owner@example.com')
+        self.users = [User.objects.create_user(username='user%i' % i, password='T3Ss$tTx') for i in range(3)]
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.owner)
+
+    def answer(self, user):
+        return Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=user, question=self.question)
+
+    def test_fan_out_to_owner_and_answerers(self):
+        self.answer(self.users[0])
+        self.answer(self.users[1])
+        with CaptureQueriesContext(connection) as queries:
+            self.answer(self.users[2])
+        inserts = [q for q in queries.captured_queries if q['sql'].startswith('INSERT INTO "questions_notification"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(sorted(Notification.objects.filter(answer__owner=self.users[2]).values_list('user__username', flat=True)),
+                         ['owner', 'user0', 'user1'])
+        self.answer(self.owner)
+        self.assertEqual(Notification.objects.filter(user=self.owner).count(), 3)
+
+    def test_unread_count_kept(self):
+        self.assertEqual(notifications.unread_count(self.owner.id), 0)
+        self.answer(self.users[0])
+        answer = self.answer(self.users[1])
+        with self.assertNumQueries(1):
+            self.assertEqual(notifications.unread_count(self.owner.id), 2)
+        self.assertEqual(notifications.unread_count(self.users[0].id), 1)
+        notifications.mark_read(self.owner.id, Notification.objects.filter(user=self.owner).values_list('id', flat=True)[:1])
+        self.assertEqual(notifications.unread_count(self.owner.id), 1)
+        answer.delete()
+        self.assertEqual(notifications.unread_count(self.owner.id), 0)
+        self.assertEqual(notifications.unread_count(self.users[0].id), 0)
+
+    def test_soft_delete_drops_unread(self):
+        self.answer(self.users[0])
+        self.answer(self.users[1])
+        other = Question.objects.create(title="Dolor sit?", text="Dolor sit.", creation_time=timezone.now(), owner=self.owner)
+        Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=self.users[0], question=other)
+        self.assertEqual(notifications.unread_count(self.owner.id), 3)
+        deletion.soft_delete(self.question)
+        self.assertEqual(notifications.unread_count(self.owner.id), 1)
+        self.assertEqual(notifications.unread_count(self.users[0].id), 0)
+        deletion.purge_question(self.question.id)
+        self.assertEqual(notifications.unread_count(self.owner.id), 1)
+
+    def test_inbox_marks_read(self):
+        self.answer(self.users[0])
+        self.client.login(username='owner', password='T3Ss$tTx')
+        response = self.client.get(reverse('questions:index'))
+        self.assertContains(response, '<span class="unread-count">1</span>')
+        response = self.client.get(reverse('questions:notifications'))
+        self.assertContains(response, 'notification unread')
+        self.assertNotContains(response, 'unread-count')
+        self.assertFalse(Notification.objects.filter(is_read=False).exists())
+        self.assertNotContains(self.client.get(reverse('questions:notifications')), 'notification unread')
+
+    def test_digest_groups_answers(self):
+        UserProfile.objects.filter(user=self.owner).update(email_digest=True)
+        for i in range(5):
+            self.answer(self.users[i % 3])
+        out = StringIO()
+        call_command('send_digests', batch_size=1, stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Queued 1 digest.')
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.to, 'owner@example.com')
+        self.assertIn('5 new answers to "Lorem ipsum?"', email.body)
+        self.assertEqual(notifications.send_digests(), 0)
+
+class ActivityFeedTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='test', password='T3Ss$tTx')
+        self.other = User.objects.create_user(username='other', password='T3Ss$tTx')
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.user)
+
+    def kinds(self, user):
+        return list(activity.feed(user.id).values_list('kind', flat=True))
+
+    def test_events_recorded(self):
+        answer = Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=self.other, question=self.question)
+        self.client.login(username='test', password='T3Ss$tTx')
+        self.client.get(reverse('questions:answer_accept', args=(self.question.id, answer.id)))
+        self.question.text = "Lorem ipsum dolor."
+        self.question.save()
+        self.question.save()
+        self.assertEqual(self.kinds(self.user), [Activity.EDITED, Activity.ACCEPTED, Activity.ASKED])
+        self.assertEqual(self.kinds(self.other), [Activity.ANSWERED])
+
+    def test_accept_recorded_once(self):
+        answer = Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=self.other, question=self.question)
+        question = Question.objects.create(title="Dolor sit?", text="Dolor sit.", creation_time=timezone.now(), owner=self.other)
+        elsewhere = Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=self.other, question=question)
+        self.client.login(username='test', password='T3Ss$tTx')
+        for pk in (answer.id, answer.id, elsewhere.id, answer.id + elsewhere.id):
+            response = self.client.get(reverse('questions:answer_accept', args=(self.question.id, pk)))
+            self.assertNotEqual(response.status_code, 500)
+        self.assertEqual(self.kinds(self.user), [Activity.ACCEPTED, Activity.ASKED])
+
+    @override_settings(ACTIVITY_FEED_SIZE=3)
+    def test_feed_capped(self):
+        for i in range(4):
+            Question.objects.create(title="Question %i" % i, text="Text.", creation_time=timezone.now(), owner=self.user)
+        self.assertEqual(list(activity.feed(self.user.id).values_list('question__title', flat=True)),
+                         ['Question 3', 'Question 2', 'Question 1'])
+        self.assertEqual(Activity.objects.filter(user=self.user).count(), 3)
+
+    def test_deleted_question_leaves_feed(self):
+        Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=self.other, question=self.question)
+        deletion.soft_delete(self.question)
+        self.assertEqual(self.kinds(self.user), [])
+        self.assertEqual(self.kinds(self.other), [])
+
+    def test_profile_pages_feed(self):
+        for i in range(24):
+            Question.objects.create(title="Question %i" % i, text="Text.", creation_time=timezone.now(), owner=self.user)
+        url = reverse('questions:user', args=(self.user.id,))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(len([q for q in queries.captured_queries if 'questions_activity' in q['sql']]), 2)
+        self.assertEqual([a.question.title for a in response.context['activities']][:2], ['Question 23', 'Question 22'])
+        self.assertEqual(response.context['profile'].stats.question_count, 25)
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual([a.question.title for a in response.context['activities']],
+                         ['Question 3', 'Question 2', 'Question 1', 'Question 0', 'Lorem ipsum?'])
+        self.assertEqual(self.client.get(url, {'page': 3}).status_code, 404)
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username='user%i' % i, password='T3Ss$tTx') for i in range(3)]
+        self.question = Question.objects.create(title="Lorem ipsum?", text="Lorem ipsum.", creation_time=timezone.now(), owner=self.users[0])
+        self.answers = [Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=user, question=self.question)
+                        for user in self.users[1:]]
+
+    def stats(self, user):
+        stats = UserStats.objects.get(user=user)
+        return stats.question_count, stats.answer_count, stats.accepted_count, stats.reputation
+
+    def accept(self, answer):
+        self.client.login(username='user0', password='T3Ss$tTx')
+        self.client.get(reverse('questions:answer_accept', args=(self.question.id, answer.id)))
+
+    def test_counters_follow_changes(self):
+        votes.vote_question(self.users[1], self.question, votes.UP)
+        votes.vote_answer(self.users[0], self.answers[0], votes.UP)
+        votes.vote_answer(self.users[2], self.answers[0], votes.DOWN)
+        self.accept(self.answers[0])
+        self.assertEqual(self.stats(self.users[0]), (1, 0, 0, userstats.QUESTION_VOTE))
+        self.assertEqual(self.stats(self.users[1]), (0, 1, 1, userstats.ACCEPTED))
+        self.accept(self.answers[1])
+        self.assertEqual(self.stats(self.users[1]), (0, 1, 0, 0))
+        self.assertEqual(self.stats(self.users[2]), (0, 1, 1, userstats.ACCEPTED))
+        self.assertEqual(userstats.reconcile(), 0)
+
+    def test_deletions(self):
+        votes.vote_question(self.users[1], self.question, votes.UP)
+        self.accept(self.answers[0])
+        self.answers[1].delete()
+        self.assertEqual(self.stats(self.users[2]), (0, 0, 0, 0))
+        other = Question.objects.create(title="Dolor sit?", text="Dolor sit.", creation_time=timezone.now(), owner=self.users[2])
+        Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=self.users[1], question=other)
+        deletion.soft_delete(Question.objects.get(pk=self.question.id))
+        self.assertEqual(self.stats(self.users[0]), (0, 0, 0, 0))
+        self.assertEqual(self.stats(self.users[1]), (0, 1, 0, 0))
+        self.assertEqual(userstats.reconcile(), 0)
+        deletion.purge()
+        self.assertEqual(self.stats(self.users[1]), (0, 1, 0, 0))
+        self.assertEqual(userstats.reconcile(), 0)
+
+    def test_accept_answer_of_other_question(self):
+        self.accept(self.answers[0])
+        other = Question.objects.create(title="Dolor sit?", text="Dolor sit.", creation_time=timezone.now(), owner=self.users[2])
+        elsewhere = Answer.objects.create(text="Answer", creation_time=timezone.now(), owner=self.users[2], question=other)
+        response = self.client.get(reverse('questions:answer_accept', args=(self.question.id, elsewhere.id)))
+        self.assertEqual(response.status_code, 404)
+        self.assertTrue(Answer.objects.get(pk=self.answers[0].id).is_accepted)
+        self.assertEqual(self.stats(self.users[1]), (0, 1, 1, userstats.ACCEPTED))
+        self.assertEqual(userstats.reconcile(), 0)
+
+    def test_reconcile_command(self):
+        Answer.objects.filter(pk=self.answers[0].id).update(score=2)
+        UserStats.objects.filter(user=self.users[2]).delete()
+        out = StringIO()
+        call_command('reconcile_user_stats', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Updated 2 user stats.')
+        self.assertEqual(self.stats(self.users[1]), (0, 1, 0, 2 * userstats.ANSWER_VOTE))
+        self.assertEqual(self.stats(self.users[2]), (0, 1, 0, 0))
+
+    def test_pages_read_stats(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('questions:user', args=(self.users[1].id,)))
+        self.assertContains(response, '<div class="stat-subtitle">answer</div>')
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT(' in q['sql'] and 'questions_activity' not in q['sql']])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('questions:question', args=(self.question.id,)))
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "questions_userstats"' in q['sql']])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('questions:index'))
+        self.assertFalse([q for q in queries.captured_queries if 'FROM "questions_userstats"' in q['sql']])
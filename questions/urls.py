@@ -6,16 +6,27 @@ from . import views
 app_name = 'questions'
 urlpatterns = [
     url(r'^$', views.IndexView.as_view(), name='index'),
+    url(r'^hot/$', views.HotView.as_view(), name='hot'),
     url(r'^search/$', views.SearchView.as_view(), name='search'),
     url(r'^questions/(?P<pk>[0-9]+)/$', views.QuestionView.as_view(), name='question'),
     url(r'^questions/ask/$', views.AskView.as_view(), name='ask'),
+    url(r'^questions/similar/$', views.similar_questions, name='similar_questions'),
     url(r'^questions/(?P<pk>[0-9]+)/answer/$', views.AddAnswer.as_view(), name='answer'),
+    url(r'^questions/(?P<pk>[0-9]+)/events/$', views.answer_events, name='answer_events'),
+    url(r'^questions/(?P<pk>[0-9]+)/events/poll/$', views.answer_events_poll, name='answer_events_poll'),
     url(r'^questions/(?P<q_pk>[0-9]+)/(?P<pk>[0-9]+)/delete/$', views.AnswerDeleteView.as_view(), name='answer_delete'),
     url(r'^questions/(?P<q_pk>[0-9]+)/(?P<pk>[0-9]+)/edit/$', views.AnswerEditView.as_view(), name='answer_edit'),
+    url(r'^questions/(?P<q_pk>[0-9]+)/(?P<pk>[0-9]+)/revisions/$', views.AnswerRevisionsView.as_view(), name='answer_revisions'),
     url(r'^questions/(?P<q_pk>[0-9]+)/(?P<pk>[0-9]+)/accept/$', views.accept_answer, name='answer_accept'),
+    url(r'^questions/(?P<q_pk>[0-9]+)/(?P<pk>[0-9]+)/vote/$', views.vote_answer, name='answer_vote'),
+    url(r'^questions/(?P<pk>[0-9]+)/vote/$', views.vote_question, name='question_vote'),
     url(r'^questions/(?P<pk>[0-9]+)/delete/$', views.QuestionDeleteView.as_view(), name='question_delete'),
     url(r'^questions/(?P<pk>[0-9]+)/edit/$', views.QuestionEditView.as_view(), name='question_edit'),
-    url(r'^questions/tagged/(?P<tag>[\w\s\(\)]+)/$', views.TaggedView.as_view(), name='tagged'),
+    url(r'^questions/(?P<pk>[0-9]+)/revisions/$', views.QuestionRevisionsView.as_view(), name='question_revisions'),
+    url(r'^questions/tagged/(?P<tag>[\w\s\(\)\+\-]+)/$', views.TaggedView.as_view(), name='tagged'),
+    url(r'^notifications/$', views.NotificationsView.as_view(), name='notifications'),
+    url(r'^tags/$', views.TagsView.as_view(), name='tags'),
+    url(r'^tags/autocomplete/$', views.tag_autocomplete, name='tag_autocomplete'),
     url(r'^users/(?P<pk>[0-9]+)/$', views.UserView.as_view(), name='user'),
     url(r'^users/(?P<pk>[0-9]+)/edit/$', views.UserEditView.as_view(), name='user_edit'),
     url(r'^users/(?P<pk>[0-9]+)/settings/$', views.AccountSettings.as_view(), name='user_settings'),
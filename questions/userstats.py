@@ -0,0 +1,181 @@
+"""
+Per user totals: questions asked, answers posted and accepted, reputation.
+
+Counters are changed where the underlying change happens, with one UPDATE
+adding the deltas of every affected user, so concurrent changes never
+read-modify-write a row. Only live questions and their answers count:
+soft deleting a question takes it off its owner and its answers off theirs,
+purging it later changes nothing. Reputation adds up QUESTION_VOTE per vote
+on those questions, ANSWER_VOTE per vote on those answers and ACCEPTED per
+accepted answer among them.
+
+Updates that bypass the signals, like bulk updates, can make the counters
+drift. The reconcile_user_stats command recomputes every user from the
+questions and answers tables in one statement and is meant to run nightly.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Case, Count, IntegerField, Sum, Value, When
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Question, Answer, UserStats
+from .sql import update_from_values
+
+QUESTION_VOTE = 5
+ANSWER_VOTE = 10
+ACCEPTED = 15
+
+FIELDS = ('question_count', 'answer_count', 'accepted_count', 'reputation')
+
+_local = threading.local()
+
+
+def apply_changes(changes):
+    """
+        Adds deltas to the counters, changes maps user ids to dicts of field
+        -> delta.
+    """
+    rows = sorted((user_id,) + tuple(deltas.get(f, 0) for f in FIELDS)
+                  for user_id, deltas in changes.items() if any(deltas.values()))
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        # Users normally have their row from the start
+        cursor.execute('INSERT INTO {table} (user_id, {columns}) SELECT unnest(%s), {zeros} ON CONFLICT DO NOTHING'.format(
+            table=connection.ops.quote_name(UserStats._meta.db_table), columns=', '.join(FIELDS),
+            zeros=', '.join(['0'] * len(FIELDS))), [[row[0] for row in rows]])
+    update_from_values(UserStats, ('user_id',) + FIELDS, rows, dict(
+        (f, 'GREATEST(t.{0} + v.{0}, 0)'.format(f) if f.endswith('_count') else 't.{0} + v.{0}'.format(f)) for f in FIELDS))
+
+
+def change(user_id, **deltas):
+    apply_changes({user_id: deltas})
+
+
+def accepted_changed(unaccepted_owner_ids, accepted_owner_id):
+    """
+        Moves accepted answer counts and reputation from the owners of the
+        answers that lost acceptance to the owner of the accepted one.
+    """
+    changes = {}
+    for user_id in unaccepted_owner_ids:
+        deltas = changes.setdefault(user_id, {'accepted_count': 0, 'reputation': 0})
+        deltas['accepted_count'] -= 1
+        deltas['reputation'] -= ACCEPTED
+    deltas = changes.setdefault(accepted_owner_id, {'accepted_count': 0, 'reputation': 0})
+    deltas['accepted_count'] += 1
+    deltas['reputation'] += ACCEPTED
+    apply_changes(changes)
+
+
+def _add(changes, user_id, **deltas):
+    user_changes = changes.setdefault(user_id, {})
+    for field, delta in deltas.items():
+        user_changes[field] = user_changes.get(field, 0) + delta
+
+
+def question_removed(question):
+    """
+        Takes a question off its owner and its answers off theirs.
+    """
+    changes = {}
+    _add(changes, question.owner_id, question_count=-1, reputation=-question.score * QUESTION_VOTE)
+    totals = Answer.objects.filter(question=question).order_by().values('owner_id').annotate(
+        count=Count('id'),
+        accepted=Sum(Case(When(is_accepted=True, then=Value(1)), default=Value(0), output_field=IntegerField())),
+        score=Sum('score')
+    )
+    for row in totals:
+        _add(changes, row['owner_id'], answer_count=-row['count'], accepted_count=-row['accepted'],
+             reputation=-row['score'] * ANSWER_VOTE - row['accepted'] * ACCEPTED)
+    apply_changes(changes)
+
+
+@contextmanager
+def removed_already():
+    """
+        Answers deleted inside aren't taken off their owners, for purges of
+        soft deleted questions.
+    """
+    _local.removed_already = True
+    try:
+        yield
+    finally:
+        _local.removed_already = False
+
+
+def reconcile():
+    """
+        Recomputes every user's counters, only writing those that drifted.
+        Returns the number of rows written.
+    """
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO {table} AS s (user_id, question_count, answer_count, accepted_count, reputation)
+            SELECT u.id, COALESCE(q.count, 0), COALESCE(a.count, 0), COALESCE(a.accepted, 0),
+                   COALESCE(q.score, 0) * %(question_vote)s + COALESCE(a.score, 0) * %(answer_vote)s
+                   + COALESCE(a.accepted, 0) * %(accepted)s
+            FROM {user} u
+            LEFT JOIN (
+                SELECT owner_id, COUNT(*) AS count, SUM(score) AS score
+                FROM {question} WHERE NOT is_deleted GROUP BY owner_id
+            ) q ON q.owner_id = u.id
+            LEFT JOIN (
+                SELECT a.owner_id, COUNT(*) AS count, COUNT(*) FILTER (WHERE a.is_accepted) AS accepted, SUM(a.score) AS score
+                FROM {answer} a JOIN {question} q ON q.id = a.question_id
+                WHERE NOT q.is_deleted GROUP BY a.owner_id
+            ) a ON a.owner_id = u.id
+            ON CONFLICT (user_id) DO UPDATE SET
+                question_count = EXCLUDED.question_count,
+                answer_count = EXCLUDED.answer_count,
+                accepted_count = EXCLUDED.accepted_count,
+                reputation = EXCLUDED.reputation
+            WHERE (s.question_count, s.answer_count, s.accepted_count, s.reputation) IS DISTINCT FROM
+                  (EXCLUDED.question_count, EXCLUDED.answer_count, EXCLUDED.accepted_count, EXCLUDED.reputation)
+        """.format(
+            table=qn(UserStats._meta.db_table),
+            user=qn(User._meta.db_table),
+            question=qn(Question._meta.db_table),
+            answer=qn(Answer._meta.db_table)
+        ), {'question_vote': QUESTION_VOTE, 'answer_vote': ANSWER_VOTE, 'accepted': ACCEPTED})
+        return cursor.rowcount
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Question)
+def question_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        change(instance.owner_id, question_count=1)
+    elif instance.is_deleted and update_fields is not None and 'is_deleted' in update_fields:
+        question_removed(instance)
+
+
+@receiver(post_delete, sender=Question)
+def question_deleted(sender, instance, **kwargs):
+    # Soft deleted questions were taken off already, answers are deleted first
+    if not instance.is_deleted:
+        change(instance.owner_id, question_count=-1, reputation=-instance.score * QUESTION_VOTE)
+
+
+@receiver(post_save, sender=Answer)
+def answer_saved(sender, instance, created, **kwargs):
+    if created:
+        change(instance.owner_id, answer_count=1)
+
+
+@receiver(post_delete, sender=Answer)
+def answer_deleted(sender, instance, **kwargs):
+    if getattr(_local, 'removed_already', False):
+        return
+    change(instance.owner_id, answer_count=-1, accepted_count=-int(instance.is_accepted),
+           reputation=-instance.score * ANSWER_VOTE - (ACCEPTED if instance.is_accepted else 0))
@@ -1,58 +1,122 @@
 from django.shortcuts import render, redirect, reverse, Http404, get_object_or_404
 from django.conf import settings
+from django.utils.http import urlencode
+from django.utils.functional import cached_property
 from django.utils import timezone
 from django.views import generic
-from django.core.mail import send_mail
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, update_session_auth_hash
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Q, Case, When, Value, BooleanField
+from django.http import JsonResponse, StreamingHttpResponse
 from django.contrib.auth.forms import UserCreationForm, PasswordChangeForm
 from django.contrib.auth.models import User, AnonymousUser
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.contrib.postgres.search import SearchVector, SearchQuery
+from django.core.paginator import Paginator, InvalidPage
 
+from . import activity, deletion, duplicates, emails, events, fuzzy, hot, notifications, postings, related, revisions, search, tasks, userstats, votes
+from .counters import view_counter, visitor_id
+from .postings import QuestionIdList
+from .tagindex import tag_index
 from .multiform import MultiFormsView
-from .models import Question, UserProfile, Answer
+from .models import Question, UserProfile, Answer, Tag, TagStats, Activity
 from .forms import AnswerForm, RegisterForm, ProfileUpdateForm, UserUpdateForm, EmailChangeForm, QuestionEditForm, QuestionAskForm
 
+# Columns shown by questions/question_summary.html, lists don't load bodies
+SUMMARY_FIELDS = ('id', 'title', 'excerpt', 'creation_time', 'views', 'score', 'version',
+                  'owner', 'owner__username', 'owner__userprofile__avatar', 'owner__stats__reputation')
+
+def question_summaries(queryset=None):
+    queryset = queryset if queryset is not None else Question.objects.all()
+    return queryset.select_related('owner__userprofile', 'owner__stats').only(*SUMMARY_FIELDS)
+
 # Create your views here.
 class IndexView(generic.ListView):
     template_name = 'questions/index.html'
     context_object_name = 'questions'
 
     def get_queryset(self):
-        return Question.objects.order_by('-creation_time')
+        return question_summaries().order_by('-creation_time')
+
+class HotView(generic.ListView):
+    template_name = 'questions/index.html'
+    context_object_name = 'questions'
+    paginate_by = 15
+
+    def get_queryset(self):
+        return QuestionIdList(hot.ranked_ids(), question_summaries())
+
+    def get_context_data(self, **kwargs):
+        context = super(HotView, self).get_context_data(**kwargs)
+        context['tab'] = 'hot'
+        return context
 
 class QuestionView(generic.DetailView):
     template_name = 'questions/question.html'
     model = Question
+    answer_orderings = {
+        'votes': ('-score', '-creation_time'),
+        'newest': ('-creation_time',),
+        'oldest': ('creation_time',)
+    }
+
+    def answer_ordering(self, sort):
+        return self.answer_orderings.get(sort, self.answer_orderings['votes'])
 
     def get_queryset(self):
         return Question.objects.filter(pk=self.kwargs['pk'])
 
     def get_context_data(self, **kwargs):
         context = super(QuestionView, self).get_context_data(**kwargs)
-        context['question'] = Question.objects.get(pk=self.kwargs['pk'])
-        context['answers'] = list(Answer.objects.filter(question=self.kwargs['pk'], is_accepted=True)) + \
-                            list(Answer.objects.filter(question=self.kwargs['pk'], is_accepted=False).order_by('-creation_time'))
+        # Recorded first, a flush it triggers is then visible below
+        view_counter.record(self.object.id, visitor_id(self.request))
+        context['question'] = Question.objects.select_related('owner__userprofile', 'owner__stats').get(pk=self.kwargs['pk'])
+        context['views'] = context['question'].views + view_counter.pending(self.object.id)
+        context['related'] = related.related_questions(self.object.id)
+        context['sort'] = self.request.GET.get('sort', 'votes')
+        context['sort_options'] = [('votes', 'Votes'), ('newest', 'Newest'), ('oldest', 'Oldest')]
+        answers = Answer.objects.filter(question=self.kwargs['pk']).select_related('owner__userprofile', 'owner__stats')
+        context['answers'] = list(answers.filter(is_accepted=True)) + \
+                            list(answers.filter(is_accepted=False).order_by(*self.answer_ordering(context['sort'])))
         context['form'] = AnswerForm
+        # Open streams would hold WSGI worker threads
+        context['live_answers'] = self.request.META.get('stackoverflow.asgi', False)
+        context['last_event'] = events.current_id()
         return context
 
+def _last_event_id(request):
+    return request.META.get('HTTP_LAST_EVENT_ID') or request.GET.get('after', '')
+
+def answer_events(request, pk):
+    response = StreamingHttpResponse(events.stream(int(pk), _last_event_id(request)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def answer_events_poll(request, pk):
+    events.ensure_listener()
+    return JsonResponse({'events': events.broker.events_after(int(pk), _last_event_id(request))})
+
 class UserView(generic.DetailView):
     template_name = 'questions/user.html'
     context_object_name = 'profile'
     model = User
+    feed_paginate_by = 20
 
     def get_queryset(self):
-        return User.objects.filter(pk=self.kwargs['pk'])
+        return User.objects.filter(pk=self.kwargs['pk']).select_related('userprofile', 'stats')
 
     def get_context_data(self, **kwargs):
         context = super(UserView, self).get_context_data(**kwargs)
         context['form'] = ProfileUpdateForm
-        user = User.objects.get(pk=self.kwargs['pk'])
-        context['created_questions'] = Question.objects.filter(owner=user).order_by('-creation_time')[:5]
-        context['posted_answers'] = Answer.objects.filter(owner=user).order_by('-creation_time')[:5]
+        user = context['profile']
+        try:
+            page = Paginator(activity.feed(user.id), self.feed_paginate_by).page(self.request.GET.get('page') or 1)
+        except InvalidPage:
+            raise Http404
+        context['activities'] = page.object_list
+        context['page_obj'] = page
+        context['is_paginated'] = page.has_other_pages()
         return context
 
 class UserEditView(LoginRequiredMixin, UserPassesTestMixin, generic.UpdateView):
@@ -155,17 +219,15 @@ class AccountSettings(LoginRequiredMixin, UserPassesTestMixin, MultiFormsView):
         return context
 
     def change_email_form_valid(self, form):
-        print(form.__dict__)
         messages.success(self.request, "Email changed")
-        user = form.save()
-        print(user.email)
-        print(settings.EMAIL_HOST_USER)
-        ''' 
+        '''
         To enable sending emails, uncoment email settings in settings.py and fill in credentials in email_credentials.py.
         Using smtp.gmail.com requires turning on less secure apps: https://www.google.com/settings/security/lesssecureapps
-
-        send_mail('Subject', 'Message', settings.EMAIL_HOST_USER, [user.email])
         '''
+        with transaction.atomic():
+            user = form.save()
+            # Sent by the send_outbox command
+            emails.email_changed(user)
         return redirect('questions:user_settings', self.request.user.id)
 
     def change_password_form_valid(self, form):
@@ -209,6 +271,13 @@ class AskView(LoginRequiredMixin, generic.CreateView):
     form_class = QuestionAskForm
 
     def form_valid(self, form):
+        if not self.request.POST.get('not_duplicate'):
+            threshold = getattr(settings, 'DUPLICATE_THRESHOLD', 0.5)
+            found = [q for q, similarity in duplicates.find_similar(form.cleaned_data['title'], form.cleaned_data['text'])
+                     if similarity >= threshold]
+            if found:
+                # Asked to confirm it's not one of them first
+                return self.render_to_response(self.get_context_data(form=form, duplicates=found))
         form.instance.owner = self.request.user
         form.instance.creation_time = timezone.now()
         return super(AskView, self).form_valid(form)
@@ -222,6 +291,14 @@ class QuestionDeleteView(LoginRequiredMixin, UserPassesTestMixin, generic.Delete
     def test_func(self):
         return self.request.user == Question.objects.get(pk=self.kwargs['pk']).owner
 
+    def delete(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        with transaction.atomic():
+            deletion.soft_delete(self.object)
+            # Answers are removed by a worker, or else the purge_questions command
+            tasks.enqueue(deletion.purge_question, self.object.id)
+        return redirect(self.get_success_url())
+
 class QuestionEditView(LoginRequiredMixin, UserPassesTestMixin, generic.UpdateView):
     # model = Question
     # fields = ['title', 'text', 'tags']
@@ -258,6 +335,69 @@ class AnswerEditView(LoginRequiredMixin, UserPassesTestMixin, generic.UpdateView
     def test_func(self):
         return self.request.user == Answer.objects.get(pk=self.kwargs['pk']).owner
 
+class RevisionsView(generic.ListView):
+    template_name = 'questions/revisions.html'
+    context_object_name = 'revisions'
+    paginate_by = 10
+
+    def get_target(self):
+        raise NotImplementedError
+
+    def get_queryset(self):
+        self.target = self.get_target()
+        return self.target.revisions.select_related('author').defer('data').order_by('-number')
+
+    def get_context_data(self, **kwargs):
+        context = super(RevisionsView, self).get_context_data(**kwargs)
+        page = context['revisions'] = list(context['revisions'])
+        if page:
+            numbers = [r.number for r in page]
+            # Every revision shown is compared with the one before it
+            contents = revisions.contents(self.target.revisions.all(), max(min(numbers) - 1, 1), max(numbers))
+            for revision in page:
+                revision.is_current = context['page_obj'].number == 1 and revision.number == numbers[0]
+                revision.content = contents[revision.number]
+                previous = contents.get(revision.number - 1, dict.fromkeys(revision.content, ''))
+                revision.changes = [(field, revisions.diff(previous[field], revision.content[field]))
+                                    for field in revisions.FIELDS[type(self.target)]
+                                    if previous[field] != revision.content[field]]
+        context['target'] = self.target
+        context['can_restore'] = self.request.user.id == self.target.owner_id
+        return context
+
+    def post(self, request, *args, **kwargs):
+        target = self.get_target()
+        if request.user.id != target.owner_id:
+            raise Http404
+        content = revisions.content_at(target.revisions.all(), int(request.POST.get('number') or 0))
+        if content is None:
+            raise Http404
+        for field, value in content.items():
+            setattr(target, field, value)
+        # Restoring adds a new revision with the old content
+        target.save()
+        return redirect(request.path)
+
+class QuestionRevisionsView(RevisionsView):
+
+    def get_target(self):
+        return get_object_or_404(Question, pk=self.kwargs['pk'])
+
+    def get_context_data(self, **kwargs):
+        context = super(QuestionRevisionsView, self).get_context_data(**kwargs)
+        context['question'] = self.target
+        return context
+
+class AnswerRevisionsView(RevisionsView):
+
+    def get_target(self):
+        return get_object_or_404(Answer.objects.select_related('question'), pk=self.kwargs['pk'], question=self.kwargs['q_pk'])
+
+    def get_context_data(self, **kwargs):
+        context = super(AnswerRevisionsView, self).get_context_data(**kwargs)
+        context['question'] = self.target.question
+        return context
+
 @login_required
 def accept_answer(request, *args, **kwargs):
     # Requires fetch/ajax in template
@@ -265,36 +405,200 @@ def accept_answer(request, *args, **kwargs):
     #     raise Http404
     question = Question.objects.get(pk=kwargs['q_pk'])
     if request.user == question.owner:
+        pk = int(kwargs['pk'])
         answers = Answer.objects.filter(question=question)
-        for answer in answers:
-            answer.is_accepted = answer.id == int(kwargs['pk'])
-            answer.save()
+        owner_id = answers.filter(pk=pk).values_list('owner_id', flat=True).first()
+        if owner_id is None:
+            raise Http404
+        with transaction.atomic():
+            accepted = dict(answers.filter(is_accepted=True).values_list('id', 'owner_id'))
+            if pk not in accepted:
+                # Single UPDATE instead of saving every answer
+                answers.update(is_accepted=Case(
+                    When(pk=pk, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField()
+                ))
+                userstats.accepted_changed(list(accepted.values()), owner_id)
+        # Accepting the accepted answer again changes nothing
+        if pk not in accepted:
+            events.publish(question.id, 'accept', pk)
+            hot.bump(question.id, hot.ACCEPTED)
+            activity.record(question.owner_id, Activity.ACCEPTED, question.id, pk)
     return redirect(reverse('questions:question', args=(kwargs['q_pk'],)))
 
+def _vote_value(request):
+    if request.method != 'POST':
+        raise Http404
+    try:
+        return {'up': votes.UP, 'down': votes.DOWN}[request.POST.get('value')]
+    except KeyError:
+        raise Http404
+
+@login_required
+def vote_question(request, *args, **kwargs):
+    value = _vote_value(request)
+    question = get_object_or_404(Question, pk=kwargs['pk'])
+    votes.vote_question(request.user, question, value)
+    return redirect(reverse('questions:question', args=(question.id,)))
+
+@login_required
+def vote_answer(request, *args, **kwargs):
+    value = _vote_value(request)
+    answer = get_object_or_404(Answer, pk=kwargs['pk'], question=kwargs['q_pk'])
+    votes.vote_answer(request.user, answer, value)
+    return redirect(reverse('questions:question', args=(kwargs['q_pk'],)) + '#%i' % answer.id)
+
 class SearchView(generic.ListView):
     model = Question
     template_name = 'questions/search.html'
     context_object_name = 'questions'
+    paginate_by = 15
 
     def get_context_data(self, **kwargs):
         context = super(SearchView, self).get_context_data(**kwargs)
-        context['query'] = self.request.GET['q']
+        query = self.request.GET['q']
+        selected = self.request.GET.getlist('tag')
+        context['query'] = query
+        context['fuzzy'] = self.fuzzy
+        context['users'] = fuzzy.search_users(query)
+        context['page_query'] = urlencode([('q', query)] + [('tag', t) for t in selected]) + '&'
+        context['selected_tags'] = [
+            {'name': name, 'query': urlencode([('q', query)] + [('tag', t) for t in selected if t != name])}
+            for name in selected
+        ]
+        context['facets'] = [
+            {'name': name, 'count': count, 'query': urlencode([('q', query)] + [('tag', t) for t in selected + [name]])}
+            for name, count in search.tag_facets(self.object_list.ids) if name not in selected
+        ]
+        # Only the shown page is highlighted
+        questions = list(context['questions'])
+        highlighted = search.snippets(questions, query)
+        for q in questions:
+            q.title_html, q.snippet = highlighted.get(q.id, (None, None))
+        context['questions'] = context['object_list'] = questions
         return context
 
     def get_queryset(self):
-        return Question.objects.annotate(
-            search=SearchVector('title', 'text')
-        ).filter(search=SearchQuery(self.request.GET['q']))
+        ids = search.get_backend().search(self.request.GET['q'])
+        # Nothing matched exactly, likely a typo
+        self.fuzzy = not ids and fuzzy.available()
+        if self.fuzzy:
+            ids = list(fuzzy.search_questions(self.request.GET['q']).values_list('id', flat=True))
+        selected = self.request.GET.getlist('tag')
+        if selected and ids:
+            ids_by_name = {}
+            for tag_id, name in Tag.objects.filter(name__in=selected).values_list('id', 'name'):
+                ids_by_name.setdefault(name, []).append(tag_id)
+            if any(name not in ids_by_name for name in selected):
+                ids = []
+            else:
+                # Cached posting lists, no query per selected tag
+                tagged = set(postings.match([ids_by_name[name] for name in selected]))
+                ids = [i for i in ids if i in tagged]
+        return QuestionIdList(ids, question_summaries())
+
+def tag_autocomplete(request):
+    tags = tag_index.complete(request.GET.get('q', ''), settings.TAG_AUTOCOMPLETE_LIMIT)
+    return JsonResponse({'tags': [{'name': name, 'count': count} for name, count in tags]})
+
+def similar_questions(request):
+    found = duplicates.find_similar(request.GET.get('title', ''), request.GET.get('text', ''))
+    return JsonResponse({'questions': [
+        {'id': q.id, 'title': q.title, 'url': q.get_absolute_url(), 'similarity': round(similarity, 2)}
+        for q, similarity in found
+    ]})
+
+def parse_tag_expression(expression):
+    """
+        Splits 'python+django+-flask' into included and excluded tag names.
+        Runs of parts forming an existing tag name are kept whole, so
+        'c+++-java' stands for c++ but not java.
+    """
+    def name(term):
+        term = term.strip()
+        return term[1:].strip() if term.startswith('-') else term
+
+    parts = expression.split('+')
+    joined = set(name('+'.join(parts[i:j])) for i in range(len(parts)) for j in range(i + 2, len(parts) + 1))
+    known = set(Tag.objects.filter(name__in=joined).values_list('name', flat=True)) if joined else set()
+    include, exclude = [], []
+    i = 0
+    while i < len(parts):
+        j = next((j for j in range(len(parts), i + 1, -1) if name('+'.join(parts[i:j])) in known), i + 1)
+        term = '+'.join(parts[i:j]).strip()
+        i = j
+        if term.startswith('-') and term[1:].strip():
+            exclude.append(term[1:].strip())
+        elif term:
+            include.append(term)
+    return include, exclude
+
+class NotificationsView(LoginRequiredMixin, generic.ListView):
+    template_name = 'questions/notifications.html'
+    context_object_name = 'notifications'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return self.request.user.notifications.filter(answer__question__is_deleted=False) \
+            .select_related('answer__owner', 'answer__question') \
+            .only('id', 'created', 'is_read', 'answer__id', 'answer__owner__username',
+                  'answer__question__id', 'answer__question__title').order_by('-created', '-id')
+
+    def get_context_data(self, **kwargs):
+        context = super(NotificationsView, self).get_context_data(**kwargs)
+        context['notifications'] = list(context['notifications'])
+        # Shown ones count as read, they're still highlighted on this page
+        notifications.mark_read(self.request.user.id, [n.id for n in context['notifications'] if not n.is_read])
+        return context
+
+class TagsView(generic.ListView):
+    template_name = 'questions/tags.html'
+    context_object_name = 'tags'
+    paginate_by = 36
+    orderings = {
+        'popular': ('-question_count', 'tag__name'),
+        'name': ('tag__name',)
+    }
+
+    def get_sort(self):
+        sort = self.request.GET.get('sort')
+        return sort if sort in self.orderings else 'popular'
+
+    def get_queryset(self):
+        return TagStats.objects.select_related('tag').order_by(*self.orderings[self.get_sort()])
+
+    def get_context_data(self, **kwargs):
+        context = super(TagsView, self).get_context_data(**kwargs)
+        context['sort'] = self.get_sort()
+        context['sort_options'] = [('popular', 'Popular'), ('name', 'Name')]
+        context['page_query'] = 'sort=%s&' % context['sort']
+        return context
 
 class TaggedView(generic.ListView):
     model = Question
     template_name = 'questions/tagged.html'
     context_object_name = 'questions'
+    paginate_by = 15
 
     def get_context_data(self, **kwargs):
         context = super(TaggedView, self).get_context_data(**kwargs)
         context['tag'] = self.kwargs['tag']
+        context['included'], context['excluded'] = self.tag_expression
         return context
 
+    @cached_property
+    def tag_expression(self):
+        return parse_tag_expression(self.kwargs['tag'])
+
     def get_queryset(self):
-        return Question.objects.filter(tags__name=self.kwargs['tag'])
+        include, exclude = self.tag_expression
+        ids_by_name = {}
+        for tag_id, name in Tag.objects.filter(name__in=include + exclude).values_list('id', 'name'):
+            ids_by_name.setdefault(name, []).append(tag_id)
+        excluded = [t for name in exclude for t in ids_by_name.get(name, [])]
+        if not include:
+            return question_summaries(Question.objects.exclude(tags__in=excluded)).order_by('-creation_time')
+        if any(name not in ids_by_name for name in include):
+            return QuestionIdList([])
+        return QuestionIdList(postings.match([ids_by_name[name] for name in include], excluded), question_summaries())
@@ -0,0 +1,53 @@
+"""
+Voting on questions and answers.
+
+Scores are denormalized on the voted object and changed with a single
+UPDATE ... SET score = score + delta, so concurrent votes on a popular post
+never read-modify-write the row. The owner's reputation changes along, see
+questions.userstats.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from . import userstats
+from .models import Question, Answer, QuestionVote, AnswerVote
+
+UP = 1
+DOWN = -1
+
+
+def _vote(vote_model, target_model, target_field, user, target, value, reputation):
+    """
+        Casting the same vote twice takes it back. Returns the score change.
+    """
+    if user == target.owner:
+        return 0
+    lookup = {'user': user, target_field: target}
+    try:
+        with transaction.atomic():
+            vote = vote_model.objects.select_for_update().filter(**lookup).first()
+            if vote is None:
+                vote_model.objects.create(value=value, **lookup)
+                delta = value
+            elif vote.value == value:
+                vote.delete()
+                delta = -value
+            else:
+                # Switching sides undoes the old vote too
+                vote.value = value
+                vote.save(update_fields=['value'])
+                delta = 2 * value
+            target_model.objects.filter(pk=target.pk).update(score=F('score') + delta)
+            userstats.change(target.owner_id, reputation=reputation * delta)
+    except IntegrityError:
+        # Concurrent first vote of the same user, the other request won
+        return 0
+    return delta
+
+
+def vote_question(user, question, value):
+    return _vote(QuestionVote, Question, 'question', user, question, value, userstats.QUESTION_VOTE)
+
+
+def vote_answer(user, answer, value):
+    return _vote(AnswerVote, Answer, 'answer', user, answer, value, userstats.ANSWER_VOTE)
@@ -0,0 +1,29 @@
+"""
+ASGI config for stackoverflow project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with any ASGI server, for example::
+
+    uvicorn stackoverflow.asgi:application
+
+WSGI (stackoverflow/wsgi.py) stays supported, both entry points run the same
+Django application.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+from stackoverflow.handlers import ASGIHandler
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "stackoverflow.settings")
+
+wsgi_application = get_wsgi_application()
+
+# Needs the app registry, imported after get_wsgi_application() sets Django up
+from questions import events
+
+application = ASGIHandler(wsgi_application, max_workers=settings.ASGI_THREADS, routes=[
+    (r'^/questions/(?P<pk>[0-9]+)/events/$', events.asgi_stream),
+])
@@ -0,0 +1,125 @@
+"""
+ASGI to WSGI bridge.
+
+Django 1.11 can't run views as coroutines, so the handler does the parts of a
+request that depend on the client on the event loop (receiving the body,
+sending the response) and runs the Django view in a bounded thread pool. A slow
+client or a keep-alive connection only costs a coroutine, the thread (and its
+database connection) is released as soon as the view returns.
+"""
+import asyncio
+import io
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ASGIHandler(object):
+    """
+    Serves a WSGI application as an ASGI 3 application. Paths matching one of
+    routes, a list of (regex, coroutine function) pairs, are handled natively
+    on the event loop instead.
+    """
+    def __init__(self, wsgi_application, max_workers=8, routes=()):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.routes = [(re.compile(pattern), handler) for pattern, handler in routes]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            raise ValueError('Unsupported ASGI scope type: %s' % scope['type'])
+
+        for pattern, handler in self.routes:
+            match = pattern.match(scope['path'])
+            if match:
+                return await handler(scope, receive, send, **match.groupdict())
+
+        body = await self.read_body(receive)
+        if body is None:
+            # Client went away before sending the whole request
+            return
+        environ = self.get_environ(scope, body)
+        loop = asyncio.get_event_loop()
+        status, headers, content = await loop.run_in_executor(self.executor, self.run_wsgi, environ)
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': content})
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body', False):
+                return b''.join(chunks)
+
+    def get_environ(self, scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+            'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]),
+            'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            # Views can tell the request came through here
+            'stackoverflow.asgi': True,
+        }
+        if scope.get('client'):
+            environ['REMOTE_ADDR'] = scope['client'][0]
+            environ['REMOTE_PORT'] = str(scope['client'][1])
+
+        for name, value in scope.get('headers', []):
+            name = name.decode('latin1')
+            if name == 'content-length':
+                key = 'CONTENT_LENGTH'
+            elif name == 'content-type':
+                key = 'CONTENT_TYPE'
+            else:
+                key = 'HTTP_' + name.upper().replace('-', '_')
+            value = value.decode('latin1')
+            if key in environ:
+                value = environ[key] + ',' + value
+            environ[key] = value
+        return environ
+
+    def run_wsgi(self, environ):
+        """
+            Runs in the pool, the response is fully rendered here so the
+            thread never waits on the client.
+        """
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin1'), v.encode('latin1')) for k, v in headers]
+
+        result = self.wsgi_application(environ, start_response)
+        try:
+            content = b''.join(result)
+        finally:
+            # Sends request_finished, which closes the thread's db connection
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], content
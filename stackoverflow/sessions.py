@@ -0,0 +1,156 @@
+"""
+Write-through session store.
+
+Sessions are looked up in a small in-process LRU first, then in the cache and
+only then in the database. Every write goes to the database and both cache
+layers. Expiry is extended lazily: an unmodified session is written back only
+when its expiry date would move by more than SESSION_EXPIRY_WRITE_THRESHOLD
+seconds, so SESSION_SAVE_EVERY_REQUEST doesn't cost an UPDATE per page view.
+"""
+import copy
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.core.exceptions import SuspiciousOperation
+from django.utils import timezone
+from django.utils.encoding import force_text
+
+KEY_PREFIX = 'stackoverflow.sessions'
+
+
+class LRUCache(object):
+    """
+    Thread-safe LRU with a per-entry time to live.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                stored, value = self._data[key]
+            except KeyError:
+                return None
+            if time.time() - stored > self.ttl:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# Entries are only trusted for a few seconds, because a session changed or
+# flushed by another process is not invalidated here.
+hot_sessions = LRUCache(
+    getattr(settings, 'SESSION_LRU_SIZE', 1000),
+    getattr(settings, 'SESSION_LRU_TTL', 5)
+)
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super(SessionStore, self).__init__(session_key)
+        self._stored_expiry = None
+
+    @property
+    def expiry_write_threshold(self):
+        return timedelta(seconds=getattr(settings, 'SESSION_EXPIRY_WRITE_THRESHOLD', 60 * 60))
+
+    def load(self):
+        key = self.cache_key
+        entry = hot_sessions.get(key)
+        if entry is None:
+            try:
+                entry = self._cache.get(key)
+            except Exception:
+                # Some backends (e.g. memcache) raise an exception on invalid keys.
+                entry = None
+        if entry is None:
+            try:
+                s = self.model.objects.get(
+                    session_key=self.session_key,
+                    expire_date__gt=timezone.now()
+                )
+            except (self.model.DoesNotExist, SuspiciousOperation) as e:
+                if isinstance(e, SuspiciousOperation):
+                    logger = logging.getLogger('django.security.%s' % e.__class__.__name__)
+                    logger.warning(force_text(e))
+                self._session_key = None
+                return {}
+            entry = (self.decode(s.session_data), s.expire_date)
+            self._cache.set(key, entry, self.get_expiry_age(expiry=s.expire_date))
+
+        data, expiry = entry
+        if expiry <= timezone.now():
+            self._session_key = None
+            return {}
+        hot_sessions.set(key, entry)
+        self._stored_expiry = expiry
+        # Callers mutate the returned dict, the cached entry must stay intact
+        return copy.deepcopy(data)
+
+    def save(self, must_create=False):
+        if self.session_key is not None and not must_create and not self.modified:
+            self._get_session()
+            if self._stored_expiry is not None and \
+                    self.get_expiry_date() - self._stored_expiry < self.expiry_write_threshold:
+                return
+        # Skipping CachedDBStore.save, cache entries also carry the expiry date
+        DBStore.save(self, must_create)
+        if self.session_key is None:
+            return
+        expiry = self.get_expiry_date()
+        entry = (copy.deepcopy(self._get_session()), expiry)
+        self._cache.set(self.cache_key, entry, self.get_expiry_age(expiry=expiry))
+        hot_sessions.set(self.cache_key, entry)
+        self._stored_expiry = expiry
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        super(SessionStore, self).delete(session_key)
+        if session_key is not None:
+            hot_sessions.delete(self.cache_key_prefix + session_key)
+
+    @classmethod
+    def clear_expired(cls, batch_size=None):
+        """
+            Deletes expired sessions in batches so a large backlog doesn't
+            lock the whole table. Returns the number of removed sessions.
+        """
+        if batch_size is None:
+            batch_size = getattr(settings, 'SESSION_CLEANUP_BATCH_SIZE', 1000)
+        model = cls.get_model_class()
+        deleted = 0
+        while True:
+            keys = list(model.objects.filter(expire_date__lt=timezone.now())
+                        .values_list('session_key', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            model.objects.filter(session_key__in=keys).delete()
+            deleted += len(keys)
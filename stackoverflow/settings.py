@@ -64,7 +64,8 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'django.template.context_processors.media'
+                'django.template.context_processors.media',
+                'questions.context_processors.notifications'
             ],
         },
     },
@@ -72,6 +73,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'stackoverflow.wsgi.application'
 
+# Views run in a pool of ASGI_THREADS threads when served through stackoverflow.asgi
+ASGI_APPLICATION = 'stackoverflow.asgi.application'
+ASGI_THREADS = 8
+
 
 # Database
 # https://docs.djangoproject.com/en/1.11/ref/settings/#databases
@@ -88,6 +93,98 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/1.11/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'stackoverflow'
+    }
+}
+
+
+# Sessions
+# https://docs.djangoproject.com/en/1.11/topics/http/sessions/
+# Write-through sessions (LRU -> cache -> database), see stackoverflow/sessions.py
+
+SESSION_ENGINE = 'stackoverflow.sessions'
+SESSION_SAVE_EVERY_REQUEST = True
+SESSION_LRU_SIZE = 1000
+SESSION_LRU_TTL = 5
+SESSION_EXPIRY_WRITE_THRESHOLD = 60 * 60
+SESSION_CLEANUP_BATCH_SIZE = 1000
+
+
+# Live answer events on question pages, see questions/events.py
+# 'local' fans out within one process, 'postgres' uses LISTEN/NOTIFY across processes
+# Pages only subscribe when served through stackoverflow.asgi, where open streams
+# only cost a coroutine
+
+ANSWER_EVENTS_BACKEND = 'local'
+ANSWER_EVENTS_ASGI_STREAM_TIMEOUT = 10 * 60
+ANSWER_EVENTS_KEEPALIVE = 15
+ANSWER_EVENTS_RETRY = 3000
+
+
+# Question views are deduplicated per visitor within VIEW_COUNT_WINDOW seconds
+# and written to the database at most every VIEW_COUNT_FLUSH_INTERVAL seconds
+
+VIEW_COUNT_WINDOW = 15 * 60
+VIEW_COUNT_FLUSH_INTERVAL = 10
+
+
+# Tag autocompletion, see questions/tagindex.py
+
+TAG_AUTOCOMPLETE_LIMIT = 10
+TAG_INDEX_CHECK_INTERVAL = 1
+
+# Cached per-tag question id lists used for multi-tag browsing, see questions/postings.py
+# With a per-process cache, changes from other processes are seen after TAG_POSTINGS_TIMEOUT
+TAG_POSTINGS_TIMEOUT = 5 * 60
+
+# Tags deleted per batch by the gc_tags command, see questions/tagtools.py
+TAG_GC_BATCH_SIZE = 1000
+
+# Answers deleted per transaction when the purge_questions command removes deleted questions,
+# see questions/deletion.py
+QUESTION_PURGE_BATCH_SIZE = 500
+
+# Hot questions ranking, recomputed by the compute_hot_questions command, see questions/hot.py
+HOT_QUESTIONS_SIZE = 2000
+HOT_QUESTIONS_HALF_LIFE = 12 * 60 * 60
+HOT_QUESTIONS_WINDOW = 14 * 24 * 60 * 60
+# Reading an older ranking queues its recomputation, in case the command stopped running
+HOT_QUESTIONS_MAX_AGE = 60 * 60
+
+# Related questions kept per question by the build_related command, see questions/related.py
+RELATED_QUESTIONS = 10
+# Fitted model saved by a full build and extended by build_related --new
+RELATED_MODEL_FILE = os.path.join(BASE_DIR, 'related_model.pickle')
+
+# Possible duplicates suggested on the ask form, see questions/duplicates.py. Asking a question
+# estimated at least DUPLICATE_THRESHOLD similar to an existing one has to be confirmed.
+DUPLICATE_SUGGESTIONS = 5
+DUPLICATE_THRESHOLD = 0.5
+# Questions sharing LSH buckets compared per lookup, most shared buckets first
+DUPLICATE_CANDIDATES = 100
+
+# Question search, questions.search.InvertedIndexBackend works without PostgreSQL full text search
+SEARCH_BACKEND = 'questions.search.PostgresSearchBackend'
+# Highlighted result snippets are cached per question version and query
+SEARCH_SNIPPET_TIMEOUT = 24 * 60 * 60
+# Tags listed next to search results for narrowing them down
+SEARCH_FACETS = 15
+
+# Trigram search over titles and usernames, used when full text search finds nothing, see questions/fuzzy.py
+FUZZY_SEARCH_LIMIT = 20
+FUZZY_SEARCH_THRESHOLD = 0.3
+
+# Question and answer revisions store deltas, with a full snapshot every REVISION_SNAPSHOT_INTERVAL
+# revisions bounding the deltas applied to rebuild one, see questions/revisions.py
+REVISION_SNAPSHOT_INTERVAL = 10
+
+
 # Password validation
 # https://docs.djangoproject.com/en/1.11/ref/settings/#auth-password-validators
 
@@ -131,6 +228,32 @@ LOGIN_REDIRECT_URL = 'questions:index'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Background tasks, run by the run_worker command, see questions/tasks.py. Claimed tasks are
+# claimed again after TASK_LEASE seconds, failed ones are retried after TASK_RETRY_DELAY
+# seconds, doubling with every attempt up to TASK_RETRY_MAX_DELAY.
+TASK_WORKERS = 4
+TASK_POLL_INTERVAL = 1.0
+TASK_LEASE = 5 * 60
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 10
+TASK_RETRY_MAX_DELAY = 60 * 60
+
+# Emails are queued in the outbox and sent OUTBOX_BATCH_SIZE per connection by the send_outbox
+# command, see questions/outbox.py. Emails failing OUTBOX_MAX_ATTEMPTS times are kept as dead.
+OUTBOX_BATCH_SIZE = 100
+OUTBOX_LEASE = 5 * 60
+OUTBOX_MAX_ATTEMPTS = 5
+# Prints emails instead of sending them, for local development
+# EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Digests are queued NOTIFICATION_DIGEST_BATCH_SIZE users at a time by the send_digests command
+# and link to pages under SITE_URL, see questions/notifications.py
+NOTIFICATION_DIGEST_BATCH_SIZE = 500
+SITE_URL = 'http://localhost:8000'
+
+# Entries kept in each user's activity feed, see questions/activity.py
+ACTIVITY_FEED_SIZE = 200
+
 # Using gmail smtp server
 # from .email_credentials import USER, PASSWORD
 # EMAIL_HOST = 'smtp.gmail.com'